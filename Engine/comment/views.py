@@ -5,9 +5,8 @@ from Engine.csv_alchemy import CsvAlchemy
 from Engine.models import Comment, User
 from flask_login import current_user
 from typing import Union
-import threading
 
-from Engine.recommender.AI import refilter_users
+from Engine.recommender.AI import record_comment, engine_writes
 
 comment = Blueprint("comment", __name__)
 
@@ -90,10 +89,9 @@ def comment_movie(parameter_movie_csv_id) -> RouteResponseType:
         new_comment.user_csv_id=current_user.csv_id
         new_comment.movie_csv_id=parameter_movie_csv_id
 
-        new_comment.insert()
-
-        background_thread = threading.Thread(target=refilter_users)
-        background_thread.start()
+        with engine_writes:
+            new_comment.insert()
+            record_comment(current_user.csv_id)
 
         return RouteResponse.success("Comment successfully added", { 
             "new_comment" : new_comment,
@@ -127,10 +125,9 @@ def update_comment(comment_id) -> RouteResponseType:
         comment = Comment.query.filter_by(id=comment_id).one()
 
         if comment:
-            comment.update(new_comment)
-
-        background_thread = threading.Thread(target=refilter_users)
-        background_thread.start()
+            with engine_writes:
+                comment.update(new_comment)
+                record_comment(comment.user_csv_id)
 
         return RouteResponse.success("Comment successfully added", { "comment" : comment } )
     
@@ -158,10 +155,9 @@ def remove_comment(comment_id) -> RouteResponseType:
         comment: Comment = Comment.query.filter_by(id=comment_id).one()
 
         if comment:
-            comment.delete()
-
-        background_thread = threading.Thread(target=refilter_users)
-        background_thread.start()
+            with engine_writes:
+                comment.delete()
+                record_comment(comment.user_csv_id)
 
         return RouteResponse.success("Comment removed successfully")
     
@@ -200,7 +200,7 @@ class CsvAlchemy:
         row: Series = retrieved_data.to_dict(orient='records')[0]
         return row
 
-    def delete_row(self, search_dictionary: SEARCH) -> Union[Exception, None]:
+    def delete_row(self, search_dictionary: SEARCH) -> Union[DataFrame, Exception]:
         """
         Deletes a row from the CSV file based on search criteria.
 
@@ -210,7 +210,7 @@ class CsvAlchemy:
                 "user_id" : 12
             }
 
-            csv_instance.delete_row(search_criteria)
+            deleted_rows = csv_instance.delete_row(search_criteria)
             
         Args:
         ----
@@ -219,12 +219,18 @@ class CsvAlchemy:
         Raises:
         -------
             RowNotFoundException: If search dictionary does not return any rows.
+
+        Returns:
+        --------
+            The deleted rows.
         """
         row_to_delete: Series = self._retrieve(search_dictionary)
 
         self.csv_data: DataFrame = self.csv_data.drop(row_to_delete.index)
         self.csv_data.to_csv(self.filepath, index=False)
 
+        return row_to_delete
+
     def update(self, row_search_dictionary: SEARCH, data_dictionary: SEARCH) -> Union[Exception, None]:
         """
         Updates a row in the CSV file based on search criteria.
@@ -7,6 +7,8 @@ import re
 StringList = list[str]
 DataFrame = Any  # Import 'Any' if the DataFrame type is not from a known library
 
+NOT_ALPHANUMERIC_OR_SPACE: str = "[^a-zA-Z0-9 ]"
+
 def run_simple_io(worker: Optional[Callable[[str], Any]] = None, message: str = "\n\tInput: ") -> Any:
     """
     Runs a simple input-output operation with an optional callback function.
@@ -38,7 +40,21 @@ def clean_title(title: str) -> str:
     --------
         str: The cleaned string.
     """
-    return re.sub("[^a-zA-Z0-9 ]", '', title)
+    return re.sub(NOT_ALPHANUMERIC_OR_SPACE, '', title)
+
+def clean_titles(titles: Series) -> Series:
+    """
+    Removes any non-alphanumeric or non-space characters from every string of a Series at once.
+
+    Args:
+    -----
+        titles (Series): The input strings.
+
+    Returns:
+    --------
+        Series: The cleaned strings, same as calling `clean_title` on each of them.
+    """
+    return titles.str.replace(NOT_ALPHANUMERIC_OR_SPACE, '', regex=True)
 
 def get_latest_csv_user_id() -> int:
     """
@@ -124,7 +140,7 @@ def remove_csv_comment_id(comment_id: int) -> None:
 
 def find_movie_id(movie_title) -> Union[int, None]:
     """
-    Searches for the movie ID based on its title in a CSV file.
+    Searches for the movie ID based on its title in the exact title index.
 
     Args:
     - movie_title (str): The title of the movie to search for.
@@ -132,14 +148,9 @@ def find_movie_id(movie_title) -> Union[int, None]:
     Returns:
     - int or None: The movie ID if found, or None if not found.
     """
-    try:
-
-        retrieve_movie: Series = movies.clean_retrieve({
-            "title" : movie_title
-        })
+    # imported here as the recommender imports this module while it builds its indexes
+    from Engine.recommender.AI import find_exact_movie_ids
 
-        return retrieve_movie["movie_id"]
+    movie_ids: list[int] = find_exact_movie_ids(movie_title)
 
-    except CsvAlchemy.RowNotFoundException:
-        
-        return None
+    return movie_ids[0] if movie_ids else None
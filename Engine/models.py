@@ -1,6 +1,8 @@
 
 from Engine.recommender.dataset_helpers import get_latest_csv_comment_id, get_latest_csv_user_id, remove_csv_comment_id, remove_csv_user_id
-from Engine.recommender.CsvAlchemy import user_ids as user_ids_csv, comments as comments_csv
+from Engine.recommender.CsvAlchemy import user_ids as user_ids_csv
+from Engine.csv_alchemy import comments as comments_csv
+from Engine.recommender.sentiment import user_sentiment
 from sqlalchemy.exc import SQLAlchemyError
 from typing import Any, Union, override
 from sqlalchemy.orm import relationship
@@ -136,22 +138,26 @@ class Comment(db.Model):
     @override
     def update(self, new_comment: str) -> Union[Exception, None]:
         """
-        The function updates a comment in a CSV file and in a database.
+        The function updates a comment in a CSV file and in a database, along with its sentiment score.
 
         Args:
             new_comment: The `new_comment` parameter is the updated content of the comment that needs to be
             updated in the database.
         """
+        old_polarity: float = comments_csv.clean_retrieve({"comment_id": self.csv_id})["sentiment_score"]
+        new_polarity: float = TextBlob(new_comment).sentiment.polarity
+
         comments_csv.update({
-            "column_name": "comment_id",
-            "column_data": self.csv_id
+            "comment_id": self.csv_id
         }, {
-            "content" : new_comment
+            "sentiment_score" : new_polarity
         })
 
         self.content: str = new_comment
         db.session.commit()
 
+        user_sentiment.replace(self.user_csv_id, old_polarity, new_polarity)
+
     @override
     def insert(self) -> Union[Exception, None]:
         """
@@ -175,6 +181,8 @@ class Comment(db.Model):
             db.session.add(self)
             db.session.commit()
 
+            user_sentiment.add(self.user_csv_id, comment_polarity)
+
         except SQLAlchemyError as error:
             remove_csv_comment_id(self.csv_id)
             raise error
@@ -184,14 +192,16 @@ class Comment(db.Model):
         """
         Deletes the row data from the csv file first before removing the comment from the database
         """
-        comments_csv.delete_row({
-            "column_name": "comment_id",
-            "column_data": self.csv_id
+        deleted_comments = comments_csv.delete_row({
+            "comment_id": self.csv_id
         })
 
         db.session.delete(self)
         db.session.commit()
 
+        for polarity in deleted_comments["sentiment_score"]:
+            user_sentiment.remove(self.user_csv_id, polarity)
+
     @override
     def __repr__(self):
         return pretty_print(self.table_name, self.fields)
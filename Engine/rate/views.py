@@ -3,9 +3,8 @@ from Engine.csv_alchemy import CsvAlchemy, ratings
 from flask_login import current_user
 from flask import Blueprint, request
 from pandas import DataFrame
-import threading
 
-from Engine.recommender.AI import refilter_users
+from Engine.recommender.AI import record_rating, forget_ratings, engine_writes
 
 rating: Blueprint = Blueprint('rating', __name__)
 
@@ -85,14 +84,14 @@ def rate_movie(movies_csv_id) -> RouteResponseType:
         
         if rating_value <= 5 and rating_value >= 0:
 
-            ratings.insert_row({
-                "user_id": current_user.csv_id,
-                "movie_id": movies_csv_id,
-                "content": rating_value
-            })
+            with engine_writes:
+                ratings.insert_row({
+                    "user_id": current_user.csv_id,
+                    "movie_id": movies_csv_id,
+                    "content": rating_value
+                })
 
-            background_thread = threading.Thread(target=refilter_users)
-            background_thread.start()
+                record_rating(current_user.csv_id, movies_csv_id, rating_value)
 
             return RouteResponse.success("Movie rated successfully")
         else:
@@ -119,13 +118,13 @@ def unrate_movie(movie_csv_id) -> RouteResponseType:
     """
     try:
         
-        ratings.delete_row({
-            "user_id": current_user.csv_id,
-            "movie_id": movie_csv_id
-        })
+        with engine_writes:
+            deleted_ratings: DataFrame = ratings.delete_row({
+                "user_id": current_user.csv_id,
+                "movie_id": movie_csv_id
+            })
 
-        background_thread = threading.Thread(target=refilter_users)
-        background_thread.start()
+            forget_ratings(current_user.csv_id, movie_csv_id, deleted_ratings["content"])
 
         return RouteResponse.success("Rating removed successfully")
     
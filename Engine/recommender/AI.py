@@ -1,16 +1,74 @@
 from ..csv_alchemy import movies as movies_csv, ratings as ratings_csv, comments as comments_csv
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from numpy import ndarray, argpartition, isnan, isin
+from numpy import ndarray, float32
 import Engine.dataset_helpers as dataset_helpers
-from typing import Dict, List, Optional, Union
-from pandas import Series, DataFrame, concat
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from pandas import Series, DataFrame
 from scipy.sparse import spmatrix, vstack
+from .title_search import TitleSearchEngine, compact_title_matrix, compact_title_engine, compact_vocabulary, compare_title_engines
+from .trigram_index import TrigramTitleIndex
+from .prefix_index import TitlePrefixIndex
+from .incremental_index import IncrementalTitleIndex
+from .exact_index import ExactTitleIndex
+from .lsh_index import RandomProjectionIndex, measure_recall
+from .collaborative import CollaborativeEngine, measure_sampling_quality
+from .precompute import RecommendationTable
+from .als import ALSModel
+from . import als
+from .cache import LRUCache, RefreshingCache, MISSING
+from .refresh import RefreshWorker
+from .snapshot import EngineSnapshot, SnapshotPublisher
+from .sentiment import user_sentiment
+from .boundaries import rating_boundery, sentiment_boundery
+from functools import partial
+from . import artifacts
 from ..helpers import timer
+from os import getenv
+from threading import RLock
 import json
 
 LIST_OF_DICTIONARIES = List[Dict[str, any]]
 
+EXACT_SEARCH: str = "exact"
+FUZZY_SEARCH: str = "fuzzy"
+INCREMENTAL_SEARCH: str = "incremental"
+APPROXIMATE_SEARCH: str = "approximate"
+
+COOCCURRENCE_ENGINE: str = "cooccurrence"
+ALS_ENGINE: str = "als"
+
+title_index_mode: str = EXACT_SEARCH
+"""
+    The search mode used when none is given.
+
+    "exact" searches the fitted TF-IDF matrix, adding movies with update_tfidf then transforms them with
+    the fitted vocabulary and copies the whole matrix.
+
+    "incremental" searches the hashed `incremental_index` instead, adding movies with update_tfidf then
+    learns their new words and only costs time for the new rows.
+
+    "approximate" searches the `approximate_index`, which only scores the titles hashed into the same
+    random projection buckets as the query. It finds the near duplicates of the query but misses most of
+    the weaker matches, see the measurements of RandomProjectionIndex and approximate_search_report().
+"""
+
+compact_title_index: bool = getenv("FLASK_COMPACT_TITLE_INDEX", "").lower() in ("1", "true")
+"""
+    Set FLASK_COMPACT_TITLE_INDEX=1 in the .env to make the "exact" mode search a compact version of
+    the TF-IDF matrix, with float32 weights, int32 indices and no bigrams found in a single title.
+    The compact matrix is saved in its own artifacts folder and memory mapped like the full one,
+    the full matrix is never built or saved in this mode.
+    Run compact_index_report() to see what it saves and how much the results change.
+"""
+
+fuzzy_fallback_score: float = float(getenv("FLASK_FUZZY_FALLBACK_SCORE", "0.5"))
+"""
+    recommend searches the titles again with the fuzzy mode when the best TF-IDF score is below this.
+    A misspelled title often still shares its year or a common word with many movies, which gives weak
+    TF-IDF matches instead of no match at all. The fuzzy search adds about 2 ms a query on 62,000 generated
+    titles. Set FLASK_FUZZY_FALLBACK_SCORE=0 in the .env to only fall back when nothing matches.
+"""
+
 '''
     Guidelines on comments:
     To remove all multiline comments, find with regex """[^"]*""" { newline }, then Alt + Enter , then backspace <-
@@ -21,12 +79,11 @@ movies: DataFrame = movies_csv.csv_data
     Reads the movie dataset
 """
 
-movies["clean_titles"]: Series = movies["title"].apply(
-    dataset_helpers.clean_title)
+movies["clean_titles"]: Series = dataset_helpers.clean_titles(movies["title"])
 """
     creates a new column | clean_titles | then,
-    loops through each title and sets the value of that movies' clean_title column
-    into the clean title of the movie
+    sets the value of each movies' clean_title column into the clean title of the movie
+    with one vectorized string replace over the whole title column
 
     +------------------+-------------------+
     |      title       |    clean_titles   |
@@ -37,7 +94,17 @@ movies["clean_titles"]: Series = movies["title"].apply(
     +------------------+-------------------+ 
 """
 
-vectorizer: TfidfVectorizer = TfidfVectorizer(ngram_range=(1, 2))
+title_artifacts: Optional[artifacts.TitleArtifacts] = artifacts.load_title_artifacts(
+    movies_csv.filepath,
+    artifacts.COMPACT_TITLE_INDEX_FOLDER if compact_title_index else artifacts.TITLE_INDEX_FOLDER
+)
+"""
+    The vectorizer and TF-IDF matrix saved by a previous start up, if movies.csv did not change since.
+    The matrices are memory mapped, so workers share them through the page cache instead of refitting.
+    The compact mode keeps its pruned matrix in a separate folder.
+"""
+
+vectorizer: TfidfVectorizer = title_artifacts.vectorizer if title_artifacts else TfidfVectorizer(ngram_range=(1, 2))
 """
     Creates a vector of movie titles and their corresponding frequency value
 
@@ -106,7 +173,7 @@ vectorizer: TfidfVectorizer = TfidfVectorizer(ngram_range=(1, 2))
     This is all done by sckit-learns::TfidfVectorizer
 """
 
-tfidf: spmatrix = vectorizer.fit_transform(movies["clean_titles"])
+tfidf: spmatrix = title_artifacts.tfidf if title_artifacts else vectorizer.fit_transform(movies["clean_titles"])
 """
     The code implements both Content-Based Filtering and Collaborative Filtering.
 
@@ -118,6 +185,109 @@ tfidf: spmatrix = vectorizer.fit_transform(movies["clean_titles"])
     the similarity between the movie titles.
 """
 
+title_vocabulary: Dict[str, int] = vectorizer.vocabulary_
+title_columns: Optional[ndarray] = title_artifacts.columns if title_artifacts else None
+
+if compact_title_index and title_artifacts is None:
+    tfidf, title_vocabulary, title_columns = compact_title_matrix(tfidf, vectorizer.vocabulary_)
+elif compact_title_index:
+    title_vocabulary = compact_vocabulary(vectorizer.vocabulary_, title_columns)
+"""
+    In the compact mode tfidf is replaced by the pruned matrix right after fitting, so the full
+    matrix is dropped before any index is built from it. title_vocabulary and title_columns describe
+    the columns of the matrix the title_engine searches, update_tfidf appends rows in the same columns.
+"""
+
+title_engine: TitleSearchEngine = TitleSearchEngine(
+    tfidf,
+    title_vocabulary,
+    postings=title_artifacts.postings if title_artifacts else None,
+    normalized=title_artifacts is not None or compact_title_index,
+    columns=title_columns
+)
+"""
+    Keeps an L2-normalized copy of the tfidf matrix along with its inverted index
+
+    "toy"       -> rows [0, 3021, 14813, 20497, 59767]
+    "toy story" -> rows [0, 3021, 14813, 20497, 59767]
+    "matrix"    -> rows [2487, 6186, 6283]
+
+    so every search only touches the rows in the posting lists of the query terms
+"""
+
+if title_artifacts is None:
+    artifacts.save_title_artifacts(
+        movies_csv.filepath,
+        vectorizer,
+        title_engine.matrix,
+        title_engine.index.matrix,
+        artifacts.COMPACT_TITLE_INDEX_FOLDER if compact_title_index else artifacts.TITLE_INDEX_FOLDER,
+        title_columns
+    )
+
+trigram_index: TrigramTitleIndex = TrigramTitleIndex(movies["clean_titles"])
+"""
+    Character trigrams of every clean title, used by the fuzzy search mode so misspelled titles
+    like "Jumanij" or "Godfater" still find their movie
+
+    "  j" -> rows [1, 4521, 8032]
+    "jum" -> rows [1]
+    "man" -> rows [1, 307, 2712]
+"""
+
+exact_titles: ExactTitleIndex = ExactTitleIndex(movies["title"])
+"""
+    Normalized title -> rows of the movies having it
+
+    "toy story 1995" -> [0]
+
+    Titles clicked from a list we showed are resolved here without any TF-IDF search
+"""
+
+movie_popularity: Series = movies["movie_id"].map(ratings_csv.csv_data["movie_id"].value_counts()).fillna(0)
+"""
+    The number of ratings of every movie, aligned with the movie rows
+"""
+
+prefix_index: TitlePrefixIndex = TitlePrefixIndex(movies["clean_titles"], movie_popularity)
+"""
+    Sorted clean titles used to suggest the most popular titles while the user is still typing.
+    It is built once here so suggestions never read the ratings.
+"""
+
+snapshots: SnapshotPublisher = SnapshotPublisher(EngineSnapshot(
+    version=0,
+    title_version=0,
+    movies=movies,
+    tfidf=tfidf,
+    title_engine=title_engine,
+    trigram_index=trigram_index,
+    exact_titles=exact_titles,
+    prefix_index=prefix_index
+))
+"""
+    The state every request reads. The indexes above only make the first snapshot, update_tfidf and
+    refilter_users build new ones off to the side and publish them, so a request calls snapshots.current()
+    once and passes it along to see one consistent state from start to end, see EngineSnapshot.
+"""
+
+
+def publish(**changes) -> EngineSnapshot:
+    """
+    Publishes a new snapshot and marks the similar movies computed from older ones as stale.
+
+    Args:
+    -----
+        changes: The fields of the snapshot to replace, ex: collaborative_engine=new_engine.
+
+    Returns:
+    --------
+        the published snapshot.
+    """
+    state: EngineSnapshot = snapshots.publish(**changes)
+    similar_movies_cache.invalidate(state.version)
+    return state
+
 
 def update_tfidf(list_of_new_movie_indices: list[int]) -> None:
     """
@@ -126,42 +296,223 @@ def update_tfidf(list_of_new_movie_indices: list[int]) -> None:
     ---------------------------------------------------------------------
 
     The function `update_model` takes a list of new movie indices, retrieves the corresponding movie
-    titles from a dataframe, cleans the title, transforms them using a vectorizer, 
-    and updates the global variables `tfidf` by appending the new data.
+    titles from a dataframe, cleans the title and adds them to the title index of the current `title_index_mode`.
+
+    In "exact" mode the titles are transformed using the fitted vectorizer, so words it never saw are dropped,
+    and a new `tfidf` is made by appending the new data.
+
+    In "incremental" mode the titles are appended to the `incremental_index`, which learns their words
+    and only refreshes its IDF weights every few additions.
+
+    The exact, trigram, prefix, incremental and approximate title indexes of the snapshot return copies with
+    only the new titles appended instead of being rebuilt from every title. The new indexes are published as
+    one new snapshot, so a request holding the previous one never sees rows its movies do not have.
 
     Args:
     -----
         list_of_new_movie_indices (list[int]): A list of integers representing the indices of new movies
         in the dataset that you want to add to the model.
     """
-    global tfidf
-    new_data: Series = movies["title"].iloc(list_of_new_movie_indices)
-    clean_data: Series = new_data.apply(dataset_helpers.clean_title)
-    new_tfidf: spmatrix = vectorizer.transform(clean_data)
-    tfidf = vstack([tfidf, new_tfidf])
+    state: EngineSnapshot = snapshots.current()
+
+    # inserting rows into the csv replaces its DataFrame, so the latest one is not published yet and only
+    # gets the clean titles of its new rows, it is copied only when no insert replaced the published one
+    new_movies: DataFrame = movies_csv.csv_data
+
+    if new_movies is state.movies:
+        new_movies = new_movies.copy()
+
+    new_data: Series = new_movies["title"].iloc[sorted(list_of_new_movie_indices)]
+    clean_data: Series = dataset_helpers.clean_titles(new_data)
+    new_movies.loc[new_data.index, "clean_titles"] = clean_data
+
+    # the new movies are the last rows, they are appended to the title indexes of the snapshot
+    changes: Dict[str, Any] = {"movies": new_movies, "exact_titles": state.exact_titles.appended(new_data)}
+
+    if state.incremental_index is not None:
+        changes["incremental_index"] = state.incremental_index.appended(clean_data)
+
+    if title_index_mode != INCREMENTAL_SEARCH:
+        new_rows: spmatrix = vectorizer.transform(clean_data)
+
+        if compact_title_index:
+            new_rows = state.title_engine.project(new_rows).astype(float32)
+            """
+                the compact matrix is already pruned and normalized, the new rows are cut to its columns
+                and normalized the same way instead of pruning a full matrix again
+            """
+
+        new_tfidf: spmatrix = vstack([state.tfidf, new_rows], format="csr")
+        new_title_engine: TitleSearchEngine = TitleSearchEngine(
+            new_tfidf, title_vocabulary, normalized=compact_title_index, columns=title_columns
+        )
+
+        changes.update(tfidf=new_tfidf, title_engine=new_title_engine)
+
+        if state.approximate_index is not None:
+            changes["approximate_index"] = state.approximate_index.appended(new_title_engine)
+
+    changes["trigram_index"] = state.trigram_index.appended(clean_data)
+    changes["prefix_index"] = state.prefix_index.appended(clean_data, movie_popularity.reindex(new_data.index, fill_value=0))
+
+    publish(**changes)
+    search_cache.clear()
+
+
+def get_incremental_index(state: Optional[EngineSnapshot] = None) -> IncrementalTitleIndex:
+    """
+    Returns the `incremental_index` of a snapshot, building it from the clean titles of the snapshot the
+    first time. It is published along with the snapshot while the snapshot's movies are still the latest.
+
+    Args:
+    -----
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
+
+    Returns:
+    --------
+        the incremental title index of the snapshot.
+    """
+    state = state or snapshots.current()
+
+    if state.incremental_index is not None:
+        return state.incremental_index
+
+    index: IncrementalTitleIndex = IncrementalTitleIndex(state.movies["clean_titles"])
+    snapshots.update(lambda latest: {"incremental_index": index} if latest.movies is state.movies and latest.incremental_index is None else {})
+    return index
+
+
+def get_approximate_index(state: Optional[EngineSnapshot] = None) -> RandomProjectionIndex:
+    """
+    Returns the `approximate_index` of a snapshot, hashing the rows of its `title_engine` the first time.
+    It is published along with the snapshot while the snapshot's title_engine is still the latest.
+
+    Args:
+    -----
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
+
+    Returns:
+    --------
+        the approximate title index of the snapshot.
+    """
+    state = state or snapshots.current()
+
+    if state.approximate_index is not None:
+        return state.approximate_index
+
+    index: RandomProjectionIndex = RandomProjectionIndex(state.title_engine)
+    snapshots.update(lambda latest: {"approximate_index": index} if latest.title_engine is state.title_engine and latest.approximate_index is None else {})
+    return index
+
+
+def approximate_search_report(sample_size: int = 500, k: int = 10, **settings) -> Dict[str, Any]:
+    """
+    Measures the recall@k and the latency of the approximate search against the exact search,
+    using a sample of the movie titles as queries.
+
+    Args:
+    -----
+        sample_size (int): The number of titles to search with (default is 500).
+        k (int): The number of results compared per title (default is 10).
+        settings: n_tables, n_bits, probe_radius or seed of a RandomProjectionIndex to try instead of the current one.
+
+    Returns:
+    --------
+        a dictionary with the settings, the recall@k and the average latency of both searches in milliseconds.
+    """
+    state: EngineSnapshot = snapshots.current()
+    index: RandomProjectionIndex = RandomProjectionIndex(state.title_engine, **settings) if settings else get_approximate_index(state)
+
+    sample: Series = state.movies["clean_titles"].sample(min(sample_size, len(state.movies)), random_state=0)
+    report: Dict[str, Any] = measure_recall(index, vectorizer.transform(sample), k)
+
+    print(json.dumps(report, indent=4))
+    return report
+
+
+def compact_index_report(sample_size: int = 1000, k: int = 10) -> Dict[str, Any]:
+    """
+    Compares the compact title index with the exact one, using a sample of the movie titles as queries.
+
+    Args:
+    -----
+        sample_size (int): The number of titles to search with (default is 1000).
+        k (int): The number of results compared per title (default is 10).
+
+    Returns:
+    --------
+        a dictionary with the memory of both indexes in bytes and the average overlap of their top k results.
+    """
+    state: EngineSnapshot = snapshots.current()
+    exact_engine: TitleSearchEngine = TitleSearchEngine(vectorizer.transform(state.movies["clean_titles"]), vectorizer.vocabulary_)
+    compact_engine: TitleSearchEngine = compact_title_engine(exact_engine, vectorizer.vocabulary_)
+
+    sample: Series = state.movies["clean_titles"].sample(min(sample_size, len(state.movies)), random_state=0)
+    report: Dict[str, Any] = compare_title_engines(exact_engine, compact_engine, vectorizer.transform(sample), k)
+
+    print(json.dumps(report, indent=4))
+    return report
+
+search_cache: LRUCache = LRUCache(maxsize=4096, ttl=3600)
+"""
+    Results of recent searches keyed by the normalized title, k, search mode and the title_version of the snapshot.
+    Trending titles and retries after an error are answered without touching the TF-IDF matrix.
+    It is cleared whenever update_tfidf changes the matrix.
+"""
 
 # search
 
 
-def search(title: str) -> DataFrame:
+def search(title: str, k: int = 10, mode: Optional[str] = None, state: Optional[EngineSnapshot] = None) -> DataFrame:
     """
     The `search` function takes a movie title as input, converts it into a vector using a query
-    vectorizer, calculates the cosine similarity between the query vector and the TF-IDF vectors of all
-    movies, selects the top 10 similar movies based on the similarity scores, and returns the details of
+    vectorizer, scores it against the pre-normalized TF-IDF vectors of all movies in `title_engine`,
+    selects the top k similar movies based on the similarity scores, and returns the details of
     those movies in a DataFrame.
 
+    With `mode="fuzzy"` the title is instead looked up in the `trigram_index` and re-ranked by
+    edit distance, which tolerates typos that the word level TF-IDF cannot match.
+    With `mode="incremental"` the title is scored by the `incremental_index`, which also knows the
+    movies added after start up.
+    With `mode="approximate"` only the titles sharing a random projection bucket with the query
+    are scored by the `approximate_index`.
+
     Args:
     -----
         title (str): The `title` parameter is a string that represents the movie title you want to search for.
+        k (int): The number of movies to return (default is 10).
+        mode (str): "exact", "fuzzy", "incremental" or "approximate" (default is the `title_index_mode`).
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
     Returns:
     --------
-        a DataFrame containing the top 10 movies that are similar to the given movie title. The movies are
-        sorted in descending order of relevance.
+        a DataFrame containing the top k movies that are similar to the given movie title along with their
+        `score`. The movies are sorted in descending order of relevance.
     """
 
-    query_vectorizer = vectorizer.transform(
-        [dataset_helpers.clean_title(title)])
+    mode = mode or title_index_mode
+    state = state or snapshots.current()
+    clean_query: str = dataset_helpers.clean_title(title)
+    cache_key: Tuple[str, int, str, int] = (clean_query.lower().strip(), k, mode, state.title_version)
+    cached_results: Union[DataFrame, object] = search_cache.get(cache_key)
+
+    # a title searched before skips the vectorizer and the scoring entirely
+    if cached_results is not MISSING:
+        return cached_results.copy()
+
+    if mode == FUZZY_SEARCH:
+        rows, scores = state.trigram_index.search(clean_query, k)
+        return remember_search(cache_key, state.movies.iloc[rows].assign(score=scores))
+
+    if mode == INCREMENTAL_SEARCH:
+        rows, scores = get_incremental_index(state).search(clean_query, k)
+        return remember_search(cache_key, state.movies.iloc[rows].assign(score=scores))
+
+    if mode == APPROXIMATE_SEARCH:
+        rows, scores = get_approximate_index(state).search(vectorizer.transform([clean_query]), k)
+        return remember_search(cache_key, state.movies.iloc[rows].assign(score=scores))
+
+    query_vectorizer = vectorizer.transform([clean_query])
     """        
         query_vectorizer = 
             (0, 153617)   0.6768756912902416
@@ -179,74 +530,188 @@ def search(title: str) -> DataFrame:
         "Toy", "Story", "Toy Story"
     """
 
-    list_of_scores_similar_to_the_movie: ndarray = cosine_similarity(
-        query_vectorizer, tfidf).flatten()
+    rows, scores = state.title_engine.search(query_vectorizer, k)
     """
-        returns a list where the higher the value of the element, 
-        the closer it is to being the same as the movie title
+        title_engine accumulates the scores of the titles in the posting lists of the query terms,
+        then only the k best rows are sorted
 
-        list_of_scores_similar_to_the_movie = [0.77362283, 0.0, 0.0, 0.0, 0.0, 0.0 ]
+        rows = [0, 3021, 14813, 20497, 59767]
+        scores = [0.77362283, 0.5412, 0.5133, 0.4127, 0.3986]
     """
 
-    indices_of_the_top_10_movies: ndarray = argpartition(
-        list_of_scores_similar_to_the_movie, -10)[-10:]
+    results: DataFrame = state.movies.iloc[rows].assign(score=scores)
     """
-        returns a list with 5 elements where each element is the index of the similarity value
-        indices_of_the_top_5_movie = [20497, 59767, 0, 14813,  3021]
+        indexes the movie data using the ranked rows
+
+              movie_id  ...              clean_titles     score
+        0            1  ...            Toy Story 1995  0.773623
+        3021      3114  ...          Toy Story 2 1999  0.541200
+        14813    78499  ...          Toy Story 3 2010  0.513300
+        20497   106022  ...  Toy Story of Terror 2013  0.412700
+        59767   201588  ...          Toy Story 4 2019  0.398600
+
+        Now we have 5 movies that are related to "Toy Story" already arranged in descending order.
     """
 
-    results: DataFrame = movies.iloc[indices_of_the_top_10_movies][::-1]
+    return remember_search(cache_key, results)
+
+
+def remember_search(cache_key: Tuple[str, int, str, int], results: DataFrame) -> DataFrame:
     """
-        indexes the movie data using the similarity indexes
-        
-              movie_id  ...              clean_titles
-        20497   106022  ...  Toy Story of Terror 2013
-        59767   201588  ...          Toy Story 4 2019
-        0            1  ...            Toy Story 1995
-        14813    78499  ...          Toy Story 3 2010
-        3021      3114  ...          Toy Story 2 1999
+    Stores the results of a search in the `search_cache`.
+
+    Args:
+    -----
+        cache_key (tuple): The normalized title, k, mode and title_version of the search.
+        results (DataFrame): The results of the search.
 
-        Now we have 5 movies that are related to "Toy Story" and arranged in descending order using ([::-1])
-        as more relevant results are stored at the bottom of the results.
+    Returns:
+    --------
+        a copy of the results so callers can never modify the cached DataFrame.
     """
+    search_cache.set(cache_key, results)
+    return results.copy()
 
-    return results
 
+def search_batch(titles: List[str], k: int = 10, offset: int = 0, state: Optional[EngineSnapshot] = None) -> List[DataFrame]:
+    """
+    The `search_batch` function runs the exact TF-IDF search for many titles at once. All the titles
+    are vectorized together and scored with one sparse matrix product in `title_engine`.
+
+    Args:
+    -----
+        titles (List[str]): The movie titles to search for.
+        k (int): The number of movies to return per title (default is 10).
+        offset (int): The number of best movies to skip per title, for paging (default is 0).
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
-filtered_users: Optional[Series] = None
-rating_boundery: int = 4
+    Returns:
+    --------
+        a list with one DataFrame per title, in the same order as the titles, each containing the
+        matching movies along with their `score` in descending order of relevance.
+    """
+    state = state or snapshots.current()
+    query_vectors: spmatrix = vectorizer.transform([dataset_helpers.clean_title(title) for title in titles])
 
-# Define a function to filter users based on their average sentiment score
+    return [
+        state.movies.iloc[rows].assign(score=scores)
+        for rows, scores in state.title_engine.search_batch(query_vectors, k, offset)
+    ]
 
 
-def include_user(user) -> bool:
+def find_exact_movie_ids(title: str, state: Optional[EngineSnapshot] = None) -> List[int]:
     """
-    The function filters users based on their average sentiment score, including them if the score is
-    above 50% or if they have no comments and their rating is above a certain threshold.
+    The `find_exact_movie_ids` function resolves a title that exactly matches one or more movies,
+    ignoring case, punctuation and extra spaces, with a single lookup in `exact_titles`.
 
     Args:
     -----
-        user: The user parameter represents a row of data for a user in a dataset. It is assumed
-        that the dataset contains columns such as "average_sentiment_score" and "rating" for each user.
+        title (str): The title as typed or as stored in movies.csv, ex: "Toy Story (1995)".
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
     Returns:
     --------
-        a boolean value. If the user has no comments (average_sentiment_score is NaN), it will return True
-        if their rating is greater than the rating_boundery. If the user has comments, it will return True
-        if their average sentiment score is greater than 0.5.
+        the ids of the movies having this title, empty if there are none.
     """
-    user_has_no_comments: bool = isnan(user["average_sentiment_score"])
-    if_ratings_had_passed: bool = user["content"] > rating_boundery
-    check_if_comments_had_passed: bool = user["average_sentiment_score"] > 0.5
-    return if_ratings_had_passed if user_has_no_comments else check_if_comments_had_passed
+    state = state or snapshots.current()
+    rows: List[int] = state.exact_titles.lookup(title)
+    return state.movies["movie_id"].iloc[rows].tolist()
 
 
-def refilter_users():
+def suggest(prefix: str, limit: int = 10) -> LIST_OF_DICTIONARIES:
+    """
+    The `suggest` function completes a partially typed title with the most popular movies
+    starting with it, using only the precomputed `prefix_index`.
+
+    Args:
+    -----
+        prefix (str): What the user typed so far, ex: "toy st".
+        limit (int): The maximum number of suggestions (default is 10).
+
+    Returns:
+    --------
+        a list of dictionaries with the `movie_id` and `title` of each suggestion, most popular first.
+    """
+    state: EngineSnapshot = snapshots.current()
+    rows: ndarray = state.prefix_index.suggest(dataset_helpers.clean_title(prefix), limit)
+    return state.movies.iloc[rows][["movie_id", "title"]].to_dict(orient="records")
+
+
+sampled_seed_users: int = int(getenv("FLASK_SAMPLED_SEED_USERS", "0"))
+"""
+    Set FLASK_SAMPLED_SEED_USERS=2000 in the .env to compute the similar movies of a seed liked by more
+    users than that from a fixed random sample of them, so a blockbuster costs as much as any other movie.
+    Seeds with fewer users stay exact. 0 always computes the exact result.
+    Run sampling_quality_report() to see how much the recommendations change.
+"""
+
+refilter_interval: int = int(getenv("FLASK_REFILTER_INTERVAL", "3600"))
+"""
+    Seconds between two runs of refilter_users, rebuilding the engine from the csv files to catch anything
+    the per write updates missed and loading a recommendation table saved since. Writes never run it, they
+    already update the engine one user at a time. Set FLASK_REFILTER_INTERVAL=0 in the .env to only run it
+    at start up.
+"""
+
+engine_writes: RLock = RLock()
+"""
+    Held by a rating or comment route from its csv write until publish_write published it, and by refilter_users
+    while it reads the csv data, so a write is either in both the data a rebuild reads and the engine it replaces,
+    or in neither and applied again to the rebuilt engine, see refilter_writes.
+"""
+
+refilter_writes: Optional[List[Callable[[CollaborativeEngine], CollaborativeEngine]]] = None
+"""
+    The writes published while refilter_users builds an engine from older csv data, None when no rebuild is running
+"""
+
+table_max_stale_writes: int = int(getenv("FLASK_TABLE_MAX_STALE_WRITES", "1000"))
+"""
+    The number of writes after which the precomputed `recommendation_table` stops being read and the
+    `collaborative_engine` answers instead, until `python -m Engine.recommender.precompute` saves a new
+    table and refilter_users loads it. Set FLASK_TABLE_MAX_STALE_WRITES=0 in the .env to stop reading it
+    on the first write.
+"""
+
+
+def load_recommendation_table() -> Optional[RecommendationTable]:
+    """
+    Returns:
+    --------
+        the saved RecommendationTable if it was computed from the current ratings and comments, else None.
+    """
+    table: Optional[artifacts.RecommendationArtifacts] = artifacts.load_recommendation_artifacts(
+        [ratings_csv.filepath, comments_csv.filepath])
+
+    return RecommendationTable(table) if table is not None else None
+
+
+def fresh_recommendation_table(state: EngineSnapshot) -> Optional[RecommendationTable]:
+    """
+    Args:
+    -----
+        state (EngineSnapshot): The snapshot of the request.
+
+    Returns:
+    --------
+        the `recommendation_table` of the snapshot, None if there is none or it missed more than table_max_stale_writes writes.
+    """
+    return state.recommendation_table if state.table_writes <= table_max_stale_writes else None
 
-    global filtered_users
 
-    ratings: Series = ratings_csv.csv_data
-    comments: Series = comments_csv.csv_data
+def refilter_users():
+    """
+    Rebuilds the `collaborative_engine` of the snapshot from the csv files and reloads the `recommendation_table`
+    precomputed by `python -m Engine.recommender.precompute` when it matches ratings.csv and comments.csv. Both are
+    published together as one new snapshot. The table is never computed here, a table the writes made stale stays
+    in the snapshot with its count of missed writes, see table_max_stale_writes, until the job saves a new one.
+    """
+    global refilter_writes
+
+    with engine_writes:
+        ratings: Series = ratings_csv.csv_data
+        user_average_sentiment: Series = user_sentiment.means()
+        refilter_writes = []
 
     """
         Assume these initial ratings and comments csv data
@@ -264,240 +729,381 @@ def refilter_users():
         4       | 300      | Very entertaining  | 0.7
     """
 
-    user_average_sentiment: Series = comments.groupby(
-        "user_id")["sentiment_score"].mean().reset_index()
-    user_average_sentiment.rename(
-        columns={"sentiment_score": "average_sentiment_score"}, inplace=True)
-
     """
-        To easily explain the code above, let me explain reset_index first.
-        reset_index() - sets the old index as a new column while creating a new index
-        DataFrame with a custom index:
-
-            A  B
-            X  1  4
-            Y  2  5
-            Z  3  6
+        Reads the average sentiment score of every user who commented from `user_sentiment`, which every
+        comment write keeps up to date, instead of grouping every comment by the user id again.
 
-        into
-
-        index  A  B
-            0  X  1  4
-            1  Y  2  5
-            2  Z  3  6
-        
-        To explain the two line of code above, it first groups each comment by the user id, averages its sentiment scores, and resets its indexes.
-        Then it renames the column sentiment_score to average_sentiment_score which now contains the averaged sentiment score of all of the users comments.
-        
-            user_id | avg_sentiment_score
+            user_id | sentiment_score
             1       | 0.8
             2       | 0.9
             4       | 0.7
-            5       | NaN
+
+        The engine turns it into two boolean flags per user, has_comments and sentiment_passed, and marks
+        the eligible rating rows in one vectorized pass instead of merging the averages into a copy of every
+        rating and checking the rows one by one:
+
+            user_id | movie_id | rating | eligible
+            1       | 100      | 4.5    | True     (0.8 > 0.5)
+            2       | 100      | 5.0    | True     (0.9 > 0.5)
+            3       | 200      | 4.0    | False    (no comments and 4.0 is not above 4)
+            4       | 300      | 4.5    | True     (0.7 > 0.5)
+            5       | 100      | 4.0    | False    (no comments and 4.0 is not above 4)
+    """
+
+    try:
+        engine: CollaborativeEngine = CollaborativeEngine(ratings, user_average_sentiment, rating_boundery, sentiment_boundery)
+        table: Optional[RecommendationTable] = load_recommendation_table()
+    except Exception:
+        refilter_writes = None
+        raise
+
+    def replace_engine(latest: EngineSnapshot) -> Dict[str, Any]:
+        global refilter_writes
+
+        rebuilt: CollaborativeEngine = engine
+
+        for write in refilter_writes:
+            rebuilt = write(rebuilt)
+
+        changes: Dict[str, Any] = {"collaborative_engine": rebuilt}
+
+        if table is not None:
+            changes.update(recommendation_table=table, table_writes=len(refilter_writes))
+
+        refilter_writes = None
+        return changes
+    """
+        the writes published since the csv data was read are missing from the rebuilt engine, they are applied
+        to it again while publishes are serialized, so none can be published between the replay and the swap
+    """
+
+    # a request that already took the current snapshot keeps using the previous engine until it returns
+    snapshots.update(replace_engine)
+
+
+def publish_write(write: Callable[[CollaborativeEngine], CollaborativeEngine]) -> None:
+    """
+    Publishes a snapshot with the engine a write returns for the latest `collaborative_engine`. The
+    precomputed `recommendation_table` no longer matches the csv files, it is kept and counts one
+    more missed write, see table_max_stale_writes, and the cached similar movies are recomputed in
+    the background. A write published while refilter_users rebuilds the engine is also kept for it
+    to apply again, see engine_writes.
+
+    Args:
+    -----
+        write (Callable): Returns the new engine for the engine of the latest snapshot, ex: a rating added.
+    """
+    def apply_write(latest: EngineSnapshot) -> Dict[str, Any]:
+        if refilter_writes is not None:
+            refilter_writes.append(write)
+
+        return {"collaborative_engine": write(latest.collaborative_engine), "table_writes": latest.table_writes + 1}
+
+    with engine_writes:
+        state: EngineSnapshot = snapshots.update(apply_write)
+
+    similar_movies_cache.invalidate(state.version)
+
+
+def record_rating(user_id: int, movie_id: int, rating: float) -> None:
+    """
+    Updates the `collaborative_engine` right after a rating was written: the liker counts, and the
+    eligible movies of the user, which only costs the number of ratings of that user.
+
+    Args:
+    -----
+        user_id (int): The csv id of the user.
+        movie_id (int): The csv id of the movie.
+        rating (float): The rating given.
+    """
+    publish_write(lambda engine: engine.add_rating(user_id, movie_id, rating, rating_boundery))
+
+
+def forget_ratings(user_id: int, movie_id: int, ratings: Iterable[float]) -> None:
+    """
+    Updates the `collaborative_engine` right after ratings were deleted.
+
+    Args:
+    -----
+        user_id (int): The csv id of the user.
+        movie_id (int): The csv id of the movie.
+        ratings (Iterable[float]): The deleted ratings.
+    """
+    ratings = list(ratings)
+
+    def remove_ratings(engine: CollaborativeEngine) -> CollaborativeEngine:
+        for rating in ratings:
+            engine = engine.remove_rating(user_id, movie_id, rating, rating_boundery)
+
+        return engine
+
+    publish_write(remove_ratings)
+
+
+def record_comment(user_id: int) -> None:
+    """
+    Updates the `collaborative_engine` right after a comment of a user was written, updated or deleted,
+    with the new average sentiment of that user's comments, already updated in `user_sentiment` by the Comment model.
+
+    Args:
+    -----
+        user_id (int): The csv id of the user who commented.
+    """
+    average_sentiment: float = user_sentiment.mean(user_id)
+
+    publish_write(lambda engine: engine.update_sentiment(user_id, average_sentiment, sentiment_boundery))
+
+
+def compute_similar_movies(input_id: int, state: Optional[EngineSnapshot] = None) -> LIST_OF_DICTIONARIES:
+    """
+    Finds the movies that the users who like a movie like far more than everyone else. They are
+    read from the precomputed `recommendation_table` when it has the movie, or computed with the
+    sparse matrices of the `collaborative_engine`.
+
+    The users who like the movie are the users whose rating of it is eligible, see sentiment_boundery, which
+    excludes users who highly upvote a movie to get their bad comments noticed. For every movie more than 10% of them
+    liked, the score is
+
+        similar = share of the users who like the input movie that also like it
+        all     = share of the users liking any of these movies that like it
+        score   = similar / all
+
+    so a movie everybody likes, like The Shawshank Redemption, scores lower than a movie mostly liked
+    by people with the same taste.
+
+    Args:
+    -----
+        input_id (int): The id of the movie to find similar movies to.
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
+
+    Returns:
+    --------
+        a list of at most 10 dictionaries with the movie_id and title of the similar movies,
+        the higher the score, the better the recommendation.
+    """
+    state = state or snapshots.current()
+    table: Optional[RecommendationTable] = fresh_recommendation_table(state)
+    precomputed: Optional[Tuple[ndarray, ndarray]] = table.lookup(input_id) if table is not None else None
+
+    if precomputed is not None:
+        movie_ids, _ = precomputed
+    elif sampled_seed_users > 0:
+        movie_ids = state.collaborative_engine.sampled_similar_movies(input_id, 10, sampled_seed_users).movie_ids
+    else:
+        movie_ids, _ = state.collaborative_engine.similar_movies(input_id, 10)
+
+    return movie_titles(movie_ids, state)
+
+
+def sampling_quality_report(sample_size: int = 2000, seeds: int = 100, k: int = 10) -> Dict[str, Any]:
+    """
+    Compares the sampled similar movies with the exact ones on the most liked movies, the seeds sampling matters for.
+
+    Args:
+    -----
+        sample_size (int): The number of seed users to sample (default is 2000).
+        seeds (int): The number of most liked movies to compare (default is 100).
+        k (int): The number of results compared per movie (default is 10).
+
+    Returns:
+    --------
+        a dictionary with the top k overlap of the sampled seeds and the average latency of both modes in milliseconds.
+    """
+    engine: CollaborativeEngine = snapshots.current().collaborative_engine
+    most_liked: ndarray = engine.movie_ids[engine.eligible_by_movie.lengths.argsort()[::-1][:seeds]]
+    report: Dict[str, Any] = measure_sampling_quality(engine, most_liked.tolist(), k, sample_size)
+
+    print(json.dumps(report, indent=4))
+    return report
+
+
+def movie_titles(movie_ids: ndarray, state: Optional[EngineSnapshot] = None) -> LIST_OF_DICTIONARIES:
     """
+    Args:
+    -----
+        movie_ids (ndarray): Ranked movie ids.
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
-    merged_ratings: DataFrame = ratings.merge(
-        user_average_sentiment, on="user_id", how="left")
+    Returns:
+    --------
+        a list of dictionaries with the movie_id and title of every movie, in the same order.
     """
-        Merges user average sentiment scores with the ratings
-        user_id | movie_id | rating | avg_sentiment_score
-        1       | 100      | 4.5    | 0.8
-        2       | 100      | 5.0    | 0.9
-        3       | 200      | 4.0    | NaN
-        4       | 300      | 4.5    | 0.7
-        5       | 100      | 4.0    | NaN
+    if len(movie_ids) == 0:
+        return []
+
+    state = state or snapshots.current()
+    ranked_movies: DataFrame = DataFrame({"movie_id": movie_ids}).merge(
+        state.movies[["movie_id", "title"]], on="movie_id")
+
+    return ranked_movies.to_dict(orient='records')
+
+
+similar_movies_cache: RefreshingCache = RefreshingCache(compute_similar_movies, maxsize=4096, ttl=6 * 3600)
+"""
+    Results of compute_similar_movies keyed by the movie id, its generation is the version of the snapshot
+    they were computed from. Every publish, after every rating or comment write and every refilter_users, makes
+    the older ones stale, stale results are returned while a background thread recomputes them.
+"""
+
+
+def find_similar_movies(input_id: int, state: Optional[EngineSnapshot] = None) -> LIST_OF_DICTIONARIES:
     """
+    Returns the similar movies of compute_similar_movies through the `similar_movies_cache`, a miss is
+    computed from the snapshot of the request.
+
+    Args:
+    -----
+        input_id (int): The id of the movie to find similar movies to.
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
+
+    Returns:
+    --------
+        a list of at most 10 dictionaries with the movie_id and title of the similar movies.
+    """
+    state = state or snapshots.current()
+    return similar_movies_cache.get(input_id, state, generation=state.version)
 
-    # Update the global variable by applying the filter to get users who meet the criteria
-    filtered_users = merged_ratings[merged_ratings.apply(include_user, axis=1)]
 
 # run the filter on initial start up
 refilter_users()
 
-def find_similar_movies(input_id: int) -> LIST_OF_DICTIONARIES:
+refresh_worker: RefreshWorker = RefreshWorker(refilter_users, interval=refilter_interval if refilter_interval > 0 else None)
+"""
+    The only thread running refilter_users after start up, see refilter_interval
+"""
+refresh_worker.start()
 
-    ratings: DataFrame = ratings_csv.csv_data
-    movie_id: Series = ratings["movie_id"]
-    user_id: Series = ratings["user_id"]
-    rating: Series = ratings["content"]
+als_model: Optional[ALSModel] = None
+"""
+    Embeddings trained offline by `python -m Engine.recommender.als`, loaded the first time they are needed
+"""
 
-    # Get the unique users who meet the criteria
-    users_who_like_a_movie: Series = filtered_users[filtered_users["movie_id"] == input_id]["user_id"].unique(
-    )
+
+def get_als_model() -> Optional[ALSModel]:
     """
-        returns a unique list of ids of users who gave a 5 star rating to the movie you searched and where the average of their comments sentiment score
-        are greater than 50% excluding users who has yet to comment on the movie.
+    Returns:
+    --------
+        the saved ALS model, or None if it was never trained.
+    """
+    global als_model
+
+    if als_model is None:
+        als_model = als.load_model()
+
+    return als_model
 
-        This prevents users who highly upvotes a movie for the purpose of it reaching the top comment and have their bad comments be noticed.
 
-        users_who_like_a_movie = [36,  75,  86 ... 162527 162530 162533]
+def als_similar_movies(input_id: int, state: Optional[EngineSnapshot] = None) -> LIST_OF_DICTIONARIES:
     """
+    Finds the 10 movies whose ALS embeddings are the closest to the embedding of a movie.
+
+    Args:
+    -----
+        input_id (int): The id of the movie to find similar movies to.
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
-    similar_movies_to_users_who_like_a_movie = ratings[(
-        isin(user_id, users_who_like_a_movie)) & (rating > rating_boundery)]["movie_id"]
+    Returns:
+    --------
+        a list of at most 10 dictionaries with the movie_id and title of the similar movies,
+        empty if the model was not trained or does not know the movie.
     """
-        returns movies watched by users who voted 5 starts to the movie you searched
+    model: Optional[ALSModel] = get_als_model()
+
+    if model is None:
+        return []
+
+    movie_ids, _ = model.similar_movies(input_id, 10)
+    return movie_titles(movie_ids, state)
 
-            5101            1
-            5105           34
-            5111          110
-            5114          150
-            5127          260
-                        ...  
-            24998854    60069
-            24998861    67997
-            24998876    78499
-            24998884    81591
-            24998888    88129
+
+def find_first_similar_movies(movie_ids: List[int], state: Optional[EngineSnapshot] = None) -> LIST_OF_DICTIONARIES:
     """
+    Finds the similar movies of the first search result that has some, the only ones recommend uses.
+
+    The search results are read from the `similar_movies_cache` first. Those it misses that no eligible
+    user rated are skipped without counting anything, the rest are read from the precomputed
+    `recommendation_table` when it has them, and the others are computed by `similar_movies_batch`
+    in batches of 1, 2, 4, ... search results. A popular first result costs a single seed while an
+    obscure title still costs a few passes instead of one per search result. Everything computed is
+    written back to the `similar_movies_cache`.
+
+    Args:
+    -----
+        movie_ids (List[int]): The ids of the search results, best first.
+        state (EngineSnapshot): The snapshot of the request (default is the current one).
 
-    # movies that greater than 10% users similar to us liked
-    percentage_of_each_movies_occurence: Series = similar_movies_to_users_who_like_a_movie.value_counts() / \
-        (len(users_who_like_a_movie))
+    Returns:
+    --------
+        a list of at most 10 dictionaries with the movie_id and title of the similar movies of the
+        first search result that has some, empty if none of them has.
     """
-        similar_movies_to_users_who_like_a_movie.value_counts() returns the number of occurences for each movie id 
-        
-        ex: movie_id 1 showed up 18835 times
-
-            1         18835
-            318        8393
-            260        7605
-            356        6973
-            296        6918
-                    ...  
-            128478        1
-            125125        1
-            119701        1
-            107563        1
-            7625          1
-    
-        by dividing it by the length of the ids of user who like the movie we get
+    state = state or snapshots.current()
+    engine: CollaborativeEngine = state.collaborative_engine
+    table: Optional[RecommendationTable] = fresh_recommendation_table(state)
+    batch_size: int = 1
+    waiting: List[int] = []
+
+    for position, movie_id in enumerate(movie_ids):
+        cached: Any = similar_movies_cache.lookup(movie_id)
+
+        if cached is MISSING and engine.has_seed_users(movie_id):
+            waiting.append(movie_id)
+
+        found: bool = cached is not MISSING and len(cached) > 0
+
+        # the waiting search results rank before a cached one found after them, so they are computed first
+        if waiting and (found or len(waiting) >= batch_size or position == len(movie_ids) - 1):
+            for similar_movies in compute_similar_movies_batch(waiting, engine, table, state):
+                if len(similar_movies) > 0:
+                    return similar_movies
+
+            waiting, batch_size = [], batch_size * 2
+
+        if found:
+            return cached
+
+    return []
+
 
-            1         1.000000
-            318       0.445607
-            260       0.403770
-            356       0.370215
-            296       0.367295
-                        ...   
-            128478    0.000053
-            125125    0.000053
-            119701    0.000053
-            107563    0.000053
-            7625      0.000053
+def compute_similar_movies_batch(movie_ids: List[int], engine: CollaborativeEngine, table: Optional[RecommendationTable],
+                                 state: EngineSnapshot) -> List[LIST_OF_DICTIONARIES]:
     """
+    Computes the similar movies of several movies like compute_similar_movies, with one
+    `similar_movies_batch` for those the `recommendation_table` does not have and that are not
+    sampled, and caches them.
 
-    greater_than_10_percent_occurences: Series = percentage_of_each_movies_occurence[
-        percentage_of_each_movies_occurence > .1]
+    Returns:
+    --------
+        the similar movies of every movie, in the order of movie_ids.
     """
-        filters the result to the number of occurences is greater than 10 percent or .1
-        
-            1        1.000000
-            318      0.445607
-            260      0.403770
-            356      0.370215
-            296      0.367295
-                    ...   
-            953      0.103053
-            551      0.101195
-            1222     0.100876
-            745      0.100345
-            48780    0.100186
-    """
-
-    movies_with_greater_than_10_percent_occurences: DataFrame = ratings[isin(
-        movie_id, greater_than_10_percent_occurences.index) & (rating > rating_boundery)]
-    """
-        returns the ratings of the users to the movies with greater than 10 percent occurences
-
-                    user_id  movie_id  rating   timestamp
-            0              1      296     5.0  1147880044
-            29             1     4973     4.5  1147869080
-            48             1     7361     5.0  1147880055
-            72             2      110     5.0  1141416589
-            76             2      260     5.0  1141417172
-            ...          ...      ...     ...         ...
-            25000062  162541     5618     4.5  1240953299
-            25000065  162541     5952     5.0  1240952617
-            25000078  162541     7153     5.0  1240952613
-            25000081  162541     7361     4.5  1240953484
-            25000090  162541    50872     4.5  1240953372
-    """
-
-    greater_than_10_percent_movie_percentages: Series = movies_with_greater_than_10_percent_occurences["movie_id"].value_counts(
-    ) / len(movies_with_greater_than_10_percent_occurences["user_id"].unique())
-    """
-        318      0.342220
-        296      0.284674
-        2571     0.244033
-        356      0.235266
-        593      0.225909
-                ...   
-        551      0.040918
-        50872    0.039111
-        745      0.037031
-        78499    0.035131
-        2355     0.025091
-    """
-
-    """ CREATING A RECOMMENDATION SCORE """
-
-    percentage_comparisons: DataFrame = concat(
-        [greater_than_10_percent_occurences, greater_than_10_percent_movie_percentages], axis=1)
-    percentage_comparisons.columns = ["similar", "all"]
-    """
-                 similar        all
-        movie_id
-        1        1.000000  0.124728
-        318      0.445607  0.342220
-        260      0.403770  0.222207
-        356      0.370215  0.235266
-        296      0.367295  0.284674
-        ...           ...       ...
-        953      0.103053  0.045792
-        551      0.101195  0.040918
-        1222     0.100876  0.066877
-        745      0.100345  0.037031
-        48780    0.100186  0.068314
-
-        movie_id shows all the movies recommended to the user
-        similar shows the score of how much a person similar to the user likes the movie
-        all shows the score of how an average person likes the movie
-    """
-
-    percentage_comparisons["score"]: Series = percentage_comparisons["similar"] / \
-        percentage_comparisons["all"]
-    sorted_percentages: DataFrame = percentage_comparisons.sort_values(
-        "score", ascending=False)
-    """
-        adds a new column called score which contains the ratio between similar and all columns sorted in a descending order
-                    similar       all     score
-            movie_id
-            1        1.000000  0.124728  8.017414
-            318      0.445607  0.342220  1.302105
-            260      0.403770  0.222207  1.817089
-            356      0.370215  0.235266  1.573604
-            296      0.367295  0.284674  1.290232
-            ...           ...       ...       ...
-            953      0.103053  0.045792  2.250441
-            551      0.101195  0.040918  2.473085
-            1222     0.100876  0.066877  1.508376
-            745      0.100345  0.037031  2.709748
-            48780    0.100186  0.068314  1.466543
-
-        The higher the score, the better the recommendation
-    """
-
-    top_10_movie_recommendations: DataFrame = sorted_percentages.head(10).merge(
-        movies_csv.csv_data, left_index=True, right_on="movie_id")[["movie_id", "title"]]
-
-    top_10_movie_recommendations: LIST_OF_DICTIONARIES = top_10_movie_recommendations[[
-        "movie_id", "title"]].to_dict(orient='records')
-
-    return top_10_movie_recommendations
+    found: Dict[int, ndarray] = {}
+
+    for movie_id in movie_ids:
+        precomputed: Optional[Tuple[ndarray, ndarray]] = table.lookup(movie_id) if table is not None else None
+
+        if precomputed is not None:
+            found[movie_id] = precomputed[0]
+
+    # seeds liked by more users than sampled_seed_users are sampled like in compute_similar_movies
+    for movie_id in movie_ids:
+        if movie_id not in found and 0 < sampled_seed_users < engine.seed_user_count(movie_id):
+            found[movie_id] = engine.sampled_similar_movies(movie_id, 10, sampled_seed_users).movie_ids
+
+    computed_ids: List[int] = [movie_id for movie_id in movie_ids if movie_id not in found]
+
+    for movie_id, (similar_ids, _) in zip(computed_ids, engine.similar_movies_batch(computed_ids, 10)):
+        found[movie_id] = similar_ids
+
+    similar_movies: List[LIST_OF_DICTIONARIES] = [movie_titles(found[movie_id], state) for movie_id in movie_ids]
+
+    for movie_id, titles in zip(movie_ids, similar_movies):
+        similar_movies_cache.set(movie_id, titles, generation=state.version)
+
+    return similar_movies
 
 
 @timer
-def recommend(movie_name: str) -> Union[LIST_OF_DICTIONARIES, List]:
+def recommend(movie_name: str, engine: str = COOCCURRENCE_ENGINE) -> Union[LIST_OF_DICTIONARIES, List]:
     """
     The function `recommend` takes a movie name as input, searches for similar movies using
     content-based and collaborative filtering, and returns a recommendation based on the search results.
@@ -506,6 +1112,8 @@ def recommend(movie_name: str) -> Union[LIST_OF_DICTIONARIES, List]:
     -----
         movie_name (str): The `movie_name` parameter is a string that represents the name of the movie for
         which you want to get recommendations.
+        engine (str): "cooccurrence" to use find_similar_movies or "als" to use the ALS embeddings (default is "cooccurrence").
+        The ALS engine falls back to "cooccurrence" when the model was never trained.
 
     Returns:
     --------
@@ -514,14 +1122,43 @@ def recommend(movie_name: str) -> Union[LIST_OF_DICTIONARIES, List]:
         If only content-based recommendations are found, those are returned. 
         If no recommendations are found, an empty list is returned.
     """
-    search_results: DataFrame = search(movie_name)
+    if engine == ALS_ENGINE and get_als_model() is None:
+        print("\n\tThe ALS model was never trained, using co-occurrence instead")
+        engine = COOCCURRENCE_ENGINE
+
+    # every step reads the same snapshot, even if a refilter publishes a new one meanwhile
+    state: EngineSnapshot = snapshots.current()
+    find_similar_movies_with = partial(als_similar_movies if engine == ALS_ENGINE else find_similar_movies, state=state)
+
+    # titles clicked from a list we showed match a movie exactly and skip the search entirely
+    for movie_id in find_exact_movie_ids(movie_name, state):
+
+        similar_movies: LIST_OF_DICTIONARIES = find_similar_movies_with(movie_id)
+
+        if len(similar_movies) > 0:
+            print("\n\tRecommendation returned from an exact title match and Collaborative filtering\n",
+                  json.dumps(similar_movies, indent=4))
+            return similar_movies
+
+    search_results: DataFrame = search(movie_name, state=state)
+
+    # the title shares no word, or only weak ones, with the movies, it is most likely misspelled
+    if search_results.empty or search_results["score"].max() < fuzzy_fallback_score:
+        fuzzy_results: DataFrame = search(movie_name, mode=FUZZY_SEARCH, state=state)
+        search_results = search_results if fuzzy_results.empty else fuzzy_results
 
     if search_results.empty:
         return []
 
-    for movie_id in search_results["movie_id"]:
+    if engine == ALS_ENGINE:
+        candidates_similar_movies: Iterable[LIST_OF_DICTIONARIES] = (als_similar_movies(movie_id, state) for movie_id in search_results["movie_id"])
+        """
+            a generator, so the loop below stops computing at the first search result with similar movies
+        """
+    else:
+        candidates_similar_movies = [find_first_similar_movies(search_results["movie_id"].tolist(), state)]
 
-        similar_movies: LIST_OF_DICTIONARIES = find_similar_movies(movie_id)
+    for similar_movies in candidates_similar_movies:
 
         # return the recommendation found
         if len(similar_movies) > 0:
@@ -538,5 +1175,32 @@ def recommend(movie_name: str) -> Union[LIST_OF_DICTIONARIES, List]:
     return search_result_recommendation
 
 
+@timer
+def recommend_for_user(user_id: int, engine: str = COOCCURRENCE_ENGINE, k: int = 10) -> LIST_OF_DICTIONARIES:
+    """
+    Recommends movies from everything a user liked at once, leaving out the movies the user already rated.
+
+    Args:
+    -----
+        user_id (int): The csv id of the user.
+        engine (str): "cooccurrence" or "als", "als" falls back to "cooccurrence" when the model was never trained (default is "cooccurrence").
+        k (int): The number of movies to return (default is 10).
+
+    Returns:
+    --------
+        a list of at most k dictionaries with the movie_id and title of the recommended movies,
+        empty if the user has not liked any movie yet.
+    """
+    state: EngineSnapshot = snapshots.current()
+    model: Optional[ALSModel] = get_als_model() if engine == ALS_ENGINE else None
+
+    if model is not None:
+        movie_ids, _ = model.movies_for_user(user_id, k, exclude=state.collaborative_engine.rated_movies(user_id))
+    else:
+        movie_ids, _ = state.collaborative_engine.movies_for_user(user_id, k)
+
+    return movie_titles(movie_ids, state)
+
+
 if __name__ == "__main__":
     dataset_helpers.run_simple_io(recommend)
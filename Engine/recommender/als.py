@@ -0,0 +1,293 @@
+"""
+    Implicit feedback matrix factorization (alternating least squares) of the liked ratings.
+
+    Train it offline from the project folder, the embeddings are saved in
+    Engine/recommender/artifacts/als and loaded by `recommend(movie_name, engine="als")`:
+
+        python -m Engine.recommender.als
+"""
+
+from numpy import ndarray, unique, searchsorted, repeat, arange, diff, einsum, eye, full, isin, maximum, zeros, inf, float32, float64, int64
+from .title_search import SEARCH_RESULT, top_k
+from typing import Any, Dict, Optional, Tuple
+from scipy.sparse import csr_matrix
+from numpy.random import default_rng
+from numpy.linalg import norm
+from pandas import DataFrame
+from . import artifacts
+from time import time
+import tracemalloc
+
+
+class ALSModel:
+    """
+        User and movie embeddings such that user . movie is high for the movies a user liked.
+
+        Every liked rating is an observed preference of 1 with a confidence of 1 + alpha, every
+        other (user, movie) pair a preference of 0 with a confidence of 1. Alternating least squares
+        fixes the movie embeddings and solves every user embedding, then the other way around:
+
+            user = (Y'Y + Y'(C - I)Y + regularization * I)^-1  Y'C p
+
+        Each system is solved with a few conjugate gradient steps, for a chunk of users at once,
+        using sparse products over their ratings only, so a pass costs the number of ratings times
+        the number of factors and never builds a factors x factors matrix per user.
+
+        Serving is one matrix vector product over the movie embeddings:
+
+            similar movies of a movie   ->  normalized movie embeddings . its normalized embedding
+            movies for a user           ->  movie embeddings . the user's embedding
+    """
+
+    def __init__(self, user_ids: ndarray, movie_ids: ndarray, user_factors: ndarray, movie_factors: ndarray) -> None:
+        """
+        Args:
+        -----
+            user_ids (ndarray): The sorted user ids, aligned with the rows of user_factors.
+            movie_ids (ndarray): The sorted movie ids, aligned with the rows of movie_factors.
+            user_factors (ndarray): The users x factors float32 embeddings.
+            movie_factors (ndarray): The movies x factors float32 embeddings.
+        """
+        self.user_ids: ndarray = user_ids
+        self.movie_ids: ndarray = movie_ids
+        self.user_factors: ndarray = user_factors
+        self.movie_factors: ndarray = movie_factors
+
+        lengths: ndarray = norm(movie_factors, axis=1, keepdims=True)
+        lengths[lengths == 0] = 1
+        self.normalized_movie_factors: ndarray = (movie_factors / lengths).astype(float32)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+        --------
+            The number of bytes used by the embeddings.
+        """
+        return sum(array.nbytes for array in (self.user_ids, self.movie_ids, self.user_factors, self.movie_factors, self.normalized_movie_factors))
+
+    def _position(self, ids: ndarray, wanted_id: int) -> int:
+        """
+        Returns the row of an id, -1 if the model was trained without it.
+        """
+        position: int = int(searchsorted(ids, wanted_id))
+        return position if position < len(ids) and ids[position] == wanted_id else -1
+
+    def similar_movies(self, movie_id: int, k: int = 10) -> SEARCH_RESULT:
+        """
+        Finds the movies whose embedding points the same way as the embedding of a movie.
+
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+            k (int): The number of movies to return, the seed movie is left out (default is 10).
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) ranked by descending cosine similarity, empty if the model does not know the movie.
+        """
+        position: int = self._position(self.movie_ids, movie_id)
+
+        if position < 0:
+            return top_k(zeros(0, dtype=int64), zeros(0), k)
+
+        scores: ndarray = self.normalized_movie_factors.dot(self.normalized_movie_factors[position])
+        scores[position] = -1
+
+        rows, scores = top_k(arange(len(scores)), scores, k)
+        return self.movie_ids[rows], scores
+
+    def movies_for_user(self, user_id: int, k: int = 10, exclude: Optional[ndarray] = None) -> SEARCH_RESULT:
+        """
+        Ranks the movies for a user by the dot product of their embeddings.
+
+        Args:
+        -----
+            user_id (int): The id of the user.
+            k (int): The number of movies to return (default is 10).
+            exclude (ndarray): The ids of the movies to leave out, ex: the movies the user already rated.
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) ranked by descending score, empty if the model does not know the user.
+        """
+        position: int = self._position(self.user_ids, user_id)
+
+        if position < 0:
+            return top_k(zeros(0, dtype=int64), zeros(0), k)
+
+        scores: ndarray = self.movie_factors.dot(self.user_factors[position])
+
+        if exclude is not None and len(exclude):
+            scores[isin(self.movie_ids, exclude)] = -inf
+
+        rows, scores = top_k(arange(len(scores)), scores, k)
+        finite: ndarray = scores > -inf
+        return self.movie_ids[rows[finite]], scores[finite]
+
+
+def _solve_chunk(confidence: csr_matrix, fixed: ndarray, gram: ndarray, solved: ndarray, cg_steps: int) -> ndarray:
+    """
+    Runs a few conjugate gradient steps on the embeddings of a chunk of rows, starting from their current value.
+
+    Args:
+    -----
+        confidence (csr_matrix): The chunk rows x fixed rows confidences minus 1 of the observed pairs.
+        fixed (ndarray): The embeddings of the other side, held fixed.
+        gram (ndarray): fixed' fixed + regularization * I.
+        solved (ndarray): The current embeddings of the chunk rows.
+        cg_steps (int): The number of conjugate gradient steps.
+
+    Returns:
+    --------
+        the improved embeddings of the chunk rows.
+    """
+    rows: ndarray = repeat(arange(confidence.shape[0]), diff(confidence.indptr))
+    observed: ndarray = fixed[confidence.indices]
+    """
+        observed holds the embedding of the other side of every observed pair of the chunk,
+        a product with (C - I) only needs these rows instead of every fixed embedding
+    """
+
+    def product(vectors: ndarray) -> ndarray:
+        """
+        Computes (Y'Y + Y'(C - I)Y + regularization * I) v for every row of the chunk.
+        """
+        weights: ndarray = confidence.data * einsum("ij,ij->i", observed, vectors[rows])
+        weighted: csr_matrix = csr_matrix((weights, confidence.indices, confidence.indptr), shape=confidence.shape)
+        return vectors.dot(gram) + weighted.dot(fixed)
+
+    targets: ndarray = csr_matrix((confidence.data + 1, confidence.indices, confidence.indptr), shape=confidence.shape).dot(fixed)
+    """
+        Y'C p is the sum of c y over the observed pairs only, the preference being 0 everywhere else
+    """
+
+    solution: ndarray = solved.astype(float64)
+    residual: ndarray = targets - product(solution)
+    direction: ndarray = residual.copy()
+    residual_norms: ndarray = einsum("ij,ij->i", residual, residual)
+
+    for _ in range(cg_steps):
+        step: ndarray = product(direction)
+        curvature: ndarray = einsum("ij,ij->i", direction, step)
+        alpha: ndarray = residual_norms / maximum(curvature, 1e-12)
+
+        solution += alpha[:, None] * direction
+        residual -= alpha[:, None] * step
+
+        new_residual_norms: ndarray = einsum("ij,ij->i", residual, residual)
+        direction = residual + (new_residual_norms / maximum(residual_norms, 1e-12))[:, None] * direction
+        residual_norms = new_residual_norms
+
+    return solution
+
+
+def _solve(confidence: csr_matrix, fixed: ndarray, solved: ndarray, regularization: float, cg_steps: int, chunk_size: int) -> ndarray:
+    """
+    Solves the embeddings of every row of `confidence`, a chunk of rows at a time to bound the memory.
+    """
+    gram: ndarray = fixed.T.dot(fixed) + regularization * eye(fixed.shape[1])
+
+    for start in range(0, confidence.shape[0], chunk_size):
+        end: int = min(start + chunk_size, confidence.shape[0])
+        solved[start:end] = _solve_chunk(confidence[start:end], fixed, gram, solved[start:end], cg_steps)
+
+    return solved
+
+
+def train(ratings: DataFrame, rating_boundery: float, factors: int = 64, iterations: int = 15, regularization: float = 0.05,
+          alpha: float = 20.0, cg_steps: int = 3, chunk_size: int = 4096, seed: int = 0) -> Tuple[ALSModel, Dict[str, Any]]:
+    """
+    Trains the embeddings on the ratings above the rating boundary.
+
+    Args:
+    -----
+        ratings (DataFrame): Every rating, with user_id, movie_id and content columns.
+        rating_boundery (float): A rating above it means the user likes the movie.
+        factors (int): The size of the embeddings (default is 64).
+        iterations (int): The number of alternating passes (default is 15).
+        regularization (float): The L2 penalty on the embeddings (default is 0.05).
+        alpha (float): The extra confidence of a liked movie (default is 20).
+        cg_steps (int): The conjugate gradient steps per pass (default is 3).
+        chunk_size (int): The number of users or movies solved at once (default is 4096).
+        seed (int): The seed of the initial embeddings (default is 0).
+
+    Returns:
+    --------
+        a tuple (model, report), the report holding the training time in seconds and the memory used in bytes.
+    """
+    tracemalloc.start()
+    started: float = time()
+
+    liked: DataFrame = ratings[ratings["content"] > rating_boundery]
+    user_ids, users = unique(liked["user_id"].to_numpy(), return_inverse=True)
+    movie_ids, movies = unique(liked["movie_id"].to_numpy(), return_inverse=True)
+
+    confidence: csr_matrix = csr_matrix(
+        (full(len(users), alpha), (users, movies)), shape=(len(user_ids), len(movie_ids)))
+    """
+        repeated (user, movie) likes are summed into a higher confidence
+    """
+    confidence_by_movie: csr_matrix = confidence.T.tocsr()
+
+    random = default_rng(seed)
+    user_factors: ndarray = random.normal(0, 0.01, (len(user_ids), factors))
+    movie_factors: ndarray = random.normal(0, 0.01, (len(movie_ids), factors))
+
+    for iteration in range(iterations):
+        user_factors = _solve(confidence, movie_factors, user_factors, regularization, cg_steps, chunk_size)
+        movie_factors = _solve(confidence_by_movie, user_factors, movie_factors, regularization, cg_steps, chunk_size)
+        print(f"\tALS iteration {iteration + 1}/{iterations} done after {time() - started:.1f}s")
+
+    model: ALSModel = ALSModel(user_ids, movie_ids, user_factors.astype(float32), movie_factors.astype(float32))
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report: Dict[str, Any] = {
+        "users": len(user_ids),
+        "movies": len(movie_ids),
+        "likes": confidence.nnz,
+        "factors": factors,
+        "iterations": iterations,
+        "training_seconds": time() - started,
+        "training_peak_bytes": peak,
+        "model_bytes": model.nbytes
+    }
+
+    return model, report
+
+
+def save_model(model: ALSModel, source: str, report: Dict[str, Any]) -> None:
+    """
+    Saves the embeddings of a model and its training report.
+
+    Args:
+    -----
+        model (ALSModel): The trained model.
+        source (str): The path of the ratings csv file it was trained on.
+        report (dict): The training report.
+    """
+    artifacts.save_embedding_artifacts(source, artifacts.EmbeddingArtifacts(
+        model.user_ids, model.movie_ids, model.user_factors, model.movie_factors), report)
+
+
+def load_model() -> Optional[ALSModel]:
+    """
+    Returns:
+    --------
+        the saved model with memory mapped embeddings, None if it was never trained.
+    """
+    embeddings: Optional[artifacts.EmbeddingArtifacts] = artifacts.load_embedding_artifacts()
+    return ALSModel(*embeddings) if embeddings is not None else None
+
+
+if __name__ == "__main__":
+    from ..csv_alchemy import ratings as ratings_csv
+    from .boundaries import rating_boundery
+    import json
+
+    trained_model, training_report = train(ratings_csv.csv_data, rating_boundery)
+    save_model(trained_model, ratings_csv.filepath, training_report)
+
+    print(json.dumps(training_report, indent=4))
@@ -0,0 +1,341 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy.sparse import csr_matrix, csc_matrix, spmatrix
+from typing import Any, Dict, List, NamedTuple, Optional
+from numpy import load, save, ndarray
+from os import path, makedirs, replace, getpid
+import hashlib
+import joblib
+import json
+
+FINGERPRINT = Dict[str, Any]
+
+ARTIFACTS_FOLDER: str = path.abspath("Engine/recommender/artifacts")
+TITLE_INDEX_FOLDER: str = path.join(ARTIFACTS_FOLDER, "title_index")
+COMPACT_TITLE_INDEX_FOLDER: str = path.join(ARTIFACTS_FOLDER, "compact_title_index")
+RECOMMENDATION_TABLE_FOLDER: str = path.join(ARTIFACTS_FOLDER, "recommendation_table")
+EMBEDDINGS_FOLDER: str = path.join(ARTIFACTS_FOLDER, "als")
+MANIFEST: str = "manifest.json"
+VECTORIZER: str = "vectorizer.joblib"
+
+
+class TitleArtifacts(NamedTuple):
+    """
+        The fitted title search model as it is stored on disk.
+
+        tfidf is the L2-normalized movies x terms matrix and postings its CSC copy, both backed
+        by memory mapped files so every worker reading them shares one copy in the page cache.
+        columns is only saved with a compact index, it holds the vectorizer column of each column
+        of its pruned matrix.
+    """
+    vectorizer: TfidfVectorizer
+    tfidf: csr_matrix
+    postings: csc_matrix
+    columns: Optional[ndarray] = None
+
+
+def fingerprint(filepath: str, with_hash: bool = True) -> FINGERPRINT:
+    """
+    Describes the current state of a file.
+
+    Args:
+    -----
+        filepath (str): The file to describe.
+        with_hash (bool): Also hash the content of the file (default is True).
+
+    Returns:
+    --------
+        a dictionary with the `size`, `mtime` and, if asked, the `sha256` of the file.
+    """
+    result: FINGERPRINT = {
+        "size": path.getsize(filepath),
+        "mtime": path.getmtime(filepath)
+    }
+
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        result["sha256"] = digest.hexdigest()
+
+    return result
+
+
+def is_fresh(saved: FINGERPRINT, filepath: str) -> bool:
+    """
+    Checks if a file still matches the fingerprint saved with the artifacts.
+
+    The size and modification time are compared first, the file is only hashed when its
+    modification time changed, so touching the file without editing it does not force a refit.
+
+    Args:
+    -----
+        saved (dict): The fingerprint saved in the manifest.
+        filepath (str): The file the artifacts were built from.
+
+    Returns:
+    --------
+        True if the artifacts were built from the current content of the file.
+    """
+    current: FINGERPRINT = fingerprint(filepath, with_hash=False)
+
+    if current["size"] != saved.get("size"):
+        return False
+
+    if current["mtime"] == saved.get("mtime"):
+        return True
+
+    return fingerprint(filepath)["sha256"] == saved.get("sha256")
+
+
+def _save_array(folder: str, name: str, array: ndarray) -> None:
+    """
+    Saves an array next to its final name first and renames it, so a worker starting at the same
+    time never memory maps a half written file.
+    """
+    temporary: str = path.join(folder, f"{name}.{getpid()}.tmp.npy")
+    save(temporary, array)
+    replace(temporary, path.join(folder, f"{name}.npy"))
+
+
+def _load_array(folder: str, name: str) -> ndarray:
+    """
+    Memory maps a saved array in read only mode.
+    """
+    return load(path.join(folder, f"{name}.npy"), mmap_mode="r")
+
+
+def save_title_artifacts(source: str, vectorizer: TfidfVectorizer, tfidf: spmatrix, postings: spmatrix, folder: str = TITLE_INDEX_FOLDER, columns: Optional[ndarray] = None) -> None:
+    """
+    Saves the fitted vectorizer, the normalized TF-IDF matrix and its posting lists, keyed by the
+    fingerprint of the dataset they were built from. The manifest is written last, which makes a
+    complete set of files visible to other workers at once.
+
+    Args:
+    -----
+        source (str): The path of the movies csv file.
+        vectorizer (TfidfVectorizer): The fitted vectorizer.
+        tfidf (spmatrix): The L2-normalized movies x terms matrix.
+        postings (spmatrix): The CSC copy of the matrix used by the inverted index.
+        folder (str): Where to save the artifacts (default is Engine/recommender/artifacts/title_index).
+        columns (ndarray): The vectorizer columns kept in a compact matrix (default is None for the full matrix).
+    """
+    makedirs(folder, exist_ok=True)
+
+    matrix: csr_matrix = csr_matrix(tfidf)
+    posting_lists: csc_matrix = csc_matrix(postings)
+
+    arrays: Dict[str, ndarray] = {
+        "tfidf_data": matrix.data, "tfidf_indices": matrix.indices, "tfidf_indptr": matrix.indptr,
+        "postings_data": posting_lists.data, "postings_indices": posting_lists.indices, "postings_indptr": posting_lists.indptr
+    }
+
+    if columns is not None:
+        arrays["columns"] = columns
+
+    for name, array in arrays.items():
+        _save_array(folder, name, array)
+
+    temporary: str = path.join(folder, f"{VECTORIZER}.{getpid()}.tmp")
+    joblib.dump(vectorizer, temporary)
+    replace(temporary, path.join(folder, VECTORIZER))
+
+    manifest: Dict[str, Any] = {
+        "source": fingerprint(source),
+        "shape": list(matrix.shape),
+        "compact": columns is not None
+    }
+
+    temporary = path.join(folder, f"{MANIFEST}.{getpid()}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=4)
+    replace(temporary, path.join(folder, MANIFEST))
+
+
+def load_title_artifacts(source: str, folder: str = TITLE_INDEX_FOLDER) -> Optional[TitleArtifacts]:
+    """
+    Loads the saved title search model if it was built from the current dataset.
+
+    Args:
+    -----
+        source (str): The path of the movies csv file.
+        folder (str): Where the artifacts were saved (default is Engine/recommender/artifacts/title_index).
+
+    Returns:
+    --------
+        the memory mapped `TitleArtifacts`, or None if they are missing, unreadable or stale.
+    """
+    manifest_path: str = path.join(folder, MANIFEST)
+
+    if not path.exists(manifest_path):
+        return None
+
+    try:
+
+        with open(manifest_path) as file:
+            manifest: Dict[str, Any] = json.load(file)
+
+        if not is_fresh(manifest["source"], source):
+            print("\n\tTitle index artifacts are stale, refitting")
+            return None
+
+        shape = tuple(manifest["shape"])
+
+        tfidf = csr_matrix((
+            _load_array(folder, "tfidf_data"),
+            _load_array(folder, "tfidf_indices"),
+            _load_array(folder, "tfidf_indptr")
+        ), shape=shape, copy=False)
+
+        postings = csc_matrix((
+            _load_array(folder, "postings_data"),
+            _load_array(folder, "postings_indices"),
+            _load_array(folder, "postings_indptr")
+        ), shape=shape, copy=False)
+
+        vectorizer: TfidfVectorizer = joblib.load(path.join(folder, VECTORIZER))
+        columns: Optional[ndarray] = _load_array(folder, "columns") if manifest.get("compact") else None
+
+        return TitleArtifacts(vectorizer, tfidf, postings, columns)
+
+    except (OSError, ValueError, KeyError) as error:
+        print(f"\n\tFailed to load title index artifacts: {str(error)}")
+        return None
+
+
+class RecommendationArtifacts(NamedTuple):
+    """
+        The precomputed item to item recommendations as they are stored on disk.
+
+        The recommendations of movie_ids[i] are recommendations[offsets[i]:offsets[i + 1]],
+        ranked from best to worst, with their scores at the same positions.
+    """
+    movie_ids: ndarray
+    offsets: ndarray
+    recommendations: ndarray
+    scores: ndarray
+
+
+def save_recommendation_artifacts(sources: Dict[str, FINGERPRINT], table: RecommendationArtifacts, folder: str = RECOMMENDATION_TABLE_FOLDER) -> None:
+    """
+    Saves a recommendation table keyed by the fingerprints of the datasets it was computed from.
+    The manifest is written last, which makes a complete table visible to other workers at once.
+
+    Args:
+    -----
+        sources (dict): The path -> fingerprint of every csv file the table depends on, taken before computing it.
+        table (RecommendationArtifacts): The recommendation table.
+        folder (str): Where to save the table (default is Engine/recommender/artifacts/recommendation_table).
+    """
+    makedirs(folder, exist_ok=True)
+
+    for name, array in table._asdict().items():
+        _save_array(folder, name, array)
+
+    manifest: Dict[str, Any] = {
+        "sources": sources,
+        "movies": len(table.movie_ids)
+    }
+
+    temporary: str = path.join(folder, f"{MANIFEST}.{getpid()}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=4)
+    replace(temporary, path.join(folder, MANIFEST))
+
+
+def load_recommendation_artifacts(sources: List[str], folder: str = RECOMMENDATION_TABLE_FOLDER) -> Optional[RecommendationArtifacts]:
+    """
+    Loads the saved recommendation table if it was computed from the current datasets.
+
+    Args:
+    -----
+        sources (List[str]): The paths of every csv file the table depends on.
+        folder (str): Where the table was saved (default is Engine/recommender/artifacts/recommendation_table).
+
+    Returns:
+    --------
+        the memory mapped `RecommendationArtifacts`, or None if they are missing, unreadable or stale.
+    """
+    manifest_path: str = path.join(folder, MANIFEST)
+
+    if not path.exists(manifest_path):
+        return None
+
+    try:
+
+        with open(manifest_path) as file:
+            manifest: Dict[str, Any] = json.load(file)
+
+        saved: Dict[str, FINGERPRINT] = manifest["sources"]
+
+        if set(saved) != set(sources) or not all(is_fresh(saved[source], source) for source in sources):
+            return None
+
+        return RecommendationArtifacts(*(_load_array(folder, name) for name in RecommendationArtifacts._fields))
+
+    except (OSError, ValueError, KeyError) as error:
+        print(f"\n\tFailed to load the recommendation table: {str(error)}")
+        return None
+
+
+class EmbeddingArtifacts(NamedTuple):
+    """
+        The float32 user and movie embeddings of the ALS model as they are stored on disk,
+        the rows of the factors being aligned with the sorted ids.
+    """
+    user_ids: ndarray
+    movie_ids: ndarray
+    user_factors: ndarray
+    movie_factors: ndarray
+
+
+def save_embedding_artifacts(source: str, embeddings: EmbeddingArtifacts, report: Dict[str, Any], folder: str = EMBEDDINGS_FOLDER) -> None:
+    """
+    Saves the embeddings of a trained ALS model along with its training report.
+    The manifest is written last, which makes a complete model visible to other workers at once.
+
+    Args:
+    -----
+        source (str): The path of the ratings csv file the model was trained on.
+        embeddings (EmbeddingArtifacts): The embeddings.
+        report (dict): The training time, memory and settings of the model.
+        folder (str): Where to save the model (default is Engine/recommender/artifacts/als).
+    """
+    makedirs(folder, exist_ok=True)
+
+    for name, array in embeddings._asdict().items():
+        _save_array(folder, name, array)
+
+    manifest: Dict[str, Any] = {
+        "source": fingerprint(source, with_hash=False),
+        "report": report
+    }
+
+    temporary: str = path.join(folder, f"{MANIFEST}.{getpid()}.tmp")
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=4)
+    replace(temporary, path.join(folder, MANIFEST))
+
+
+def load_embedding_artifacts(folder: str = EMBEDDINGS_FOLDER) -> Optional[EmbeddingArtifacts]:
+    """
+    Loads the saved ALS embeddings. They are used even if the ratings changed since the training,
+    the movies and users added since are simply unknown to the model until it is trained again.
+
+    Args:
+    -----
+        folder (str): Where the model was saved (default is Engine/recommender/artifacts/als).
+
+    Returns:
+    --------
+        the memory mapped `EmbeddingArtifacts`, or None if they are missing or unreadable.
+    """
+    if not path.exists(path.join(folder, MANIFEST)):
+        return None
+
+    try:
+        return EmbeddingArtifacts(*(_load_array(folder, name) for name in EmbeddingArtifacts._fields))
+
+    except (OSError, ValueError) as error:
+        print(f"\n\tFailed to load the ALS embeddings: {str(error)}")
+        return None
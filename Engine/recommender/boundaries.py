@@ -0,0 +1,10 @@
+rating_boundery: int = 4
+sentiment_boundery: float = .5
+"""
+    A rating is eligible to seed recommendations if its user has no comments and the rating is above
+    rating_boundery, or if its user's comments average a sentiment score above sentiment_boundery.
+    This excludes users who highly upvote a movie to get their bad comments noticed.
+
+    They live apart from AI so offline jobs like `python -m Engine.recommender.als` can read them
+    without loading the datasets and starting the engine.
+"""
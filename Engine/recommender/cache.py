@@ -0,0 +1,369 @@
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set
+from threading import Condition, Lock, Thread
+from collections import OrderedDict, deque
+from time import monotonic
+
+MISSING = object()
+"""
+    Returned by `LRUCache.get` and `RefreshingCache.lookup` when a key is not cached, since None can be a cached value
+"""
+
+
+class LRUCache:
+    """
+        A bounded, thread safe cache that forgets the least recently used entry when it is full
+        and, if given a time to live, the entries older than it.
+
+        for example::
+
+            cache = LRUCache(maxsize=1024, ttl=300)
+            cache.set("toy story", results)
+
+            cached = cache.get("toy story")
+            if cached is MISSING:
+                ...
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+        -----
+            maxsize (int): The maximum number of entries (default is 1024).
+            ttl (float): The number of seconds an entry stays valid, None keeps it until evicted (default is None).
+        """
+        self.maxsize: int = maxsize
+        self.ttl: Optional[float] = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.lock: Lock = Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached value of a key and marks it as the most recently used.
+
+        Args:
+        -----
+            key (Hashable): The key of the entry.
+
+        Returns:
+        --------
+            the cached value, or `MISSING` if the key is not cached or has expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, stored_at = entry
+
+            if self.ttl is not None and monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Caches a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+        -----
+            key (Hashable): The key of the entry.
+            value (Any): The value to cache.
+        """
+        with self.lock:
+            self.entries[key] = (value, monotonic())
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Forgets every entry, the counters are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+        --------
+            a dictionary with the size of the cache and its hit, miss, eviction and expiration counters.
+        """
+        with self.lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+
+class RefreshingCache:
+    """
+        A bounded cache of values computed from the ratings, that keeps answering with an
+        outdated value while a background thread computes the new one.
+
+        Entries remember the generation of the data they were computed from. `invalidate`
+        starts a new generation after the data changed, ex: after a rating or a comment was
+        written, and entries also go stale after `ttl` seconds. A stale entry is still returned
+        and its key is queued for a single refresh thread, the next lookup gets the refreshed value.
+        A key is queued once however many lookups find it stale, and at most `max_pending` keys
+        wait at a time, the stale keys found while the queue is full are refreshed on a later lookup:
+
+            lookup 7 (stale)  ->  queue [7]
+            lookup 7 (stale)  ->  queue [7]          already queued
+            lookup 9 (stale)  ->  queue [7, 9]       the refresh thread takes 7, then 9
+
+        for example::
+
+            cache = RefreshingCache(find_similar_movies, maxsize=4096, ttl=3600)
+            recommendations = cache.get(movie_id)
+
+            # after a write
+            cache.invalidate()
+    """
+
+    def __init__(self, compute: Callable[[Hashable], Any], maxsize: int = 4096, ttl: Optional[float] = None, max_pending: int = 256) -> None:
+        """
+        Args:
+        -----
+            compute (Callable): Computes the value of a key, called on a miss and by the background refreshes.
+            maxsize (int): The maximum number of entries (default is 4096).
+            ttl (float): The number of seconds an entry stays fresh, None keeps it fresh until invalidated (default is None).
+            max_pending (int): The maximum number of keys waiting for or in a refresh (default is 256).
+        """
+        self.compute: Callable[[Hashable], Any] = compute
+        self.maxsize: int = maxsize
+        self.ttl: Optional[float] = ttl
+        self.max_pending: int = max_pending
+        self.entries: OrderedDict = OrderedDict()
+        self.refreshing: Set[Hashable] = set()
+        self.queue: Deque[Hashable] = deque()
+        self.lock: Lock = Lock()
+        self.queued: Condition = Condition(self.lock)
+        self.thread: Optional[Thread] = None
+        """
+            refreshing holds the keys in the queue and the one being refreshed, so a key is never queued twice
+        """
+
+        self.generation: int = 0
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.refreshes: int = 0
+        self.dropped_refreshes: int = 0
+        self.stale_age_total: float = 0.0
+        self.stale_age_max: float = 0.0
+
+    def _store(self, key: Hashable, value: Any, generation: int, stored_at: float) -> None:
+        """
+        Caches a value unless a newer one was stored meanwhile, evicting the least recently used entries.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[1] > generation:
+                return
+
+            self.entries[key] = (value, generation, stored_at)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _schedule(self, key: Hashable) -> None:
+        """
+        Queues a stale key for the refresh thread, started the first time, called with the lock held.
+        """
+        if key in self.refreshing:
+            return
+
+        if len(self.refreshing) >= self.max_pending:
+            self.dropped_refreshes += 1
+            return
+
+        self.refreshing.add(key)
+        self.queue.append(key)
+        self.queued.notify()
+
+        if self.thread is None:
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        """
+        The loop of the refresh thread, refreshing the queued keys one at a time.
+        """
+        while True:
+            with self.queued:
+                while not self.queue:
+                    self.queued.wait()
+
+                key: Hashable = self.queue.popleft()
+
+            self._refresh(key)
+
+    def _refresh(self, key: Hashable) -> None:
+        """
+        Recomputes a stale entry, runs in the refresh thread.
+        """
+        try:
+            generation: int = self.generation
+            stored_at: float = monotonic()
+            self._store(key, self.compute(key), generation, stored_at)
+
+            with self.lock:
+                self.refreshes += 1
+
+        except Exception as error:
+            print(f"\n\tFailed to refresh {key}: {str(error)}")
+
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def lookup(self, key: Hashable) -> Any:
+        """
+        Returns the value of a key without computing it on a miss, refreshing it in the background if it is stale.
+
+        Args:
+        -----
+            key (Hashable): The key of the entry.
+
+        Returns:
+        --------
+            the cached value, possibly stale, or `MISSING` if the key is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                value, generation, stored_at = entry
+                age: float = monotonic() - stored_at
+                self.entries.move_to_end(key)
+
+                if generation == self.generation and (self.ttl is None or age <= self.ttl):
+                    self.hits += 1
+                    return value
+
+                self.stale_hits += 1
+                self.stale_age_total += age
+                self.stale_age_max = max(self.stale_age_max, age)
+
+                # a single refresh per key, every other request keeps getting the stale value meanwhile
+                self._schedule(key)
+
+                return value
+
+            self.misses += 1
+            return MISSING
+
+    def get(self, key: Hashable, *args: Any, generation: Optional[int] = None) -> Any:
+        """
+        Returns the value of a key, computing it on a miss and refreshing it in the background if it is stale.
+
+        Args:
+        -----
+            key (Hashable): The key of the entry.
+            args: More arguments of compute on a miss, ex: the snapshot of the request, refreshes only pass the key.
+            generation (int): The generation the arguments are from, None is the current one (default is None).
+
+        Returns:
+        --------
+            the cached value, possibly stale, or the newly computed value.
+        """
+        value: Any = self.lookup(key)
+
+        if value is not MISSING:
+            return value
+
+        if generation is None:
+            with self.lock:
+                generation = self.generation
+
+        stored_at: float = monotonic()
+        value = self.compute(key, *args)
+        self.set(key, value, generation, stored_at)
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None, stored_at: Optional[float] = None) -> None:
+        """
+        Caches a value computed outside of the cache, ex: by a batch of several keys.
+
+        Args:
+        -----
+            key (Hashable): The key of the entry.
+            value (Any): The value of the key.
+            generation (int): The generation the value was computed from, None is the current one (default is None).
+            stored_at (float): The monotonic time the computation started, None is now (default is None).
+        """
+        with self.lock:
+            current: int = self.generation
+
+        generation = current if generation is None else min(generation, current)
+        self._store(key, value, generation, monotonic() if stored_at is None else stored_at)
+
+    def invalidate(self, generation: Optional[int] = None) -> None:
+        """
+        Marks every entry as stale, they are refreshed the next time they are requested.
+
+        Args:
+        -----
+            generation (int): The version of the data the entries are computed from, ex: an EngineSnapshot
+            version. Entries of older versions become stale, None just moves to the next generation (default is None).
+        """
+        with self.lock:
+            self.generation = max(self.generation + 1 if generation is None else generation, self.generation)
+
+    def clear(self) -> None:
+        """
+        Forgets every entry, the counters are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+        --------
+            a dictionary with the size of the cache, its hit, stale hit, miss, eviction and refresh
+            counters, the refreshes waiting and dropped because too many were, and the staleness in seconds of the stale values it returned and of its oldest entry.
+        """
+        with self.lock:
+            now: float = monotonic()
+            lookups: int = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "generation": self.generation,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refreshing": len(self.refreshing),
+                "dropped_refreshes": self.dropped_refreshes,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "fresh_hit_ratio": self.hits / lookups if lookups else 0.0,
+                "average_stale_age": self.stale_age_total / self.stale_hits if self.stale_hits else 0.0,
+                "max_stale_age": self.stale_age_max,
+                "oldest_entry_age": max((now - stored_at for _, _, stored_at in self.entries.values()), default=0.0)
+            }
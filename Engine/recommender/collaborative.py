@@ -0,0 +1,861 @@
+from numpy import ndarray, array, arange, concatenate, unique, bincount, flatnonzero, searchsorted, partition, lexsort, repeat, sqrt, clip, where, isin, isnan, union1d, insert, delete, argsort, full, zeros, empty, bool_, float64, int64
+from .posting_lists import PostingLists
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from pandas import DataFrame, Series
+from numpy.random import default_rng
+from copy import copy
+from time import perf_counter
+
+SIMILAR_SHARE: float = .1
+"""
+    A movie is only a candidate if more than this share of the users who like the seed movie also like it
+"""
+
+
+class SampledSimilarMovies(NamedTuple):
+    """
+        The result of CollaborativeEngine.sampled_similar_movies.
+
+        similar_lower and similar_upper bound the similar share of every movie, the share of all
+        the seed users who like it, from the share measured on the sample. sampled is False when
+        the seed had too few users to sample and the result is exact.
+    """
+    movie_ids: ndarray
+    scores: ndarray
+    similar_lower: ndarray
+    similar_upper: ndarray
+    seed_users: int
+    sampled: bool
+
+
+class CollaborativeEngine:
+    """
+        The ratings as posting lists, built once so that finding the movies similar to a seed
+        never scans the whole ratings table.
+
+        User and movie ids are remapped to dense positions, so the lists have no empty entries
+        for ids that were never used:
+
+            user_ids  = [1, 2, 4, 9]      ->  positions 0, 1, 2, 3
+            movie_ids = [1, 32, 318]      ->  positions 0, 1, 2
+
+        liked_by_user       user  -> the movies the user rated above the rating boundary
+        liked_by_movie      movie -> the users who rated it above the rating boundary
+        rated_by_user       user  -> every movie the user rated
+        eligible_by_movie   movie -> the users who rated it and pass the sentiment filter
+
+        For a seed movie the score of a candidate movie is
+
+            similar = share of the eligible users liking the seed who also like the candidate
+            all     = liked_counts[candidate] / total_likers
+            score   = similar / all
+
+        all does not depend on the seed, it is one gather from liked_counts. The pandas version of
+        find_similar_movies divided by the users liking any candidate instead of every liker, which
+        is the same number for every candidate of a seed, so the ranking is the same.
+    """
+
+    def __init__(self, ratings: DataFrame, average_sentiment: Series, rating_boundery: float, sentiment_boundery: float) -> None:
+        """
+        Args:
+        -----
+            ratings (DataFrame): Every rating, with user_id, movie_id and content columns.
+            average_sentiment (Series): The average sentiment score of the comments of every user who commented, indexed by user id.
+            rating_boundery (float): A rating above it means the user likes the movie.
+            sentiment_boundery (float): An average sentiment above it makes every rating of a user who commented eligible.
+        """
+        self.user_ids, users = unique(ratings["user_id"].to_numpy(), return_inverse=True)
+        self.movie_ids, movies = unique(ratings["movie_id"].to_numpy(), return_inverse=True)
+
+        likes: ndarray = ratings["content"].to_numpy() > rating_boundery
+        self.liked_by_user: PostingLists = PostingLists(users[likes], movies[likes], len(self.user_ids))
+        self.liked_by_movie: PostingLists = PostingLists(movies[likes], users[likes], len(self.movie_ids))
+        self.rated_by_user: PostingLists = PostingLists(users, movies, len(self.user_ids))
+        """
+            duplicated (user, movie) ratings are kept, so a movie liked twice by a user counts twice
+            like it did in value_counts
+        """
+        self.liked_counts: ndarray = self.liked_by_movie.lengths
+        self.user_liked_counts: ndarray = self.liked_by_user.lengths
+        self.total_likers: int = int((self.user_liked_counts > 0).sum())
+        self.changed_liked_counts: Dict[int, int] = {}
+        self.changed_user_liked_counts: Dict[int, int] = {}
+        """
+            liked_counts[movie] is the number of ratings above the boundary of every movie and
+            total_likers the number of users with at least one of them when the engine was built.
+            The counts a write changed are kept in changed_liked_counts by movie position and in
+            changed_user_liked_counts by user id, users who were not rated when the engine was built
+            included, see liked_counts_of.
+        """
+
+        average_sentiment = average_sentiment.dropna()
+        commenters: ndarray = searchsorted(self.user_ids, average_sentiment.index.to_numpy())
+        known: ndarray = commenters < len(self.user_ids)
+        known[known] = self.user_ids[commenters[known]] == average_sentiment.index.to_numpy()[known]
+
+        self.user_has_comments: ndarray = zeros(len(self.user_ids), dtype=bool_)
+        self.user_sentiment_passed: ndarray = zeros(len(self.user_ids), dtype=bool_)
+        self.user_has_comments[commenters[known]] = True
+        self.user_sentiment_passed[commenters[known]] = average_sentiment.to_numpy()[known] > sentiment_boundery
+        """
+            one flag pair per user instead of the average sentiment merged into every rating,
+            a user who commented is eligible for all their ratings or none of them
+        """
+
+        eligible: ndarray = where(self.user_has_comments[users], self.user_sentiment_passed[users], likes)
+        """
+            the sentiment filter of every rating row at once:
+
+            user_id | content | has_comments | sentiment_passed | eligible
+            1       | 4.5     | True         | True             | True
+            3       | 4.0     | False        | False            | False   (4.0 is not above the rating boundary)
+            5       | 3.0     | True         | True             | True    (the rating does not matter once the user commented)
+        """
+        self.eligible_by_movie: PostingLists = PostingLists(movies[eligible], users[eligible], len(self.movie_ids))
+
+        self.changed_sentiment: Dict[int, Tuple[bool, bool]] = {}
+        self.changed_rated: Dict[int, ndarray] = {}
+        self.changed_liked: Dict[int, ndarray] = {}
+        self.eligible_overrides: Dict[int, ndarray] = {}
+        self.eligible_overlay: Dict[int, frozenset] = {}
+        self.overridden_users: ndarray = empty(0, dtype=int64)
+        """
+            An engine is never modified once built. A write returns a copy sharing the posting lists
+            with the changes since the rebuild copied and updated, see _copy, so a request keeps reading
+            the engine of its snapshot while writes publish new ones.
+
+            The posting lists are never rewritten between two rebuilds. A write keeps the current sorted
+            rated and liked movies of its user in changed_rated and changed_liked, which rated_by and
+            liked_by read instead of the posting lists, and recomputes the eligible movies of that user
+            from them into eligible_overrides. The users of overridden_users are then skipped in
+            eligible_by_movie and read from eligible_overlay:
+
+                eligible_by_movie   movie 7 -> users [1, 4, 9]
+                overridden_users    [4]
+                eligible_overlay    movie 7 -> {}          ->  seed users of movie 7 = [1, 9]
+        """
+
+    def user_position(self, user_id: int) -> int:
+        """
+        Args:
+        -----
+            user_id (int): The id of the user.
+
+        Returns:
+        --------
+            the position of the user, -1 if the user never rated a movie.
+        """
+        position: int = int(searchsorted(self.user_ids, user_id))
+
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+
+        return -1
+
+    def movie_position(self, movie_id: int) -> int:
+        """
+        Args:
+        -----
+            movie_id (int): The id of the movie.
+
+        Returns:
+        --------
+            the column of the movie, -1 if it was never rated.
+        """
+        position: int = int(searchsorted(self.movie_ids, movie_id))
+
+        if position < len(self.movie_ids) and self.movie_ids[position] == movie_id:
+            return position
+
+        return -1
+
+    def seed_users(self, position: int) -> ndarray:
+        """
+        Args:
+        -----
+            position (int): The column of the seed movie.
+
+        Returns:
+        --------
+            the sorted positions of the eligible users who rated the movie, with the writes since the engine was built.
+        """
+        seed_users: ndarray = unique(self.eligible_by_movie.get(position))
+        overridden_users: ndarray = self.overridden_users
+
+        if len(overridden_users) == 0:
+            return seed_users
+
+        overlay: ndarray = array(sorted(self.eligible_overlay.get(position, ())), dtype=int64)
+        return union1d(seed_users[~isin(seed_users, overridden_users)], overlay)
+
+    def liked_counts_of(self, movies: ndarray) -> ndarray:
+        """
+        Args:
+        -----
+            movies (ndarray): The positions of the movies.
+
+        Returns:
+        --------
+            the number of ratings above the boundary of every movie, with the writes since the engine was built.
+        """
+        counts: ndarray = self.liked_counts[movies]
+        changed_liked_counts: Dict[int, int] = self.changed_liked_counts
+
+        if changed_liked_counts:
+            for index in flatnonzero(isin(movies, list(changed_liked_counts))).tolist():
+                counts[index] = changed_liked_counts[int(movies[index])]
+
+        return counts
+
+    def user_liked_count(self, user_id: int) -> int:
+        """
+        Args:
+        -----
+            user_id (int): The id of the user.
+
+        Returns:
+        --------
+            the number of ratings above the boundary of the user, with the writes since the engine was built.
+        """
+        changed: Optional[int] = self.changed_user_liked_counts.get(user_id)
+
+        if changed is not None:
+            return changed
+
+        position: int = self.user_position(user_id)
+        return int(self.user_liked_counts[position]) if position >= 0 else 0
+
+    def sentiment_flags(self, user: int) -> Tuple[bool, bool]:
+        """
+        Returns:
+        --------
+            a tuple (has_comments, sentiment_passed) of a user, with the writes since the engine was built.
+        """
+        changed: Optional[Tuple[bool, bool]] = self.changed_sentiment.get(user)
+        return changed if changed is not None else (bool(self.user_has_comments[user]), bool(self.user_sentiment_passed[user]))
+
+    def rated_by(self, user: int) -> ndarray:
+        """
+        Returns the sorted positions of every movie a user rated, with the writes since the engine was built.
+        """
+        changed: Optional[ndarray] = self.changed_rated.get(user)
+        return changed if changed is not None else self.rated_by_user.get(user)
+
+    def liked_by(self, user: int) -> ndarray:
+        """
+        Returns the sorted positions of the movies a user liked, with the writes since the engine was built.
+        """
+        changed: Optional[ndarray] = self.changed_liked.get(user)
+        return changed if changed is not None else self.liked_by_user.get(user)
+
+    def gather_likes(self, users: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Decodes the liked movies of many users at once like PostingLists.gather, reading the users
+        changed by a write from changed_liked.
+
+        Args:
+        -----
+            users (ndarray): The positions of the users.
+
+        Returns:
+        --------
+            a tuple (movies, lengths) of the liked movies of the users one after the other, and how many each one liked.
+        """
+        values, lengths = self.liked_by_user.gather(users)
+        overridden_users: ndarray = self.overridden_users
+
+        if len(overridden_users) == 0:
+            return values, lengths
+
+        changed: ndarray = flatnonzero(isin(users, overridden_users))
+
+        if len(changed) == 0:
+            return values, lengths
+
+        owners: ndarray = repeat(arange(len(users)), lengths)
+        kept: ndarray = ~isin(owners, changed)
+        changed_likes: List[ndarray] = [self.liked_by(int(users[position])) for position in changed]
+
+        lengths = lengths.copy()
+        lengths[changed] = [len(likes) for likes in changed_likes]
+
+        values = concatenate([values[kept]] + changed_likes).astype(int64)
+        owners = concatenate([owners[kept]] + [full(len(likes), position, dtype=int64) for position, likes in zip(changed, changed_likes)])
+        """
+            the current likes of the changed users replace theirs and everything is put back in the
+            order of the users, so lengths still tells which user every like belongs to
+        """
+
+        return values[argsort(owners, kind="stable")], lengths
+
+    def _copy(self) -> "CollaborativeEngine":
+        """
+        Returns a copy of the engine sharing its posting lists and flags, with its own dictionaries of
+        the changes since the rebuild, which costs the number of changes instead of the number of ratings.
+        """
+        engine: CollaborativeEngine = copy(self)
+        engine.changed_liked_counts = dict(self.changed_liked_counts)
+        engine.changed_user_liked_counts = dict(self.changed_user_liked_counts)
+        engine.changed_sentiment = dict(self.changed_sentiment)
+        engine.changed_rated = dict(self.changed_rated)
+        engine.changed_liked = dict(self.changed_liked)
+        engine.eligible_overrides = dict(self.eligible_overrides)
+        engine.eligible_overlay = dict(self.eligible_overlay)
+        return engine
+
+    def add_rating(self, user_id: int, movie_id: int, rating: float, rating_boundery: float) -> "CollaborativeEngine":
+        """
+        Counts a new rating in the liker counts and in the eligibility of its user.
+
+        Args:
+        -----
+            user_id (int): The id of the user who rated.
+            movie_id (int): The id of the rated movie.
+            rating (float): The rating given.
+            rating_boundery (float): A rating above it means the user likes the movie.
+
+        Returns:
+        --------
+            a new engine with the rating, this one is left as it is.
+        """
+        return self._change_rating(user_id, movie_id, rating > rating_boundery, 1)
+
+    def remove_rating(self, user_id: int, movie_id: int, rating: float, rating_boundery: float) -> "CollaborativeEngine":
+        """
+        Removes a deleted rating from the liker counts and from the eligibility of its user.
+
+        Args:
+        -----
+            user_id (int): The id of the user who rated.
+            movie_id (int): The id of the rated movie.
+            rating (float): The deleted rating.
+            rating_boundery (float): A rating above it means the user likes the movie.
+
+        Returns:
+        --------
+            a new engine without the rating, this one is left as it is.
+        """
+        return self._change_rating(user_id, movie_id, rating > rating_boundery, -1)
+
+    def _change_rating(self, user_id: int, movie_id: int, liked: bool, change: int) -> "CollaborativeEngine":
+        """
+        Returns a new engine with a rating row of a user for a movie added or removed and the eligible movies of the user recomputed.
+        """
+        engine: CollaborativeEngine = self._copy()
+
+        if liked:
+            engine._count_like(user_id, movie_id, change)
+
+        user: int = self.user_position(user_id)
+        movie: int = self.movie_position(movie_id)
+
+        if user < 0 or movie < 0:
+            return engine
+
+        engine.changed_rated[user] = changed_row(self.rated_by(user), movie, change)
+
+        if liked:
+            engine.changed_liked[user] = changed_row(self.liked_by(user), movie, change)
+
+        engine._override_eligibility(user)
+        return engine
+
+    def update_sentiment(self, user_id: int, average_sentiment: float, sentiment_boundery: float) -> "CollaborativeEngine":
+        """
+        Updates the sentiment flags of a user after one of their comments was written, which makes
+        all or none of their ratings eligible.
+
+        Args:
+        -----
+            user_id (int): The id of the user who commented.
+            average_sentiment (float): The new average sentiment of the user's comments, NaN if they have none left.
+            sentiment_boundery (float): An average sentiment above it makes every rating of the user eligible.
+
+        Returns:
+        --------
+            a new engine with the sentiment flags of the user, this one is left as it is.
+        """
+        user: int = self.user_position(user_id)
+
+        if user < 0:
+            return self
+
+        engine: CollaborativeEngine = self._copy()
+        engine.changed_sentiment[user] = (not isnan(average_sentiment), bool(average_sentiment > sentiment_boundery))
+        engine._override_eligibility(user)
+        return engine
+
+    def _override_eligibility(self, user: int) -> None:
+        """
+        Recomputes the eligible movies of a user from their own ratings only, in the number of ratings
+        of the user, and moves the user in eligible_overlay, called on the new engine of a write.
+        """
+        has_comments, sentiment_passed = self.sentiment_flags(user)
+
+        if not has_comments:
+            eligible_movies: ndarray = unique(self.liked_by(user))
+        elif sentiment_passed:
+            eligible_movies = unique(self.rated_by(user))
+        else:
+            eligible_movies = empty(0, dtype=int64)
+
+        for movie in self.eligible_overrides.get(user, empty(0, dtype=int64)).tolist():
+            self.eligible_overlay[movie] = self.eligible_overlay[movie] - {user}
+
+        for movie in eligible_movies.tolist():
+            self.eligible_overlay[movie] = self.eligible_overlay.get(movie, frozenset()) | {user}
+
+        self.eligible_overrides[user] = eligible_movies
+        self.overridden_users = union1d(self.overridden_users, [user])
+        """
+            the overlay sets and overridden_users are replaced instead of modified in place,
+            since the engine the write was copied from shares them
+        """
+
+    def similar_movies(self, movie_id: int, k: int = 10) -> Tuple[ndarray, ndarray]:
+        """
+        Finds the movies liked by the users who like the seed movie, far more than by everyone else.
+
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+            k (int): The number of movies to return (default is 10).
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) ranked by descending score, ties are ranked by the lower movie id.
+            Both are empty if no eligible user likes the seed movie.
+        """
+        position: int = self.movie_position(movie_id)
+
+        if position < 0:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        seed_users: ndarray = self.seed_users(position)
+
+        if len(seed_users) == 0:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        liked_by_seed_users, _ = self.gather_likes(seed_users)
+        counts: ndarray = bincount(liked_by_seed_users, minlength=len(self.movie_ids))
+
+        return self._rank(counts, len(seed_users), k)
+
+    def sampled_similar_movies(self, movie_id: int, k: int = 10, sample_size: int = 2000, seed: int = 0, z: float = 1.96) -> SampledSimilarMovies:
+        """
+        Runs similar_movies on a random sample of the seed users, so a blockbuster seed costs the
+        same as a seed with sample_size users.
+
+        The similar share measured on the sample comes with a Wilson score interval, narrowed by the
+        finite population correction since the sample is drawn without replacement from the seed users.
+        A seed with at most sample_size users is not sampled and its result is exact.
+
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+            k (int): The number of movies to return (default is 10).
+            sample_size (int): The number of seed users to sample (default is 2000).
+            seed (int): The seed of the sample, so the same seed movie always gets the same result (default is 0).
+            z (float): The normal quantile of the confidence bounds, 1.96 for 95% (default is 1.96).
+
+        Returns:
+        --------
+            the SampledSimilarMovies, ranked like similar_movies.
+        """
+        position: int = self.movie_position(movie_id)
+        seed_users: ndarray = self.seed_users(position) if position >= 0 else empty(0, dtype=int64)
+        population: int = len(seed_users)
+
+        if population <= sample_size:
+            movie_ids, scores = self.similar_movies(movie_id, k)
+            return SampledSimilarMovies(movie_ids, scores, *self._similar_shares(movie_ids, seed_users), population, False)
+
+        sample: ndarray = seed_users[default_rng(seed).choice(population, sample_size, replace=False)]
+        liked_by_sample, _ = self.gather_likes(sample)
+        counts: ndarray = bincount(liked_by_sample, minlength=len(self.movie_ids))
+        movie_ids, scores = self._rank(counts, sample_size, k)
+
+        shares: ndarray = counts[searchsorted(self.movie_ids, movie_ids)] / sample_size
+        effective_size: float = sample_size * (population - 1) / (population - sample_size)
+        """
+            the finite population correction as a larger sample size, so a share of 0 or 1 still gets a bound of 0 or 1
+        """
+        variance: ndarray = clip(shares * (1 - shares), 0, None)
+        """
+            a user who rated a movie twice counts twice, so a share can go above 1 like in similar_movies
+        """
+        denominator: float = 1 + z ** 2 / effective_size
+        center: ndarray = (shares + z ** 2 / (2 * effective_size)) / denominator
+        margin: ndarray = z * sqrt(variance / effective_size + z ** 2 / (4 * effective_size ** 2)) / denominator
+
+        return SampledSimilarMovies(movie_ids, scores, clip(center - margin, 0, 1), clip(center + margin, 0, 1), population, True)
+
+    def _similar_shares(self, movie_ids: ndarray, seed_users: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Computes the exact similar shares of a few movies, as both bounds of an exact result.
+        """
+        if len(movie_ids) == 0 or len(seed_users) == 0:
+            return empty(0, dtype=float64), empty(0, dtype=float64)
+
+        liked_by_seed_users, _ = self.gather_likes(seed_users)
+        shares: ndarray = bincount(liked_by_seed_users, minlength=len(self.movie_ids))[searchsorted(self.movie_ids, movie_ids)] / len(seed_users)
+        return shares, shares
+
+    def has_seed_users(self, movie_id: int) -> bool:
+        """
+        Tells without any counting if similar_movies can return something for a movie, a movie that
+        no eligible user rated never has similar movies.
+
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+
+        Returns:
+        --------
+            True if at least one eligible user rated the movie.
+        """
+        position: int = self.movie_position(movie_id)
+
+        if position < 0:
+            return False
+
+        return self.eligible_by_movie.count(position) > 0 if len(self.overridden_users) == 0 else len(self.seed_users(position)) > 0
+
+    def seed_user_count(self, movie_id: int) -> int:
+        """
+        Tells how many seed users a movie has, to choose between similar_movies and sampled_similar_movies.
+        Without writes since the rebuild it is read from the posting list length, a user who rated the movie
+        twice counting twice.
+
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+
+        Returns:
+        --------
+            the number of eligible ratings of the movie, 0 if it was never rated.
+        """
+        position: int = self.movie_position(movie_id)
+
+        if position < 0:
+            return 0
+
+        return self.eligible_by_movie.count(position) if len(self.overridden_users) == 0 else len(self.seed_users(position))
+
+    def similar_movies_batch(self, movie_ids: List[int], k: int = 10) -> List[Tuple[ndarray, ndarray]]:
+        """
+        Runs similar_movies for several seed movies with a single gather and a single count.
+
+        The liked movies of the seed users of every seed are gathered at once and counted into a
+        seeds x movies matrix, each row is then ranked like in similar_movies.
+
+        Args:
+        -----
+            movie_ids (List[int]): The ids of the seed movies.
+            k (int): The number of movies to return per seed (default is 10).
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) per seed, in the order of the seeds, like similar_movies returns them.
+        """
+        seeds: List[ndarray] = []
+
+        for movie_id in movie_ids:
+            position: int = self.movie_position(movie_id)
+            seeds.append(self.seed_users(position) if position >= 0 else empty(0, dtype=int64))
+
+        seed_counts: ndarray = array([len(seed_users) for seed_users in seeds], dtype=int64)
+
+        if seed_counts.sum() == 0:
+            return [(empty(0, dtype=int64), empty(0, dtype=float64)) for _ in movie_ids]
+
+        liked_by_seed_users, lengths = self.gather_likes(concatenate(seeds))
+        seed_of_like: ndarray = repeat(repeat(arange(len(seeds)), seed_counts), lengths)
+        """
+            seed_of_like tells which seed every gathered like belongs to, so one bincount fills the
+            counts of every seed:
+
+                seed 0 -> users [4, 9]    likes [1, 7 | 7]  ->  seed_of_like [0, 0, 0]
+                seed 1 -> users [2]       likes [3, 7]      ->  seed_of_like [1, 1]
+        """
+        n_movies: int = len(self.movie_ids)
+        counts: ndarray = bincount(seed_of_like * n_movies + liked_by_seed_users, minlength=len(seeds) * n_movies).reshape(len(seeds), n_movies)
+
+        return [
+            self._rank(counts[seed], int(seed_counts[seed]), k) if seed_counts[seed] else (empty(0, dtype=int64), empty(0, dtype=float64))
+            for seed in range(len(seeds))
+        ]
+
+    def movies_for_user(self, user_id: int, k: int = 10) -> Tuple[ndarray, ndarray]:
+        """
+        Finds the movies liked by the users who share the user's taste, over every movie the user liked at once.
+
+        Every eligible user who rated a movie the user liked is a seed user, weighted by how many of
+        the user's liked movies they rated, so the score is the one of similar_movies with all the
+        liked movies as seeds:
+
+            similar = weighted share of the seed users who like the candidate
+            score   = similar / all
+
+        Args:
+        -----
+            user_id (int): The id of the user.
+            k (int): The number of movies to return (default is 10).
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) ranked by descending score, without any movie the user already rated.
+            Both are empty if the user likes no movie yet.
+        """
+        user: int = self.user_position(user_id)
+
+        if user < 0:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        liked_movies: ndarray = unique(self.liked_by(user))
+        seed_users: ndarray = self.eligible_by_movie.gather(liked_movies)[0]
+        overridden_users: ndarray = self.overridden_users
+
+        if len(overridden_users):
+            overlay: List[int] = [user for movie in liked_movies.tolist() for user in self.eligible_overlay.get(movie, ())]
+            seed_users = concatenate([seed_users[~isin(seed_users, overridden_users)], array(overlay, dtype=int64)])
+
+        seed_users, weights = unique(seed_users, return_counts=True)
+
+        others: ndarray = seed_users != user
+        seed_users, weights = seed_users[others], weights[others]
+
+        if len(seed_users) == 0:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        liked_by_seed_users, lengths = self.gather_likes(seed_users)
+        counts: ndarray = bincount(liked_by_seed_users, weights=repeat(weights, lengths), minlength=len(self.movie_ids))
+        counts[self.rated_by(user)] = 0
+        """
+            the movies the user already rated, liked or not, are never recommended back
+        """
+
+        return self._rank(counts, int(weights.sum()), k)
+
+    def _rank(self, counts: ndarray, seed_users: int, k: int) -> Tuple[ndarray, ndarray]:
+        """
+        Scores the movies liked by more than SIMILAR_SHARE of the seed users and keeps the k best.
+
+        Args:
+        -----
+            counts (ndarray): The number of seed users who like every movie.
+            seed_users (int): The number of seed users.
+            k (int): The number of movies to return.
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) ranked by descending score, ties are ranked by the lower movie id.
+        """
+        candidates: ndarray = flatnonzero(counts / seed_users > SIMILAR_SHARE)
+
+        if len(candidates) == 0:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        scores: ndarray = (counts[candidates] * max(self.total_likers, 1)) / (seed_users * self.liked_counts_of(candidates))
+        """
+            similar / all written as one division of two integers, so movies whose scores are the
+            same fraction get exactly the same float and are ranked by id
+        """
+        candidate_ids: ndarray = self.movie_ids[candidates]
+
+        if len(scores) > k:
+            kth_score: float = -partition(-scores, k - 1)[k - 1]
+            winners: ndarray = scores >= kth_score
+            candidate_ids, scores = candidate_ids[winners], scores[winners]
+            """
+                keeps every movie tied with the k-th score so the ties are ranked by id below,
+                instead of by whichever the partition happened to put first
+            """
+
+        order: ndarray = lexsort((candidate_ids, -scores))[:k]
+        return candidate_ids[order], scores[order]
+
+    def add_like(self, user_id: int, movie_id: int) -> "CollaborativeEngine":
+        """
+        Counts a new rating above the rating boundary in the liker counts.
+
+        Args:
+        -----
+            user_id (int): The id of the user who rated.
+            movie_id (int): The id of the rated movie.
+
+        Returns:
+        --------
+            a new engine with the like counted, this one is left as it is.
+        """
+        engine: CollaborativeEngine = self._copy()
+        engine._count_like(user_id, movie_id, 1)
+        return engine
+
+    def remove_like(self, user_id: int, movie_id: int) -> "CollaborativeEngine":
+        """
+        Removes a deleted rating above the rating boundary from the liker counts.
+
+        Args:
+        -----
+            user_id (int): The id of the user who rated.
+            movie_id (int): The id of the rated movie.
+
+        Returns:
+        --------
+            a new engine without the like, this one is left as it is.
+        """
+        engine: CollaborativeEngine = self._copy()
+        engine._count_like(user_id, movie_id, -1)
+        return engine
+
+    def _count_like(self, user_id: int, movie_id: int, change: int) -> None:
+        """
+        Adds change to the liker count of a movie and of a user, and to the total likers
+        when the user gets their first or loses their last liked movie, called on the new engine of a write.
+        """
+        movie: int = self.movie_position(movie_id)
+
+        if movie >= 0:
+            self.changed_liked_counts[movie] = max(int(self.liked_counts_of(array([movie]))[0]) + change, 0)
+
+        before: int = self.user_liked_count(user_id)
+        after: int = max(before + change, 0)
+
+        self.changed_user_liked_counts[user_id] = after
+        self.total_likers += (after > 0) - (before > 0)
+
+    def who_liked(self, movie_id: int) -> ndarray:
+        """
+        Args:
+        -----
+            movie_id (int): The id of the movie.
+
+        Returns:
+        --------
+            the sorted ids of the users who rated the movie above the rating boundary.
+        """
+        position: int = self.movie_position(movie_id)
+
+        if position < 0:
+            return empty(0, dtype=int64)
+
+        return self.user_ids[unique(self.liked_by_movie.get(position))]
+
+    def liked_movies(self, user_id: int) -> ndarray:
+        """
+        Args:
+        -----
+            user_id (int): The id of the user.
+
+        Returns:
+        --------
+            the sorted ids of the movies the user rated above the rating boundary.
+        """
+        position: int = self.user_position(user_id)
+
+        if position < 0:
+            return empty(0, dtype=int64)
+
+        return self.movie_ids[unique(self.liked_by(position))]
+
+    def rated_movies(self, user_id: int) -> ndarray:
+        """
+        Args:
+        -----
+            user_id (int): The id of the user.
+
+        Returns:
+        --------
+            the sorted ids of every movie the user rated.
+        """
+        position: int = self.user_position(user_id)
+
+        if position < 0:
+            return empty(0, dtype=int64)
+
+        return self.movie_ids[unique(self.rated_by(position))]
+
+    def liked_by_both(self, first_movie_id: int, second_movie_id: int) -> ndarray:
+        """
+        Args:
+        -----
+            first_movie_id (int): The id of a movie.
+            second_movie_id (int): The id of another movie.
+
+        Returns:
+        --------
+            the sorted ids of the users who liked both movies.
+        """
+        first: int = self.movie_position(first_movie_id)
+        second: int = self.movie_position(second_movie_id)
+
+        if first < 0 or second < 0:
+            return empty(0, dtype=int64)
+
+        return self.user_ids[self.liked_by_movie.intersect(first, second)]
+
+
+def changed_row(movies: ndarray, movie: int, change: int) -> ndarray:
+    """
+    Args:
+    -----
+        movies (ndarray): The sorted movies of a user, a movie rated twice being there twice.
+        movie (int): The position of the movie of a rating row.
+        change (int): 1 to add the row, -1 to remove it.
+
+    Returns:
+    --------
+        a sorted copy of the movies with the row added or removed.
+    """
+    position: int = int(searchsorted(movies, movie))
+
+    if change > 0:
+        return insert(movies, position, movie).astype(int64)
+
+    if position < len(movies) and movies[position] == movie:
+        return delete(movies, position).astype(int64)
+
+    return movies
+
+
+def measure_sampling_quality(engine: CollaborativeEngine, movie_ids: List[int], k: int = 10, sample_size: int = 2000) -> Dict[str, float]:
+    """
+    Compares sampled_similar_movies with similar_movies on a list of seed movies.
+
+    Args:
+    -----
+        engine (CollaborativeEngine): The engine.
+        movie_ids (List[int]): The seed movies, ex: the most rated movies.
+        k (int): The number of movies compared per seed (default is 10).
+        sample_size (int): The number of seed users to sample (default is 2000).
+
+    Returns:
+    --------
+        a dictionary with the number of seeds that were sampled, the average overlap of the top k of both
+        modes over the sampled seeds, 1 meaning identical movies, and the average latency of both modes in milliseconds.
+    """
+    overlaps: List[float] = []
+    exact_seconds: float = 0.0
+    sampled_seconds: float = 0.0
+
+    for movie_id in movie_ids:
+        started: float = perf_counter()
+        exact_ids, _ = engine.similar_movies(movie_id, k)
+        exact_seconds += perf_counter() - started
+
+        started = perf_counter()
+        sampled: SampledSimilarMovies = engine.sampled_similar_movies(movie_id, k, sample_size)
+        sampled_seconds += perf_counter() - started
+
+        if sampled.sampled and len(exact_ids):
+            overlaps.append(len(set(exact_ids.tolist()) & set(sampled.movie_ids.tolist())) / len(exact_ids))
+
+    return {
+        "seeds": len(movie_ids),
+        "sampled_seeds": len(overlaps),
+        "sample_size": sample_size,
+        f"top_{k}_overlap": sum(overlaps) / len(overlaps) if overlaps else 1.0,
+        "exact_ms": 1000 * exact_seconds / max(len(movie_ids), 1),
+        "sampled_ms": 1000 * sampled_seconds / max(len(movie_ids), 1)
+    }
@@ -0,0 +1,92 @@
+from Engine.dataset_helpers import clean_title
+from typing import Dict, Iterable, List
+from copy import copy
+
+
+def normalize_title(title: str) -> str:
+    """
+    Turns a title into the key of the exact title index, so "Toy Story (1995)", "Toy Story 1995"
+    and "toy  story 1995" are all the same title.
+
+    Args:
+    -----
+        title (str): The title as typed or as stored in movies.csv.
+
+    Returns:
+    --------
+        the clean, lowercased title with single spaces.
+    """
+    return " ".join(clean_title(str(title)).lower().split())
+
+
+class ExactTitleIndex:
+    """
+        Hash index from a normalized title to the rows of the movies having it.
+
+        Most titles sent to the recommender were clicked from a list we showed, so they match a
+        movie exactly and can be resolved with one dictionary lookup instead of a TF-IDF search
+        or a scan of the whole title column. Some titles are shared by several movies, which is
+        why every key holds a list of rows.
+
+            "toy story 1995"     -> [0]
+            "emma 1996"          -> [828, 35452]
+    """
+
+    def __init__(self, titles: Iterable[str]) -> None:
+        """
+        Args:
+        -----
+            titles (Iterable[str]): The titles, in the same order as the movie rows.
+        """
+        self.rows: Dict[str, List[int]] = {}
+        self.size: int = 0
+        self.add(titles)
+
+    def add(self, titles: Iterable[str]) -> None:
+        """
+        Appends titles, their rows continue after the last indexed row.
+
+        Args:
+        -----
+            titles (Iterable[str]): The titles of the new movies, in the order of their movie rows.
+        """
+        for title in titles:
+            self.rows.setdefault(normalize_title(title), []).append(self.size)
+            self.size += 1
+
+    def appended(self, titles: Iterable[str]) -> "ExactTitleIndex":
+        """
+        Returns a new index with titles appended like add, this one is left as it is for the snapshots
+        reading it. Only the dictionary is copied, the titles already indexed are not normalized again.
+
+        Args:
+        -----
+            titles (Iterable[str]): The titles of the new movies, in the order of their movie rows.
+
+        Returns:
+        --------
+            the new index.
+        """
+        index: ExactTitleIndex = copy(self)
+        index.rows = dict(self.rows)
+
+        for title in titles:
+            key: str = normalize_title(title)
+            index.rows[key] = index.rows.get(key, []) + [index.size]
+            index.size += 1
+
+        return index
+
+    def lookup(self, title: str) -> List[int]:
+        """
+        Finds the movies having exactly this title.
+
+        Args:
+        -----
+            title (str): The title to look for.
+
+        Returns:
+        --------
+            the rows of the matching movies, empty if there are none.
+        """
+        return self.rows.get(normalize_title(title), [])
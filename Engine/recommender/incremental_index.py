@@ -0,0 +1,221 @@
+from numpy import ndarray, asarray, zeros, ones, log, sqrt, add, concatenate, empty, float64, int64
+from sklearn.feature_extraction.text import HashingVectorizer
+from scipy.sparse import csr_matrix, coo_matrix, vstack
+from .title_search import InvertedTitleIndex, SEARCH_RESULT, top_k
+from typing import Iterable, List, Tuple
+from threading import RLock
+from copy import copy
+
+MAX_TAIL_BLOCKS: int = 32
+
+
+class IncrementalTitleIndex:
+    """
+        TF-IDF title search that can learn new movies without refitting.
+
+        The fitted `TfidfVectorizer` only knows the words it saw when it was fitted, so the words
+        of a new movie are dropped. Here titles are turned into features by hashing their unigrams
+        and bigrams, which never needs a vocabulary, and the document frequency of every feature
+        is counted as titles come in.
+
+        The titles live in two parts:
+
+            base  ->  a CSC posting list index of the raw term counts, rebuilt on `refresh`
+            tail  ->  the titles added since the last refresh, kept as a few small CSR blocks
+
+        Adding a title only touches its own row, the IDF weights and the row norms are brought
+        up to date by `refresh`, which runs every `refresh_every` added titles or on request.
+        Until then new titles are scored with the IDF weights of the last refresh.
+    """
+
+    def __init__(self, titles: Iterable[str], n_features: int = 2 ** 20, refresh_every: int = 1000) -> None:
+        """
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles, in the same order as the movie rows.
+            n_features (int): The number of hashed features (default is 2 ** 20).
+            refresh_every (int): Refresh the IDF weights after this many added titles (default is 1000).
+        """
+        self.hasher: HashingVectorizer = HashingVectorizer(
+            ngram_range=(1, 2), n_features=n_features, alternate_sign=False, norm=None)
+        self.refresh_every: int = refresh_every
+        self.lock: RLock = RLock()
+
+        self.document_frequency: ndarray = zeros(n_features, dtype=int64)
+        self.document_count: int = 0
+        self.idf: ndarray = ones(n_features, dtype=float64)
+
+        self.base: InvertedTitleIndex = InvertedTitleIndex(csr_matrix((0, n_features)))
+        self.base_norms: ndarray = empty(0, dtype=float64)
+        self.tail: List[csr_matrix] = []
+        self.tail_norms: List[ndarray] = []
+        self.tail_size: int = 0
+
+        self.add(titles)
+        self.refresh()
+
+    @property
+    def size(self) -> int:
+        """
+        Returns:
+        --------
+            The number of titles in the index.
+        """
+        return self.base.size + self.tail_size
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns:
+        --------
+            The number of titles added since the last refresh.
+        """
+        return self.tail_size
+
+    def _row_norms(self, counts: csr_matrix) -> ndarray:
+        """
+        Computes the L2 norm of TF-IDF rows from their raw term counts and the current IDF weights.
+        """
+        weighted: csr_matrix = counts.multiply(self.idf).tocsr()
+        norms: ndarray = sqrt(asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return norms
+
+    def add(self, titles: Iterable[str]) -> Tuple[int, int]:
+        """
+        Appends titles to the index in time proportional to the new titles only.
+
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles of the new movies, in the order of their movie rows.
+
+        Returns:
+        --------
+            a tuple (first, last + 1) of the rows given to the new titles.
+        """
+        counts: csr_matrix = csr_matrix(self.hasher.transform(list(titles)))
+
+        with self.lock:
+            first_row: int = self.size
+
+            if counts.shape[0] == 0:
+                return first_row, first_row
+
+            # every (title, feature) pair is stored once, so each stored index is one more document
+            add.at(self.document_frequency, counts.indices, 1)
+            self.document_count += counts.shape[0]
+
+            self.tail.append(counts)
+            self.tail_norms.append(self._row_norms(counts))
+            self.tail_size += counts.shape[0]
+
+            # titles added one by one are merged so a query never loops over too many small blocks
+            if len(self.tail) > MAX_TAIL_BLOCKS:
+                self.tail = [vstack(self.tail, format="csr")]
+                self.tail_norms = [concatenate(self.tail_norms)]
+
+            if self.tail_size >= self.refresh_every:
+                self.refresh()
+
+            return first_row, first_row + counts.shape[0]
+
+    def appended(self, titles: Iterable[str]) -> "IncrementalTitleIndex":
+        """
+        Returns a new index with titles appended like add, this one is left as it is for the snapshots
+        reading it. The posting lists and the tail blocks are shared, only the document frequencies and
+        the list of tail blocks are copied.
+
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles of the new movies, in the order of their movie rows.
+
+        Returns:
+        --------
+            the new index.
+        """
+        with self.lock:
+            index: IncrementalTitleIndex = copy(self)
+            index.lock = RLock()
+            index.document_frequency = self.document_frequency.copy()
+            index.tail = list(self.tail)
+            index.tail_norms = list(self.tail_norms)
+
+        index.add(titles)
+        return index
+
+    def refresh(self) -> None:
+        """
+        Recomputes the IDF weights from the maintained document frequencies, folds the added
+        titles into the base posting lists and recomputes every row norm. This is the only step
+        that costs time proportional to the whole catalog, so it is meant to run on a schedule.
+
+        The IDF is the same smoothed IDF as sklearn's `TfidfVectorizer`:
+
+            idf = ln((1 + documents) / (1 + document frequency)) + 1
+        """
+        with self.lock:
+            self.idf = log((1 + self.document_count) / (1 + self.document_frequency)) + 1
+
+            if self.tail:
+                counts: csr_matrix = vstack([self.base.matrix.tocsr()] + self.tail, format="csr")
+                self.base = InvertedTitleIndex(counts)
+                self.tail = []
+                self.tail_norms = []
+                self.tail_size = 0
+
+            self.base_norms = self._row_norms(self.base.matrix.tocsr())
+
+    def score(self, title: str) -> SEARCH_RESULT:
+        """
+        Scores a title against every indexed title sharing at least one hashed term with it.
+
+        Args:
+        -----
+            title (str): The clean query.
+
+        Returns:
+        --------
+            a tuple (rows, scores) of cosine similarities, unsorted.
+        """
+        query: csr_matrix = csr_matrix(self.hasher.transform([title])).multiply(self.idf).tocsr()
+        query_norm: float = float(sqrt(query.multiply(query).sum())) or 1.0
+        query = query.multiply(self.idf / query_norm).tocsr()
+        """
+            The indexed rows hold raw term counts, so the query carries the IDF weight of the
+            indexed side as well
+
+                score = sum(query tf-idf * idf * indexed count) / indexed row norm
+        """
+
+        with self.lock:
+            rows, scores = self.base.score(query)
+            matched_rows: List[ndarray] = [rows]
+            matched_scores: List[ndarray] = [scores / self.base_norms[rows]]
+
+            first_row: int = self.base.size
+            for block, norms in zip(self.tail, self.tail_norms):
+                block_scores: coo_matrix = block.dot(query.T).tocoo()
+                matched_rows.append(block_scores.row.astype(int64) + first_row)
+                matched_scores.append(block_scores.data / norms[block_scores.row])
+                first_row += block.shape[0]
+
+            rows = concatenate(matched_rows)
+            scores = concatenate(matched_scores)
+
+        return rows, scores
+
+    def search(self, title: str, k: int = 10) -> SEARCH_RESULT:
+        """
+        Finds the k titles closest to the query.
+
+        Args:
+        -----
+            title (str): The clean query.
+            k (int): The number of titles to return (default is 10).
+
+        Returns:
+        --------
+            a tuple (rows, scores) of at most k titles ranked by descending cosine similarity.
+        """
+        rows, scores = self.score(title)
+        return top_k(rows, scores, k)
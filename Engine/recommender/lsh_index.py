@@ -0,0 +1,257 @@
+from numpy import ndarray, array, argsort, searchsorted, concatenate, unique, zeros, arange, insert, float32, int8, int64
+from numpy.random import default_rng
+from .title_search import TitleSearchEngine, SEARCH_RESULT, top_k
+from scipy.sparse import spmatrix, csr_matrix
+from typing import Any, Dict, List
+from time import perf_counter
+from copy import copy
+
+PROJECTION_CHUNK: int = 4096
+
+
+class RandomProjectionIndex:
+    """
+        Approximate title search with signed random projections (SimHash).
+
+        Every title vector is projected on `n_bits` random directions per table and only the sign
+        of each projection is kept, giving a short binary code. Titles with a small angle between
+        them agree on most signs, so they tend to land in the same bucket:
+
+            table 0:  "toy story 1995"   -> 0b10110100
+                      "toy story 2 1999" -> 0b10110100
+                      "heat 1995"        -> 0b01001110
+
+        A search only scores the titles sharing a bucket with the query in at least one table,
+        plus the buckets one bit away from it when `probe_radius` is 1, and ranks them exactly.
+
+        Recall is tuned with three knobs:
+
+            n_tables      more tables      -> more candidates, higher recall, slower
+            n_bits        more bits        -> smaller buckets, lower recall, faster
+            probe_radius  1 instead of 0   -> n_bits more buckets per table, higher recall, slower
+
+        Buckets hold about catalog size / 2 ** n_bits titles, so a bigger catalog needs more bits to
+        stay fast and more tables to keep its recall. The top 10 of a title often holds weak matches
+        that only share a word with it, which are the ones the buckets miss first. Use
+        `measure_recall` to see where a setting lands against the exact search.
+
+        Measured by measure_recall on 62,000 generated titles (136,102 terms), 300 titles as queries:
+
+            n_tables  n_bits  probe_radius  recall@1  recall@10  titles scored  approximate  exact
+            16        8       1             -         0.78       44%            7.4 ms       0.7 ms
+            8         10      1             -         0.44       8.5%           2.1 ms       0.7 ms
+            16        12      1             -         0.39       5.2%           1.9 ms       0.6 ms
+            8         16      0             0.92      0.15       < 0.1%         0.8 ms       0.6 ms
+            8         16      1             0.93      0.18       0.2%           1.0 ms       0.6 ms
+
+        With few bits the probed buckets pull in a large share of the catalog and cost more than the
+        exact inverted index. The defaults keep buckets small, so a search scores almost nothing but
+        the near duplicates of the query: it finds the title itself, not the weak matches of a top 10.
+        The exact search stays faster at this catalog size.
+
+        The random directions take terms x n_tables x n_bits bytes, 16.6 MB for the defaults above.
+    """
+
+    def __init__(self, engine: TitleSearchEngine, n_tables: int = 8, n_bits: int = 16, probe_radius: int = 0, seed: int = 0) -> None:
+        """
+        Args:
+        -----
+            engine (TitleSearchEngine): The exact engine, its normalized matrix is hashed and used to re-rank candidates.
+            n_tables (int): The number of hash tables (default is 8).
+            n_bits (int): The number of bits of every bucket code, at most 62 (default is 16).
+            probe_radius (int): 0 looks in the query bucket only, 1 also in the buckets one bit away (default is 0).
+            seed (int): The seed of the random directions, so every worker builds the same tables (default is 0).
+        """
+        if not 0 < n_bits <= 62:
+            raise ValueError("n_bits must be between 1 and 62")
+
+        if probe_radius not in (0, 1):
+            raise ValueError("probe_radius must be 0 or 1")
+
+        self.engine: TitleSearchEngine = engine
+        self.n_tables: int = n_tables
+        self.n_bits: int = n_bits
+        self.probe_radius: int = probe_radius
+
+        self.directions: ndarray = default_rng(seed).integers(0, 2, (engine.matrix.shape[1], n_tables * n_bits), dtype=int8) * 2 - 1
+        """
+            One random +1 / -1 direction per bit, stored as terms x (n_tables * n_bits) int8, a quarter of
+            gaussian float32 directions. Only the rows of the terms of a title are read to project it.
+            Directions with zeros would be smaller still, but a title only has a handful of terms and
+            would project to exactly 0 on many of them, putting most titles in the same bucket.
+        """
+
+        codes: ndarray = self._codes(engine.matrix)
+        self.orders: List[ndarray] = [argsort(codes[:, table], kind="stable") for table in range(n_tables)]
+        self.codes: List[ndarray] = [codes[order, table] for table, order in enumerate(self.orders)]
+        """
+            Every table is a sorted array of codes along with the rows having them, so a bucket is
+            the slice between two binary searches instead of a dictionary of lists
+        """
+
+    def _codes(self, vectors: spmatrix) -> ndarray:
+        """
+        Hashes vectors into one code per table.
+
+        Returns:
+        --------
+            an (n_vectors, n_tables) array of integer codes.
+        """
+        vectors = csr_matrix(vectors)
+        codes: ndarray = zeros((vectors.shape[0], self.n_tables), dtype=int64)
+
+        for start in range(0, vectors.shape[0], PROJECTION_CHUNK):
+            chunk: csr_matrix = vectors[start:start + PROJECTION_CHUNK]
+            terms: csr_matrix = csr_matrix((chunk.data, arange(chunk.nnz), chunk.indptr), shape=(chunk.shape[0], chunk.nnz))
+            signs: ndarray = (terms.dot(self.directions[chunk.indices].astype(float32)) > 0).reshape(chunk.shape[0], self.n_tables, self.n_bits)
+            """
+                terms picks the weight of every stored term of a row, so the product only converts the
+                directions of the terms of the chunk to float32 instead of the whole terms x bits table
+            """
+
+            for bit in range(self.n_bits):
+                codes[start:start + chunk.shape[0]] |= signs[:, :, bit].astype(int64) << bit
+
+        return codes
+
+    def appended(self, engine: TitleSearchEngine) -> "RandomProjectionIndex":
+        """
+        Returns a new index over an engine made by appending rows to the engine of this one, this one
+        is left as it is for the snapshots reading it. Only the new rows are hashed and inserted in the
+        sorted codes of every table.
+
+        Args:
+        -----
+            engine (TitleSearchEngine): The engine with the new rows after the rows of the current one.
+
+        Returns:
+        --------
+            the new index.
+        """
+        first_row: int = self.engine.size
+        codes: ndarray = self._codes(engine.matrix[first_row:])
+        rows: ndarray = arange(first_row, engine.size, dtype=int64)
+
+        index: RandomProjectionIndex = copy(self)
+        index.engine = engine
+        index.orders = []
+        index.codes = []
+
+        for table in range(self.n_tables):
+            order: ndarray = argsort(codes[:, table], kind="stable")
+            positions: ndarray = searchsorted(self.codes[table], codes[order, table], side="right")
+            index.orders.append(insert(self.orders[table], positions, rows[order]))
+            index.codes.append(insert(self.codes[table], positions, codes[order, table]))
+            """
+                the new rows go after the rows of the same code, like the stable sort of a rebuild puts the higher rows last
+            """
+
+        return index
+
+    def _probes(self, code: int) -> ndarray:
+        """
+        Returns the bucket codes to look in for a query code.
+        """
+        if self.probe_radius == 0:
+            return array([code], dtype=int64)
+
+        return concatenate(([code], code ^ (1 << arange(self.n_bits, dtype=int64))))
+
+    def candidates(self, query_vector: spmatrix) -> ndarray:
+        """
+        Finds the rows sharing a probed bucket with an already projected query.
+
+        Args:
+        -----
+            query_vector (spmatrix): The normalized query, as returned by `TitleSearchEngine.project`.
+
+        Returns:
+        --------
+            the sorted candidate rows.
+        """
+        query_codes: ndarray = self._codes(query_vector)[0]
+        found: List[ndarray] = []
+
+        for table in range(self.n_tables):
+            probes: ndarray = self._probes(int(query_codes[table]))
+            starts: ndarray = searchsorted(self.codes[table], probes, side="left")
+            ends: ndarray = searchsorted(self.codes[table], probes, side="right")
+
+            for start, end in zip(starts[ends > starts], ends[ends > starts]):
+                found.append(self.orders[table][start:end])
+
+        return unique(concatenate(found)) if found else arange(0, dtype=int64)
+
+    def search(self, query_vector: spmatrix, k: int = 10) -> SEARCH_RESULT:
+        """
+        Finds about the k titles closest to the query, only scoring the candidates of its buckets.
+
+        Args:
+        -----
+            query_vector (spmatrix): A 1 x terms vector from the fitted vectorizer.
+            k (int): The number of titles to return (default is 10).
+
+        Returns:
+        --------
+            a tuple (rows, scores) of at most k titles ranked by descending cosine similarity.
+        """
+        query: csr_matrix = self.engine.project(query_vector)
+        rows: ndarray = self.candidates(query)
+
+        if len(rows) == 0:
+            return top_k(rows, rows.astype(float), k)
+
+        scores: ndarray = self.engine.matrix[rows].dot(query.T).toarray().ravel()
+        matched: ndarray = scores > 0
+
+        return top_k(rows[matched], scores[matched], k)
+
+
+def measure_recall(index: RandomProjectionIndex, query_vectors: spmatrix, k: int = 10) -> Dict[str, Any]:
+    """
+    Compares the approximate search of an index with the exact search of its engine.
+
+    Args:
+    -----
+        index (RandomProjectionIndex): The approximate index.
+        query_vectors (spmatrix): The queries, ex: a sample of the titles.
+        k (int): The number of results compared per query (default is 10).
+
+    Returns:
+    --------
+        a dictionary with the settings of the index, its recall@k, meaning the share of the exact
+        top k that the approximate search also returned, the average share of the titles its buckets
+        made it score and the average latency of both searches in milliseconds.
+    """
+    queries: csr_matrix = csr_matrix(query_vectors)
+    recalls: List[float] = []
+    candidates: int = 0
+    exact_seconds: float = 0.0
+    approximate_seconds: float = 0.0
+
+    for row in range(queries.shape[0]):
+        query: csr_matrix = queries[row]
+
+        started: float = perf_counter()
+        exact_rows, _ = index.engine.search(query, k)
+        exact_seconds += perf_counter() - started
+
+        started = perf_counter()
+        approximate_rows, _ = index.search(query, k)
+        approximate_seconds += perf_counter() - started
+
+        candidates += len(index.candidates(index.engine.project(query)))
+
+        if len(exact_rows):
+            recalls.append(len(set(exact_rows.tolist()) & set(approximate_rows.tolist())) / len(exact_rows))
+
+    return {
+        "n_tables": index.n_tables,
+        "n_bits": index.n_bits,
+        "probe_radius": index.probe_radius,
+        "queries": len(recalls),
+        f"recall_at_{k}": sum(recalls) / len(recalls) if recalls else 1.0,
+        "candidate_share": candidates / max(queries.shape[0], 1) / max(index.engine.size, 1),
+        "exact_ms": 1000 * exact_seconds / max(queries.shape[0], 1),
+        "approximate_ms": 1000 * approximate_seconds / max(queries.shape[0], 1)
+    }
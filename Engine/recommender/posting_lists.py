@@ -0,0 +1,156 @@
+from numpy import ndarray, asarray, lexsort, bincount, cumsum, diff, repeat, arange, intersect1d, zeros, empty, uint8, uint16, uint32, uint64, int64
+from typing import Tuple
+
+DELTA_TYPES = (uint8, uint16, uint32, uint64)
+
+
+class PostingLists:
+    """
+        A sorted list of values for every key, ex: movie -> the users who liked it,
+        stored as delta encoded numpy arrays.
+
+        The keys are dense positions 0 .. size - 1. Every list is sorted and stored as its first
+        value plus the gaps between consecutive values, the gaps of all lists being one array of
+        the smallest unsigned type they fit in:
+
+            movie 0 -> users [3, 7, 8, 20]   ->  heads [3, ...]   deltas [0, 4, 1, 12, ...]
+            movie 1 -> users [1, 2]          ->  heads [1, ...]   deltas [0, 1, ...]
+
+        A popular movie has its users close to each other, so most gaps fit in 8 or 16 bits
+        instead of the 32 or 64 bits of the ids themselves. Reading a list only touches its own
+        gaps, so a lookup costs the length of the list and never the size of the ratings.
+        Repeated values are kept, they are stored as a gap of 0.
+    """
+
+    def __init__(self, keys: ndarray, values: ndarray, size: int) -> None:
+        """
+        Args:
+        -----
+            keys (ndarray): The key of every pair, between 0 and size - 1.
+            values (ndarray): The non negative value of every pair.
+            size (int): The number of keys.
+        """
+        keys = asarray(keys, dtype=int64)
+        values = asarray(values, dtype=int64)
+
+        order: ndarray = lexsort((values, keys))
+        keys, values = keys[order], values[order]
+
+        self.offsets: ndarray = zeros(size + 1, dtype=int64)
+        cumsum(bincount(keys, minlength=size), out=self.offsets[1:])
+
+        self.heads: ndarray = zeros(size, dtype=int64)
+        starts: ndarray = self.offsets[:-1][self.lengths > 0]
+        self.heads[self.lengths > 0] = values[starts]
+
+        deltas: ndarray = empty(len(values), dtype=int64)
+        deltas[1:] = diff(values)
+        deltas[starts] = 0
+        """
+            the first gap of every list is 0, its value being in heads, so the deltas never
+            carry a negative jump from the end of a list to the start of the next one
+        """
+
+        largest: int = int(deltas.max()) if len(deltas) else 0
+        delta_type = next(delta_type for delta_type in DELTA_TYPES if largest <= 2 ** (8 * delta_type().itemsize) - 1)
+        self.deltas: ndarray = deltas.astype(delta_type)
+
+    @property
+    def size(self) -> int:
+        """
+        Returns:
+        --------
+            The number of keys.
+        """
+        return len(self.heads)
+
+    @property
+    def lengths(self) -> ndarray:
+        """
+        Returns:
+        --------
+            The length of every list.
+        """
+        return diff(self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+        --------
+            The number of bytes used by the lists.
+        """
+        return self.offsets.nbytes + self.heads.nbytes + self.deltas.nbytes
+
+    def count(self, key: int) -> int:
+        """
+        Returns the length of a list without decoding it.
+        """
+        return int(self.offsets[key + 1] - self.offsets[key])
+
+    def get(self, key: int) -> ndarray:
+        """
+        Decodes the list of a key.
+
+        Args:
+        -----
+            key (int): The key.
+
+        Returns:
+        --------
+            the sorted values of the key.
+        """
+        start, end = int(self.offsets[key]), int(self.offsets[key + 1])
+        return self.heads[key] + cumsum(self.deltas[start:end], dtype=int64)
+
+    def gather(self, keys: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Decodes the lists of many keys at once, without a python loop over the keys.
+
+        Args:
+        -----
+            keys (ndarray): The keys.
+
+        Returns:
+        --------
+            a tuple (values, lengths) of the lists one after the other, and the length of each of them.
+        """
+        keys = asarray(keys, dtype=int64)
+        starts: ndarray = self.offsets[keys]
+        lengths: ndarray = self.offsets[keys + 1] - starts
+        total: int = int(lengths.sum())
+
+        if total == 0:
+            return empty(0, dtype=int64), lengths
+
+        first_positions: ndarray = zeros(len(keys), dtype=int64)
+        cumsum(lengths[:-1], out=first_positions[1:])
+
+        positions: ndarray = arange(total, dtype=int64) - repeat(first_positions - starts, lengths)
+        """
+            positions are the indexes of the gaps of every list in self.deltas, ex: the lists
+            [10, 13) and [40, 42) give positions [10, 11, 12, 40, 41]
+        """
+
+        running: ndarray = cumsum(self.deltas[positions], dtype=int64)
+        list_starts: ndarray = running[first_positions[lengths > 0]]
+        """
+            one cumulative sum over every gathered gap, each list then subtracts the running
+            total at its own start and adds its head
+        """
+        values: ndarray = running + repeat(self.heads[keys][lengths > 0] - list_starts, lengths[lengths > 0])
+
+        return values, lengths
+
+    def intersect(self, first_key: int, second_key: int) -> ndarray:
+        """
+        Args:
+        -----
+            first_key (int): A key.
+            second_key (int): Another key.
+
+        Returns:
+        --------
+            the sorted values found in both lists, ex: the users who liked both movies.
+        """
+        return intersect1d(self.get(first_key), self.get(second_key))
@@ -0,0 +1,141 @@
+"""
+    Batch job computing the collaborative recommendations of every rated movie ahead of time.
+
+    Run it from the project folder whenever the ratings changed enough to matter, ex: nightly:
+
+        python -m Engine.recommender.precompute
+
+    The table is saved in Engine/recommender/artifacts/recommendation_table, keyed by the fingerprints
+    of ratings.csv and comments.csv. Workers load it at start up and every time the users are
+    refiltered. Once either file no longer matches it, a worker keeps reading its table for a bounded
+    number of writes and then computes the recommendations live until this job saves a new table.
+"""
+
+from numpy import ndarray, array, concatenate, cumsum, searchsorted, zeros, float32, int32, int64
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from .collaborative import CollaborativeEngine
+from . import artifacts
+from time import time
+
+worker_engine: Optional[CollaborativeEngine] = None
+"""
+    The engine of a pool process, sent once when the process starts instead of with every chunk
+"""
+
+
+class RecommendationTable:
+    """
+        The precomputed recommendations of every movie, looked up with one binary search.
+
+            movie_ids        [1,    2,    3   ]
+            offsets          [0,    10,   10,   20]
+            recommendations  [3114, 2355, ...,  ...]
+
+        A movie with an empty range is known to have no recommendations, a movie missing from
+        movie_ids was never computed and has to be computed live.
+    """
+
+    def __init__(self, table: artifacts.RecommendationArtifacts) -> None:
+        """
+        Args:
+        -----
+            table (RecommendationArtifacts): The arrays of the table, ex: memory mapped from disk.
+        """
+        self.movie_ids: ndarray = table.movie_ids
+        self.offsets: ndarray = table.offsets
+        self.recommendations: ndarray = table.recommendations
+        self.scores: ndarray = table.scores
+
+    def __len__(self) -> int:
+        return len(self.movie_ids)
+
+    def lookup(self, movie_id: int) -> Optional[Tuple[ndarray, ndarray]]:
+        """
+        Args:
+        -----
+            movie_id (int): The id of the seed movie.
+
+        Returns:
+        --------
+            a tuple (movie_ids, scores) of the recommendations ranked from best to worst,
+            or None if the movie is not in the table.
+        """
+        position: int = int(searchsorted(self.movie_ids, movie_id))
+
+        if position == len(self.movie_ids) or self.movie_ids[position] != movie_id:
+            return None
+
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return self.recommendations[start:end], self.scores[start:end]
+
+
+def start_worker(engine: CollaborativeEngine) -> None:
+    """
+    Keeps the engine sent to a new pool process.
+    """
+    global worker_engine
+    worker_engine = engine
+
+
+def similar_movies_of_chunk(movie_ids: ndarray, k: int) -> List[Tuple[ndarray, ndarray]]:
+    """
+    Computes the recommendations of a chunk of movies in a pool process.
+    """
+    return [worker_engine.similar_movies(int(movie_id), k) for movie_id in movie_ids]
+
+
+def build_recommendation_table(engine: CollaborativeEngine, k: int = 10, workers: Optional[int] = None, chunk_size: int = 256) -> RecommendationTable:
+    """
+    Computes the top k recommendations of every movie of the engine with a process pool.
+
+    Args:
+    -----
+        engine (CollaborativeEngine): The engine of the ratings snapshot to compute.
+        k (int): The number of recommendations per movie (default is 10).
+        workers (int): The number of processes, None uses one per CPU and 0 computes in the calling thread (default is None).
+        chunk_size (int): The number of movies sent to a process at once (default is 256).
+
+    Returns:
+    --------
+        the RecommendationTable of every movie the engine knows.
+    """
+    movie_ids: ndarray = array(engine.movie_ids, dtype=int64)
+    chunks: List[ndarray] = [movie_ids[start:start + chunk_size] for start in range(0, len(movie_ids), chunk_size)]
+    results: List[Tuple[ndarray, ndarray]] = []
+
+    if workers == 0:
+        for chunk in chunks:
+            results.extend(engine.similar_movies_batch(chunk.tolist(), k))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(engine,)) as pool:
+            for chunk_results in pool.map(similar_movies_of_chunk, chunks, [k] * len(chunks)):
+                results.extend(chunk_results)
+
+    lengths: ndarray = array([len(recommendations) for recommendations, _ in results], dtype=int64)
+    offsets: ndarray = zeros(len(results) + 1, dtype=int64)
+    cumsum(lengths, out=offsets[1:])
+
+    return RecommendationTable(artifacts.RecommendationArtifacts(
+        movie_ids=movie_ids,
+        offsets=offsets,
+        recommendations=concatenate([recommendations for recommendations, _ in results] + [zeros(0, dtype=int64)]).astype(int32),
+        scores=concatenate([scores for _, scores in results] + [zeros(0)]).astype(float32)
+    ))
+
+
+if __name__ == "__main__":
+    from ..csv_alchemy import ratings as ratings_csv, comments as comments_csv
+
+    # fingerprinted right after the files were read, so a rating written during the job makes the table stale
+    sources = {filepath: artifacts.fingerprint(filepath) for filepath in (ratings_csv.filepath, comments_csv.filepath)}
+
+    from . import AI
+
+    started: float = time()
+    table: RecommendationTable = build_recommendation_table(AI.snapshots.current().collaborative_engine)
+
+    artifacts.save_recommendation_artifacts(sources, artifacts.RecommendationArtifacts(
+        table.movie_ids, table.offsets, table.recommendations, table.scores))
+
+    print(f"\n\tPrecomputed the recommendations of {len(table)} movies in {time() - started:.1f}s")
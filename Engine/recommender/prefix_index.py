@@ -0,0 +1,172 @@
+from numpy import ndarray, array, arange, argsort, insert, float64, int64
+from .title_search import top_k
+from typing import Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from copy import copy
+
+LAST_CHARACTER: str = chr(0x10FFFF)
+
+
+class TitlePrefixIndex:
+    """
+        Type-ahead over the clean titles.
+
+        The lowercased titles are kept in a sorted list so the titles starting with a prefix are
+        one contiguous range found by two binary searches. Short prefixes like "t" or "the" match
+        thousands of titles, so every prefix matching more than `threshold` titles has its most
+        popular titles ranked once when the index is built.
+
+            "toy"  -> range [54211, 54236) -> scan 25 popularities
+            "t"    -> precomputed rows of ["Titanic 1997", "Terminator 2 1991", ...]
+
+        Popularity is given when the index is built, serving a prefix never reads the ratings.
+    """
+
+    def __init__(self, titles: Iterable[str], popularity: Iterable[float], limit: int = 10, threshold: int = 256) -> None:
+        """
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles, in the same order as the movie rows.
+            popularity (Iterable[float]): The popularity of each movie row, ex: its number of ratings.
+            limit (int): The maximum number of suggestions a prefix can return (default is 10).
+            threshold (int): Prefixes matching more titles than this are ranked ahead of time (default is 256).
+        """
+        lowered: List[str] = [title.lower() for title in titles]
+        order: ndarray = argsort(array(lowered, dtype=object), kind="stable")
+
+        self.keys: List[str] = [lowered[row] for row in order]
+        self.rows: ndarray = order.astype(int64)
+        self.popularity: ndarray = array(list(popularity), dtype=float64)[order]
+        self.limit: int = limit
+        self.threshold: int = threshold
+        self.ranked_prefixes: Dict[str, ndarray] = {}
+
+        self._rank_crowded_prefixes()
+
+    def _range(self, prefix: str, low: int = 0, high: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Finds the positions of the titles starting with a prefix.
+
+        Args:
+        -----
+            prefix (str): The lowercased prefix.
+            low (int): The first position to look at (default is 0).
+            high (int): The position after the last one to look at (default is the end).
+
+        Returns:
+        --------
+            a tuple (start, end) of the positions in `keys` starting with the prefix.
+        """
+        high = len(self.keys) if high is None else high
+        start: int = bisect_left(self.keys, prefix, low, high)
+        end: int = bisect_right(self.keys, prefix + LAST_CHARACTER, start, high)
+        return start, end
+
+    def _rank_range(self, start: int, end: int) -> ndarray:
+        """
+        Ranks the titles of a range by popularity.
+
+        Returns:
+        --------
+            the positions of at most `limit` titles of the range, most popular first.
+        """
+        positions, _ = top_k(arange(start, end, dtype=int64), self.popularity[start:end], self.limit)
+        return positions
+
+    def _rank_crowded_prefixes(self) -> None:
+        """
+        Walks down the prefixes of the sorted titles one character at a time and ranks every
+        prefix that matches more than `threshold` titles. A prefix matching fewer titles is cheap
+        enough to rank on request, so its longer prefixes are never visited.
+        """
+        pending: List[Tuple[str, int, int]] = [("", 0, len(self.keys))]
+
+        while pending:
+            prefix, start, end = pending.pop()
+
+            if end - start <= self.threshold:
+                continue
+
+            if prefix:
+                self.ranked_prefixes[prefix] = self.rows[self._rank_range(start, end)]
+
+            depth: int = len(prefix)
+            position: int = start
+
+            while position < end:
+
+                if len(self.keys[position]) <= depth:
+                    position += 1
+                    continue
+
+                child: str = prefix + self.keys[position][depth]
+                child_start, child_end = self._range(child, position, end)
+                pending.append((child, child_start, child_end))
+                position = child_end
+
+    def appended(self, titles: Iterable[str], popularity: Iterable[float]) -> "TitlePrefixIndex":
+        """
+        Returns a new index with titles appended after the last indexed row, this one is left as it is
+        for the snapshots reading it. The new titles are inserted in the sorted titles and only the
+        crowded prefixes of the new titles are ranked again.
+
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles of the new movies, in the order of their movie rows.
+            popularity (Iterable[float]): The popularity of each new movie.
+
+        Returns:
+        --------
+            the new index.
+        """
+        lowered: List[str] = [title.lower() for title in titles]
+        new_rows: ndarray = arange(len(self.keys), len(self.keys) + len(lowered), dtype=int64)
+        order: ndarray = argsort(array(lowered, dtype=object), kind="stable")
+        positions: List[int] = [bisect_right(self.keys, lowered[new]) for new in order]
+        """
+            a new title goes after the equal titles already indexed and the new titles keep their
+            order among themselves, like the stable sort of a rebuild puts the higher rows last
+        """
+
+        index: TitlePrefixIndex = copy(self)
+        index.keys = list(self.keys)
+        index.rows = insert(self.rows, positions, new_rows[order])
+        index.popularity = insert(self.popularity, positions, array(list(popularity), dtype=float64)[order])
+        index.ranked_prefixes = dict(self.ranked_prefixes)
+
+        for position, new in reversed(list(zip(positions, order))):
+            index.keys.insert(position, lowered[new])
+
+        for prefix in {key[:length] for key in lowered for length in range(1, len(key) + 1)}:
+            start, end = index._range(prefix)
+
+            if end - start > index.threshold:
+                index.ranked_prefixes[prefix] = index.rows[index._rank_range(start, end)]
+
+        return index
+
+    def suggest(self, prefix: str, limit: int = 10) -> ndarray:
+        """
+        Suggests the most popular titles starting with a prefix.
+
+        Args:
+        -----
+            prefix (str): What the user typed so far, ex: "toy st".
+            limit (int): The number of suggestions, capped by the limit of the index (default is 10).
+
+        Returns:
+        --------
+            the movie rows of the suggestions, most popular first.
+        """
+        prefix = prefix.lower().lstrip()
+
+        if not prefix:
+            return array([], dtype=int64)
+
+        rows: Optional[ndarray] = self.ranked_prefixes.get(prefix)
+
+        if rows is None:
+            start, end = self._range(prefix)
+            rows = self.rows[self._rank_range(start, end)]
+
+        return rows[:limit]
@@ -0,0 +1,154 @@
+from typing import Any, Callable, Dict, Optional
+from threading import Condition, Thread
+from time import monotonic, time
+
+
+class RefreshWorker:
+    """
+        One long lived thread running a rebuild, ex: refilter_users, when something asked for it.
+
+        A request only marks the worker dirty. The worker waits until no request came for `debounce`
+        seconds, or until the oldest waiting request is `max_delay` seconds old, and then runs the
+        rebuild once for every request that came in meanwhile:
+
+            request  request  request                         request
+            |--------|--------|------- debounce -------|      |---- ...
+                                                       rebuild once
+
+        Requests made while a rebuild runs wait for the next one, so there is never more than one
+        rebuild in flight. Given an interval, it also rebuilds when nothing asked for it for that long.
+
+        for example::
+
+            worker = RefreshWorker(refilter_users, debounce=30, interval=3600)
+            worker.start()
+            worker.request()
+    """
+
+    def __init__(self, refresh: Callable[[], Any], debounce: float = 30.0, max_delay: Optional[float] = None, interval: Optional[float] = None) -> None:
+        """
+        Args:
+        -----
+            refresh (Callable): The rebuild to run, without arguments.
+            debounce (float): The seconds without new requests to wait before rebuilding (default is 30).
+            max_delay (float): The most seconds a request waits for its rebuild, None is 10 times debounce (default is None).
+            interval (float): The seconds after which it rebuilds without any request, None never does (default is None).
+        """
+        self.refresh: Callable[[], Any] = refresh
+        self.debounce: float = debounce
+        self.max_delay: float = max_delay if max_delay is not None else 10 * debounce
+        self.interval: Optional[float] = interval
+        self.condition: Condition = Condition()
+        self.thread: Optional[Thread] = None
+
+        self.pending: int = 0
+        self.first_request_at: float = 0.0
+        self.last_request_at: float = 0.0
+        self.last_finished_at: float = monotonic()
+        self.running: bool = False
+
+        self.runs: int = 0
+        self.coalesced_requests: int = 0
+        self.failures: int = 0
+        self.last_error: Optional[str] = None
+        self.last_run_seconds: Optional[float] = None
+        self.last_completed_at: Optional[float] = None
+
+    def start(self) -> None:
+        """
+        Starts the worker thread, once.
+        """
+        with self.condition:
+            if self.thread is None:
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def request(self) -> None:
+        """
+        Asks for a rebuild, returns right away.
+        """
+        with self.condition:
+            now: float = monotonic()
+
+            if self.pending == 0:
+                self.first_request_at = now
+
+            self.pending += 1
+            self.last_request_at = now
+            self.condition.notify()
+
+    def _wait(self) -> int:
+        """
+        Blocks until a rebuild is due and takes the requests it answers.
+
+        Returns:
+        --------
+            the number of requests answered by the rebuild, 0 for a rebuild of the interval.
+        """
+        with self.condition:
+            while True:
+                now: float = monotonic()
+
+                if self.pending:
+                    due: float = min(self.last_request_at + self.debounce, self.first_request_at + self.max_delay)
+                elif self.interval is not None:
+                    due = self.last_finished_at + self.interval
+                else:
+                    due = float("inf")
+
+                if now >= due:
+                    break
+
+                self.condition.wait(None if due == float("inf") else due - now)
+
+            requests: int = self.pending
+            self.pending = 0
+            self.running = True
+            return requests
+
+    def _run(self) -> None:
+        """
+        The loop of the worker thread.
+        """
+        while True:
+            requests: int = self._wait()
+            started: float = monotonic()
+
+            try:
+                self.refresh()
+                error: Optional[str] = None
+            except Exception as exception:
+                error = repr(exception)
+                print(f"\tRefresh failed: {error}")
+
+            with self.condition:
+                self.running = False
+                self.runs += 1
+                self.coalesced_requests += requests
+                self.last_finished_at = monotonic()
+                self.last_run_seconds = self.last_finished_at - started
+                self.last_error = error
+
+                if error is None:
+                    self.last_completed_at = time()
+                else:
+                    self.failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+        --------
+            a dictionary with the number of requests waiting for a rebuild, if one is running, the number
+            of rebuilds and of requests they answered, and the duration and unix time of the last one.
+        """
+        with self.condition:
+            return {
+                "queue_depth": self.pending,
+                "running": self.running,
+                "runs": self.runs,
+                "coalesced_requests": self.coalesced_requests,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_run_seconds": self.last_run_seconds,
+                "last_completed_at": self.last_completed_at
+            }
@@ -0,0 +1,140 @@
+from ..csv_alchemy import comments as comments_csv
+from typing import Dict
+from pandas import DataFrame, Index, Series
+from threading import Lock
+from math import isnan, nan
+
+
+class SentimentAggregate:
+    """
+        The sum and count of the comment sentiment scores of every user, so the average sentiment of a
+        user is kept up to date by every comment write in O(1) instead of a groupby over every comment.
+
+            user_id | sum | count        mean
+            1       | 0.8 | 1      ->    0.8
+            2       | 1.6 | 2      ->    0.8
+
+        Scores that are NaN are skipped, like the mean of a groupby skips them.
+
+        for example::
+
+            user_sentiment.add(7, 0.4)
+            user_sentiment.replace(7, 0.4, -0.2)
+            user_sentiment.mean(7)        # -0.2
+    """
+
+    def __init__(self) -> None:
+        self.sums: Dict[int, float] = {}
+        self.counts: Dict[int, int] = {}
+        self.lock: Lock = Lock()
+
+    @classmethod
+    def from_comments(cls, comments: DataFrame) -> "SentimentAggregate":
+        """
+        Builds the aggregate of every user with one groupby over the comments, done once at start up.
+
+        Args:
+        -----
+            comments (DataFrame): The comments, with user_id and sentiment_score columns.
+
+        Returns:
+        --------
+            the aggregate of the comments.
+        """
+        aggregate: SentimentAggregate = cls()
+        grouped: DataFrame = comments.groupby("user_id")["sentiment_score"].agg(["sum", "count"])
+        grouped = grouped[grouped["count"] > 0]
+
+        aggregate.sums = {int(user_id): float(total) for user_id, total in grouped["sum"].items()}
+        aggregate.counts = {int(user_id): int(count) for user_id, count in grouped["count"].items()}
+        return aggregate
+
+    def _change(self, user_id: int, score: float, change: int) -> None:
+        """
+        Adds or removes a score of a user, forgetting the user when their last score is removed,
+        called with the lock held.
+        """
+        if isnan(score):
+            return
+
+        count: int = self.counts.get(user_id, 0) + change
+
+        if count <= 0:
+            self.sums.pop(user_id, None)
+            self.counts.pop(user_id, None)
+            return
+
+        self.sums[user_id] = self.sums.get(user_id, 0.0) + change * score
+        self.counts[user_id] = count
+
+    def add(self, user_id: int, score: float) -> None:
+        """
+        Counts the score of a new comment of a user.
+
+        Args:
+        -----
+            user_id (int): The csv id of the user.
+            score (float): The sentiment score of the comment.
+        """
+        with self.lock:
+            self._change(user_id, score, 1)
+
+    def remove(self, user_id: int, score: float) -> None:
+        """
+        Removes the score of a deleted comment of a user.
+
+        Args:
+        -----
+            user_id (int): The csv id of the user.
+            score (float): The sentiment score of the deleted comment.
+        """
+        with self.lock:
+            self._change(user_id, score, -1)
+
+    def replace(self, user_id: int, old_score: float, new_score: float) -> None:
+        """
+        Replaces the score of an updated comment of a user.
+
+        Args:
+        -----
+            user_id (int): The csv id of the user.
+            old_score (float): The sentiment score of the comment before the update.
+            new_score (float): The sentiment score of the comment after the update.
+        """
+        with self.lock:
+            self._change(user_id, old_score, -1)
+            self._change(user_id, new_score, 1)
+        """
+            both under one lock, so means never sees the user with the old score removed and the new one not added yet
+        """
+
+    def mean(self, user_id: int) -> float:
+        """
+        Args:
+        -----
+            user_id (int): The csv id of the user.
+
+        Returns:
+        --------
+            the average sentiment score of the comments of the user, NaN if the user has none.
+        """
+        with self.lock:
+            count: int = self.counts.get(user_id, 0)
+            return self.sums[user_id] / count if count else nan
+
+    def means(self) -> Series:
+        """
+        Returns:
+        --------
+            the average sentiment score of every user with comments, indexed by user id.
+        """
+        with self.lock:
+            user_ids = list(self.counts)
+            return Series([self.sums[user_id] / self.counts[user_id] for user_id in user_ids],
+                          index=Index(user_ids, name="user_id"), dtype=float, name="sentiment_score")
+
+
+user_sentiment: SentimentAggregate = SentimentAggregate.from_comments(comments_csv.csv_data)
+"""
+    The average sentiment of every user, updated by Comment.insert, Comment.update and Comment.delete
+"""
@@ -0,0 +1,144 @@
+from .title_search import TitleSearchEngine
+from .trigram_index import TrigramTitleIndex
+from .prefix_index import TitlePrefixIndex
+from .exact_index import ExactTitleIndex
+from .incremental_index import IncrementalTitleIndex
+from .lsh_index import RandomProjectionIndex
+from .collaborative import CollaborativeEngine
+from .precompute import RecommendationTable
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from scipy.sparse import spmatrix
+from pandas import DataFrame
+from threading import Lock
+
+TITLE_FIELDS = ("movies", "tfidf", "title_engine", "trigram_index", "exact_titles", "prefix_index")
+"""
+    The fields searches read, a change to any of them changes the title_version
+"""
+
+
+class EngineSnapshot(NamedTuple):
+    """
+        Everything a request reads, published as a whole.
+
+        A snapshot is never modified: a rebuild makes its new indexes off to the side and publishes
+        a copy of the current snapshot with them swapped in, so a request that took a snapshot keeps
+        seeing one consistent state until it returns, whatever gets published meanwhile.
+
+            request A  ->  snapshot 7  (movies, title_engine, ..., collaborative_engine 3)
+            refilter_users publishes snapshot 8  (same movies and title_engine, collaborative_engine 4)
+            request B  ->  snapshot 8
+
+        version changes with every publish and title_version only when the searched titles change,
+        so caches can keep the results of searches across refilters.
+
+        A rating or comment write publishes a snapshot with the new CollaborativeEngine its write
+        returned, the engine of older snapshots is left as it is, see CollaborativeEngine.add_rating.
+    """
+    version: int
+    title_version: int
+    movies: DataFrame
+    tfidf: spmatrix
+    title_engine: TitleSearchEngine
+    trigram_index: TrigramTitleIndex
+    exact_titles: ExactTitleIndex
+    prefix_index: TitlePrefixIndex
+    incremental_index: Optional[IncrementalTitleIndex] = None
+    approximate_index: Optional[RandomProjectionIndex] = None
+    """
+        Built the first time a search of their mode reads the snapshot, then appended to with the other title indexes
+    """
+    collaborative_engine: Optional[CollaborativeEngine] = None
+    recommendation_table: Optional[RecommendationTable] = None
+    table_writes: int = 0
+    """
+        The rating and comment writes published since the recommendation_table was computed
+    """
+
+
+class SnapshotPublisher:
+    """
+        Holds the current EngineSnapshot and swaps it in one assignment.
+
+        for example::
+
+            snapshots = SnapshotPublisher(first_snapshot)
+
+            state = snapshots.current()        # pinned for the whole request
+            state.title_engine.search(...)
+
+            snapshots.publish(collaborative_engine=new_engine)
+            snapshots.update(lambda state: {"collaborative_engine": state.collaborative_engine.add_rating(...)})
+    """
+
+    def __init__(self, snapshot: EngineSnapshot) -> None:
+        """
+        Args:
+        -----
+            snapshot (EngineSnapshot): The first snapshot.
+        """
+        self.snapshot: EngineSnapshot = snapshot
+        self.lock: Lock = Lock()
+
+    def current(self) -> EngineSnapshot:
+        """
+        Returns:
+        --------
+            the latest published snapshot.
+        """
+        return self.snapshot
+
+    def publish(self, **changes) -> EngineSnapshot:
+        """
+        Publishes a copy of the current snapshot with some fields replaced and the next version.
+
+        Publishes are serialized, so two rebuilds publishing different fields at the same time both
+        keep the change of the other one.
+
+        Args:
+        -----
+            changes: The new value of every field to replace, ex: collaborative_engine=new_engine.
+
+        Returns:
+        --------
+            the published snapshot.
+        """
+        with self.lock:
+            return self._publish(changes)
+
+    def update(self, change: Callable[[EngineSnapshot], Dict[str, Any]]) -> EngineSnapshot:
+        """
+        Publishes the fields a function derives from the latest snapshot, ex: a write applied to its
+        collaborative_engine.
+
+        The function runs while publishes are serialized, so two writes at the same time are applied
+        one after the other and neither loses the other one.
+
+        Args:
+        -----
+            change (Callable): Takes the latest snapshot and returns the new value of every field to replace.
+
+        Returns:
+        --------
+            the published snapshot.
+        """
+        with self.lock:
+            return self._publish(change(self.snapshot))
+
+    def _publish(self, changes: Dict[str, Any]) -> EngineSnapshot:
+        """
+        Replaces the current snapshot, called with the lock held. Without changes the current snapshot is kept.
+        """
+        current: EngineSnapshot = self.snapshot
+
+        if not changes:
+            return current
+
+        title_changed: bool = any(field in changes for field in TITLE_FIELDS)
+
+        self.snapshot = current._replace(
+            version=current.version + 1,
+            title_version=current.title_version + title_changed,
+            **changes
+        )
+        return self.snapshot
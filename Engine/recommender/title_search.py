@@ -0,0 +1,361 @@
+from numpy import ndarray, argpartition, lexsort, empty, concatenate, unique, bincount, flatnonzero, fromiter, float32, float64, int32, int64
+from sklearn.preprocessing import normalize
+from scipy.sparse import spmatrix, csr_matrix, csc_matrix
+from typing import Any, Dict, List, Optional, Tuple
+
+SEARCH_RESULT = Tuple[ndarray, ndarray]
+
+
+def top_k(rows: ndarray, scores: ndarray, k: int) -> SEARCH_RESULT:
+    """
+    Selects the k highest scoring rows and returns them ranked from best to worst.
+
+    Only the k winners are sorted, everything else is discarded by a partial selection
+    so the cost stays close to linear in the number of candidates.
+
+    Args:
+    -----
+        rows (ndarray): The movie rows of every candidate.
+        scores (ndarray): The score of every candidate, aligned with `rows`.
+        k (int): The number of results to keep.
+
+    Returns:
+    --------
+        a tuple (rows, scores) sorted by descending score. Ties are broken by the lower row first.
+    """
+    if k <= 0 or len(scores) == 0:
+        return empty(0, dtype=int64), empty(0, dtype=float64)
+
+    if len(scores) > k:
+        winners: ndarray = argpartition(scores, -k)[-k:]
+        rows, scores = rows[winners], scores[winners]
+
+    order: ndarray = lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+class InvertedTitleIndex:
+    """
+        Posting lists of the TF-IDF vocabulary.
+
+        Every term points to the movie rows whose title contains it and the weight of the
+        term in that title. A query only reads the posting lists of its own terms, so the
+        cost of a search grows with the number of matching titles instead of the catalog size.
+
+        "toy story" -> rows [0, 3021, 14813], weights [0.6768, 0.5121, 0.4977]
+
+        The index is a CSC copy of the matrix, column j being the posting list of term j.
+    """
+
+    def __init__(self, matrix: spmatrix, vocabulary: Optional[Dict[str, int]] = None) -> None:
+        """
+        Args:
+        -----
+            matrix (spmatrix): The movies x terms TF-IDF matrix, normally already L2-normalized.
+            vocabulary (dict): The `vocabulary_` of the vectorizer, needed only to look postings up by term.
+        """
+        self.matrix: csc_matrix = csc_matrix(matrix)
+
+        if not self.matrix.has_sorted_indices:
+            self.matrix.sort_indices()
+
+        self.pointers: ndarray = self.matrix.indptr
+        self.rows: ndarray = self.matrix.indices
+        self.weights: ndarray = self.matrix.data
+        self.vocabulary: Dict[str, int] = vocabulary or {}
+        self.size: int = self.matrix.shape[0]
+
+    def postings(self, term: str) -> SEARCH_RESULT:
+        """
+        Returns the posting list of a term.
+
+        Args:
+        -----
+            term (str): A unigram or bigram of the vocabulary, ex: "toy story".
+
+        Returns:
+        --------
+            a tuple (rows, weights) of the titles containing the term, empty if the term is unknown.
+        """
+        column: Optional[int] = self.vocabulary.get(term)
+
+        if column is None:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        start, end = self.pointers[column], self.pointers[column + 1]
+        return self.rows[start:end], self.weights[start:end]
+
+    def score(self, query_vector: spmatrix) -> SEARCH_RESULT:
+        """
+        Accumulates the score of every title found in the posting lists of the query terms.
+
+        Args:
+        -----
+            query_vector (spmatrix): A 1 x terms vector produced by the same vectorizer as the matrix.
+
+        Returns:
+        --------
+            a tuple (rows, scores) of every title sharing at least one term with the query, unsorted.
+        """
+        query: csr_matrix = csr_matrix(query_vector)
+        matched_rows: List[ndarray] = []
+        matched_scores: List[ndarray] = []
+
+        for column, query_weight in zip(query.indices, query.data):
+            start, end = self.pointers[column], self.pointers[column + 1]
+            matched_rows.append(self.rows[start:end])
+            matched_scores.append(self.weights[start:end] * query_weight)
+
+        if not matched_rows:
+            return empty(0, dtype=int64), empty(0, dtype=float64)
+
+        rows, positions = unique(concatenate(matched_rows), return_inverse=True)
+        """
+            A title containing both "toy" and "story" shows up in both posting lists,
+            unique folds these into one row while positions remembers where each hit belongs
+
+            concatenate(matched_rows) = [0, 3021, 14813, 0, 3021, 14813, 59767]
+            rows = [0, 3021, 14813, 59767]
+            positions = [0, 1, 2, 0, 1, 2, 3]
+        """
+        scores: ndarray = bincount(positions, weights=concatenate(matched_scores), minlength=len(rows))
+        return rows.astype(int64), scores
+
+
+class TitleSearchEngine:
+    """
+        Content-Based title search over a TF-IDF matrix.
+
+        The matrix is L2-normalized once when the engine is built and turned into an
+        `InvertedTitleIndex`, so the cosine similarity between a query and the titles is
+        accumulated from the posting lists of the query terms only, instead of a call to
+        `cosine_similarity` that re-normalizes all the rows on every request.
+
+        for example::
+
+            engine = TitleSearchEngine(tfidf, vectorizer.vocabulary_)
+            rows, scores = engine.search(vectorizer.transform(["Toy Story"]), k=5)
+    """
+
+    def __init__(self, tfidf: spmatrix, vocabulary: Optional[Dict[str, int]] = None, postings: Optional[spmatrix] = None, normalized: bool = False, columns: Optional[ndarray] = None) -> None:
+        """
+        Args:
+        -----
+            tfidf (spmatrix): The movies x terms TF-IDF matrix.
+            vocabulary (dict): The `vocabulary_` of the vectorizer that produced the matrix.
+            postings (spmatrix): A CSC copy of the normalized matrix to use as the inverted index, ex: loaded from disk.
+            normalized (bool): The rows of `tfidf` already have a unit L2 norm and can be used without a copy (default is False).
+            columns (ndarray): The vectorizer columns kept in `tfidf` when it was pruned, queries are cut to them (default is all).
+        """
+        self.matrix: csr_matrix = csr_matrix(tfidf) if normalized else normalize(csr_matrix(tfidf), norm="l2")
+        self.index: InvertedTitleIndex = InvertedTitleIndex(self.matrix if postings is None else postings, vocabulary)
+        self.columns: Optional[ndarray] = columns
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+        --------
+            The number of bytes used by the matrix and its inverted index.
+        """
+        return sum(
+            array.nbytes for matrix in (self.matrix, self.index.matrix)
+            for array in (matrix.data, matrix.indices, matrix.indptr)
+        )
+
+    def project(self, query_vectors: spmatrix) -> csr_matrix:
+        """
+        Cuts query vectors to the columns kept in the matrix and gives them a unit L2 norm.
+        """
+        queries: csr_matrix = csr_matrix(query_vectors)
+
+        if self.columns is not None:
+            queries = queries[:, self.columns]
+
+        return normalize(queries, norm="l2")
+
+    @property
+    def size(self) -> int:
+        """
+        Returns:
+        --------
+            The number of titles in the engine.
+        """
+        return self.matrix.shape[0]
+
+    def score(self, query_vector: spmatrix) -> SEARCH_RESULT:
+        """
+        Scores a single query against the titles found in the posting lists of its terms.
+
+        Args:
+        -----
+            query_vector (spmatrix): A 1 x terms vector produced by the same vectorizer as the matrix.
+
+        Returns:
+        --------
+            a tuple (rows, scores) of every title sharing at least one term with the query, unsorted.
+        """
+        return self.index.score(self.project(query_vector))
+
+    def search(self, query_vector: spmatrix, k: int = 10) -> SEARCH_RESULT:
+        """
+        Finds the k titles closest to the query.
+
+        Args:
+        -----
+            query_vector (spmatrix): A 1 x terms vector produced by the same vectorizer as the matrix.
+            k (int): The number of titles to return (default is 10).
+
+        Returns:
+        --------
+            a tuple (rows, scores) of at most k titles ranked by descending cosine similarity.
+        """
+        rows, scores = self.score(query_vector)
+        return top_k(rows, scores, k)
+
+    def search_batch(self, query_vectors: spmatrix, k: int = 10, offset: int = 0) -> List[SEARCH_RESULT]:
+        """
+        Finds the titles closest to many queries with a single sparse matrix product.
+
+        The queries x terms matrix is multiplied with the terms x titles posting lists, so every
+        query still only reads the posting lists of its own terms, but the whole batch is scored
+        in one call instead of one call per query.
+
+        Args:
+        -----
+            query_vectors (spmatrix): A queries x terms matrix produced by the same vectorizer as the matrix.
+            k (int): The number of titles to return per query (default is 10).
+            offset (int): The number of best titles to skip per query, for paging (default is 0).
+
+        Returns:
+        --------
+            a list with one tuple (rows, scores) per query, each ranked by descending cosine similarity.
+        """
+        queries: csr_matrix = self.project(query_vectors)
+        similarities: csr_matrix = csr_matrix(queries.dot(self.index.matrix.T))
+        """
+            similarities is a queries x titles sparse matrix, row i holds the scores of query i
+
+                (0, 0)        0.7736
+                (0, 3021)     0.5412
+                (1, 2487)     0.8120
+        """
+        results: List[SEARCH_RESULT] = []
+
+        for query in range(similarities.shape[0]):
+            start, end = similarities.indptr[query], similarities.indptr[query + 1]
+            rows, scores = top_k(
+                similarities.indices[start:end].astype(int64),
+                similarities.data[start:end].astype(float64),
+                k + offset
+            )
+            results.append((rows[offset:], scores[offset:]))
+
+        return results
+
+
+def compact_title_matrix(tfidf: spmatrix, vocabulary: Dict[str, int]) -> Tuple[csr_matrix, Dict[str, int], ndarray]:
+    """
+    Prunes a TF-IDF matrix down to what the compact title engine keeps.
+
+    With ngram_range=(1, 2) most of the vocabulary is made of bigrams found in a single title,
+    they can only ever match that one title, which its unigrams already match. Those bigrams are
+    dropped, the rows re-normalized and the weights stored as float32 with int32 indices.
+
+    Args:
+    -----
+        tfidf (spmatrix): The movies x terms TF-IDF matrix.
+        vocabulary (dict): The `vocabulary_` of the vectorizer that produced the matrix.
+
+    Returns:
+    --------
+        a tuple (matrix, vocabulary, columns) of the L2-normalized pruned matrix, the vocabulary of its
+        columns and the vectorizer column of each of them.
+    """
+    matrix: csr_matrix = csr_matrix(tfidf)
+
+    terms: List[str] = [""] * len(vocabulary)
+    for term, column in vocabulary.items():
+        terms[column] = term
+
+    is_bigram: ndarray = fromiter((" " in term for term in terms), dtype=bool, count=len(terms))
+    document_frequency: ndarray = bincount(matrix.indices, minlength=len(terms))
+    kept_columns: ndarray = flatnonzero(~(is_bigram & (document_frequency <= 1))).astype(int32)
+    """
+        kept_columns are the vectorizer columns still used after pruning, the compact matrix keeps
+        them in the same order so column i of the compact matrix is vectorizer column kept_columns[i]
+    """
+
+    pruned: csr_matrix = normalize(csr_matrix(matrix[:, kept_columns], dtype=float32), norm="l2")
+    pruned.indices = pruned.indices.astype(int32)
+    pruned.indptr = pruned.indptr.astype(int32)
+
+    return pruned, compact_vocabulary(vocabulary, kept_columns), kept_columns
+
+
+def compact_vocabulary(vocabulary: Dict[str, int], columns: ndarray) -> Dict[str, int]:
+    """
+    Args:
+    -----
+        vocabulary (dict): The `vocabulary_` of the vectorizer.
+        columns (ndarray): The vectorizer columns kept in a compact matrix.
+
+    Returns:
+    --------
+        the term -> column vocabulary of the compact matrix.
+    """
+    positions: Dict[int, int] = {int(column): position for position, column in enumerate(columns)}
+    return {term: positions[column] for term, column in vocabulary.items() if column in positions}
+
+
+def compact_title_engine(engine: TitleSearchEngine, vocabulary: Dict[str, int]) -> TitleSearchEngine:
+    """
+    Builds a smaller copy of a title search engine, see compact_title_matrix.
+
+    Args:
+    -----
+        engine (TitleSearchEngine): The exact engine.
+        vocabulary (dict): The `vocabulary_` of the vectorizer that produced the engine's matrix.
+
+    Returns:
+    --------
+        a TitleSearchEngine over the pruned matrix, its queries are cut to the kept columns.
+    """
+    pruned, pruned_vocabulary, kept_columns = compact_title_matrix(engine.matrix, vocabulary)
+    return TitleSearchEngine(pruned, pruned_vocabulary, normalized=True, columns=kept_columns)
+
+
+def compare_title_engines(exact: TitleSearchEngine, compact: TitleSearchEngine, query_vectors: spmatrix, k: int = 10) -> Dict[str, Any]:
+    """
+    Measures what the compact engine saves and what it costs in accuracy.
+
+    Args:
+    -----
+        exact (TitleSearchEngine): The exact engine.
+        compact (TitleSearchEngine): The compact engine built from it.
+        query_vectors (spmatrix): The queries to compare the engines on, ex: a sample of the titles.
+        k (int): The number of results to compare per query (default is 10).
+
+    Returns:
+    --------
+        a dictionary with the memory of both engines in bytes, the ratio between them, the number of
+        columns of each and the average overlap of their top k results, 1 meaning identical results.
+    """
+    exact_results: List[SEARCH_RESULT] = exact.search_batch(query_vectors, k)
+    compact_results: List[SEARCH_RESULT] = compact.search_batch(query_vectors, k)
+
+    overlaps: List[float] = [
+        len(set(exact_rows.tolist()) & set(compact_rows.tolist())) / len(exact_rows)
+        for (exact_rows, _), (compact_rows, _) in zip(exact_results, compact_results)
+        if len(exact_rows)
+    ]
+
+    return {
+        "exact_bytes": exact.nbytes,
+        "compact_bytes": compact.nbytes,
+        "memory_ratio": compact.nbytes / exact.nbytes,
+        "exact_terms": exact.matrix.shape[1],
+        "compact_terms": compact.matrix.shape[1],
+        "queries": len(overlaps),
+        f"top_{k}_overlap": sum(overlaps) / len(overlaps) if overlaps else 1.0
+    }
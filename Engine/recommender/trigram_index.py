@@ -0,0 +1,290 @@
+from numpy import ndarray, array, concatenate, unique, empty, minimum, searchsorted, float64, int32, int64
+from .title_search import SEARCH_RESULT, top_k
+from typing import Dict, Iterable, List, Tuple
+from collections import defaultdict
+from copy import copy
+import re
+
+YEAR = re.compile(r"\s+\d{4}$")
+PARTIAL_MATCH_WEIGHT: float = 0.9
+COMMON_TRIGRAM_SHARE: float = 0.05
+COMMON_TRIGRAM_ROWS: int = 256
+"""
+    A trigram found in more than COMMON_TRIGRAM_SHARE of the titles, and in more than COMMON_TRIGRAM_ROWS
+    titles, is too common to retrieve candidates with. The clean titles keep their year, so " 19", "199"
+    or " 20" alone would pull most of the catalog into every query with a year.
+"""
+
+
+def trigrams(text: str) -> List[str]:
+    """
+    Splits a text into the character trigrams of each of its words.
+
+    Words are padded with two spaces in front and one at the back so the start and the end
+    of every word are trigrams too.
+
+    for example::
+
+        trigrams("Toy")  # ["  t", " to", "toy", "oy "]
+
+    Args:
+    -----
+        text (str): The text to split.
+
+    Returns:
+    --------
+        the list of unique trigrams of the text.
+    """
+    grams: List[str] = []
+
+    for word in text.lower().split():
+        padded: str = f"  {word} "
+        grams.extend(padded[index:index + 3] for index in range(len(padded) - 2))
+
+    return list(dict.fromkeys(grams))
+
+
+def edit_distance(first: str, second: str) -> int:
+    """
+    Computes the Levenshtein distance between two strings, the number of single character
+    insertions, deletions or substitutions needed to turn one into the other.
+
+    It uses the bit-parallel algorithm of Myers: a column of the dynamic programming table is kept
+    as bits of the differences between neighbouring cells, so each character of `second` updates the
+    whole column with a few integer operations instead of one Python step per cell.
+
+    for example::
+
+        edit_distance("godfater", "godfather")  # 1
+
+    Args:
+    -----
+        first (str): The first string.
+        second (str): The second string.
+
+    Returns:
+    --------
+        the edit distance between the two strings.
+    """
+    if not first:
+        return len(second)
+
+    matches: Dict[str, int] = {}
+    for position, character in enumerate(first):
+        matches[character] = matches.get(character, 0) | (1 << position)
+
+    mask: int = (1 << len(first)) - 1
+    last: int = 1 << (len(first) - 1)
+    positive: int = mask
+    negative: int = 0
+    distance: int = len(first)
+
+    for character in second:
+        match: int = matches.get(character, 0)
+        vertical: int = match | negative
+        horizontal: int = (((match & positive) + positive) ^ positive) | match
+        horizontal_positive: int = negative | ~(horizontal | positive)
+        horizontal_negative: int = positive & horizontal
+
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative = horizontal_negative << 1
+        positive = (horizontal_negative | ~(vertical | horizontal_positive)) & mask
+        negative = horizontal_positive & vertical & mask
+    """
+        positive and negative mark the cells of the current column that are one more or one less than
+        the cell above them, distance follows the bottom cell, the distance between first and the part
+        of second read so far
+    """
+
+    return distance
+
+
+def ratio(first: str, second: str) -> float:
+    """
+    Turns the edit distance of two strings into a similarity between 0 and 1.
+
+    Args:
+    -----
+        first (str): The first string.
+        second (str): The second string.
+
+    Returns:
+    --------
+        1 minus the edit distance divided by the length of the longest string.
+    """
+    longest: int = max(len(first), len(second), 1)
+    return 1 - edit_distance(first, second) / longest
+
+
+class TrigramTitleIndex:
+    """
+        Typo tolerant title lookup.
+
+        Each character trigram points to the rows of the titles containing it. A query reads the
+        posting lists of its own trigrams, keeps the titles sharing the most trigrams with it and
+        re-ranks those few candidates by edit distance, so "Jumanij" still finds "Jumanji 1995".
+
+            "  j" -> [1, 4521, 8032]
+            " ju" -> [1, 4521]
+            "jum" -> [1]
+
+        Trigrams found in most titles, like the "199" of the years, only count towards the ranking
+        of the candidates found through the other trigrams, see COMMON_TRIGRAM_SHARE.
+    """
+
+    def __init__(self, titles: Iterable[str]) -> None:
+        """
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles, in the same order as the movie rows.
+        """
+        postings: Dict[str, List[int]] = defaultdict(list)
+        self.titles: List[str] = []
+        lengths: List[int] = []
+
+        for row, title in enumerate(titles):
+            title_trigrams: List[str] = trigrams(title)
+            for gram in title_trigrams:
+                postings[gram].append(row)
+            self.titles.append(title.lower())
+            lengths.append(len(title_trigrams))
+
+        self.postings: Dict[str, ndarray] = {gram: array(rows, dtype=int32) for gram, rows in postings.items()}
+        self.lengths: ndarray = array(lengths, dtype=int32)
+
+    def appended(self, titles: Iterable[str]) -> "TrigramTitleIndex":
+        """
+        Returns a new index with titles appended after the last indexed row, this one is left as it is
+        for the snapshots reading it. Only the posting lists of the trigrams of the new titles are copied.
+
+        Args:
+        -----
+            titles (Iterable[str]): The clean titles of the new movies, in the order of their movie rows.
+
+        Returns:
+        --------
+            the new index.
+        """
+        added: Dict[str, List[int]] = defaultdict(list)
+        new_titles: List[str] = []
+        lengths: List[int] = []
+
+        for row, title in enumerate(titles, start=len(self.titles)):
+            title_trigrams: List[str] = trigrams(title)
+            for gram in title_trigrams:
+                added[gram].append(row)
+            new_titles.append(title.lower())
+            lengths.append(len(title_trigrams))
+
+        index: TrigramTitleIndex = copy(self)
+        index.postings = dict(self.postings)
+        index.titles = self.titles + new_titles
+        index.lengths = concatenate([self.lengths, array(lengths, dtype=int32)])
+
+        for gram, rows in added.items():
+            new_rows: ndarray = array(rows, dtype=int32)
+            index.postings[gram] = concatenate([self.postings[gram], new_rows]) if gram in self.postings else new_rows
+
+        return index
+
+    def _posting_lists(self, query_trigrams: List[str]) -> Tuple[List[ndarray], List[ndarray]]:
+        """
+        Splits the posting lists of the query trigrams into the ones to retrieve candidates from and the
+        ones too common for it, see COMMON_TRIGRAM_SHARE. A query made only of common trigrams, ex: "the",
+        retrieves its candidates from the shortest of them.
+        """
+        matched: List[ndarray] = sorted((self.postings[gram] for gram in query_trigrams if gram in self.postings), key=len)
+        longest: int = max(int(COMMON_TRIGRAM_SHARE * len(self.titles)), COMMON_TRIGRAM_ROWS)
+        uncommon: int = max(sum(len(rows) <= longest for rows in matched), min(len(matched), 1))
+
+        return matched[:uncommon], matched[uncommon:]
+
+    def candidates(self, query: str, limit: int = 50) -> ndarray:
+        """
+        Retrieves the titles sharing the most trigrams with the query.
+
+        Args:
+        -----
+            query (str): The clean query.
+            limit (int): The maximum number of candidates to keep (default is 50).
+
+        Returns:
+        --------
+            the rows of at most `limit` candidates, unsorted.
+        """
+        query_trigrams: List[str] = trigrams(query)
+        matched, common = self._posting_lists(query_trigrams)
+
+        if not matched:
+            return empty(0, dtype=int64)
+
+        rows, shared = unique(concatenate(matched), return_counts=True)
+
+        for common_rows in common:
+            positions: ndarray = minimum(searchsorted(common_rows, rows), len(common_rows) - 1)
+            shared += common_rows[positions] == rows
+        """
+            shared counts how many trigrams of the query each title contains, it is turned into
+            a Dice coefficient so long titles do not win just by containing more trigrams
+
+            dice = 2 * shared / (trigrams in query + trigrams in title)
+
+            the common trigrams retrieve no titles themselves, the titles found through the other
+            trigrams still count them with one binary search per title, posting lists being sorted by row
+        """
+        dice: ndarray = 2 * shared / (len(query_trigrams) + self.lengths[rows])
+        rows, _ = top_k(rows.astype(int64), dice, limit)
+        return rows
+
+    def similarity(self, query: str, row: int) -> float:
+        """
+        Scores a candidate by edit distance, ignoring the release year when the query has none.
+
+        The query is compared with the whole title and with the title cut to as many words as
+        the query, so "godfater" is still close to "godfather the". The cut comparison is worth
+        a little less so complete matches rank first.
+
+        Args:
+        -----
+            query (str): The lowercased clean query.
+            row (int): The row of the candidate title.
+
+        Returns:
+        --------
+            a similarity between 0 and 1 where 1 is an exact match.
+        """
+        title: str = self.titles[row]
+
+        if not YEAR.search(query):
+            title = YEAR.sub("", title)
+
+        leading_words: str = " ".join(title.split()[:len(query.split())])
+
+        return max(
+            ratio(query, title),
+            ratio(query, leading_words) * PARTIAL_MATCH_WEIGHT
+        )
+
+    def search(self, query: str, k: int = 10, candidates: int = 50) -> SEARCH_RESULT:
+        """
+        Finds the k titles closest to a possibly misspelled query.
+
+        Args:
+        -----
+            query (str): The clean query, ex: "Godfater".
+            k (int): The number of titles to return (default is 10).
+            candidates (int): How many trigram candidates get re-ranked by edit distance (default is 50).
+
+        Returns:
+        --------
+            a tuple (rows, scores) of at most k titles ranked by descending similarity.
+        """
+        query = query.lower().strip()
+        rows: ndarray = self.candidates(query, max(candidates, k))
+        scores: ndarray = array([self.similarity(query, row) for row in rows], dtype=float64)
+        return top_k(rows, scores, k)
@@ -13,20 +13,31 @@ from . import AI
 
 recommender = Blueprint('recommender', __name__)
 
+MAX_SEARCH_BATCH = 1000
+MAX_SEARCH_RESULTS = 100
+
 @recommender.post('/recommend')
 def get_recommendations() -> RouteResponseType:
     """
     Uses collaborative filtering and content-based filtering to find 20 movie recommendations for the user.
 
+    Form Data:
+    - title (str): The title of the movie.
+    - engine (str): "cooccurrence" or "als", "cooccurrence" by default.
+
     Returns:
     - JSON: A JSON response containing movie recommendations.
     """
     title = request.form["title"]
+    engine = request.form.get("engine", AI.COOCCURRENCE_ENGINE)
 
     if not title or str(title).strip() == '':
         return jsonify(RouteResponse.failed("Missing movie title"))
 
-    recommendations = AI.recommend(title)
+    if engine not in (AI.COOCCURRENCE_ENGINE, AI.ALS_ENGINE):
+        return RouteResponse.failed(f"Unknown recommendation engine {engine}")
+
+    recommendations = AI.recommend(title, engine)
 
     # Check if recommendations is a NumPy array and convert it to a list if necessary
     if isinstance(recommendations, ndarray):
@@ -34,6 +45,115 @@ def get_recommendations() -> RouteResponseType:
 
     return jsonify(RouteResponse.success(None, recommendations))
 
+@recommender.get('/recommend/me')
+def recommend_for_me() -> RouteResponseType:
+    """
+    Recommends movies to the logged in user from every movie they liked, leaving out the movies they already rated.
+
+    Query Parameters:
+    - engine (str): "cooccurrence" or "als", "cooccurrence" by default.
+    - k (int): The number of movies, 10 by default and at most 100.
+
+    Returns:
+    - JSON: A JSON response containing the recommended movie ids and titles.
+    """
+    if not current_user.is_authenticated:
+        return RouteResponse.failed("Log in to get recommendations for you")
+
+    engine = request.args.get("engine", AI.COOCCURRENCE_ENGINE)
+    k = request.args.get("k", 10, type=int)
+
+    if engine not in (AI.COOCCURRENCE_ENGINE, AI.ALS_ENGINE):
+        return RouteResponse.failed(f"Unknown recommendation engine {engine}")
+
+    if k < 1 or k > MAX_SEARCH_RESULTS:
+        return RouteResponse.failed(f"k must be between 1 and {MAX_SEARCH_RESULTS}")
+
+    return RouteResponse.success(data=AI.recommend_for_user(current_user.csv_id, engine, k))
+
+@recommender.get('/recommend/stats')
+def recommendation_stats() -> RouteResponseType:
+    """
+    Reports how well the recommendation and search caches are doing, and the background refilter.
+
+    Returns:
+    - JSON: A JSON response with the hit ratios, sizes and staleness ages of the caches, and the waiting
+      writes, duration and completion time of the refilter.
+    """
+    return RouteResponse.success(data={
+        "recommendations": AI.similar_movies_cache.stats(),
+        "search": AI.search_cache.stats(),
+        "refilter": AI.refresh_worker.stats()
+    })
+
+@recommender.get('/search/suggest')
+def suggest_titles() -> RouteResponseType:
+    """
+    Suggests movie titles starting with what the user typed so far, ranked by popularity.
+
+    Query Parameters:
+    - q (str): The partially typed title.
+    - limit (int): The maximum number of suggestions, 10 by default and at most the limit of the prefix index.
+
+    Returns:
+    - JSON: A JSON response containing the suggested movie ids and titles.
+    """
+    prefix = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+    max_limit = AI.snapshots.current().prefix_index.limit
+
+    if limit < 1 or limit > max_limit:
+        return RouteResponse.failed(f"limit must be between 1 and {max_limit}")
+
+    if prefix.strip() == '':
+        return RouteResponse.success(data=[])
+
+    return RouteResponse.success(data=AI.suggest(prefix, limit))
+
+@recommender.post('/search')
+def search_titles() -> RouteResponseType:
+    """
+    Searches one or many movie titles at once. A batch is scored with a single sparse matrix product.
+
+    JSON Body:
+    - title (str) or titles (List[str]): The title or titles to search for.
+    - k (int): The number of results per title, 10 by default and at most 100.
+    - offset (int): The number of best results to skip per title, 0 by default.
+
+    Returns:
+    - JSON: A JSON response with, for every title, the ranked movie ids, titles and similarity scores.
+    """
+    data = request.get_json(silent=True) or {}
+    titles = data.get('titles', None)
+
+    if titles is None and data.get('title', None) is not None:
+        titles = [data['title']]
+
+    if not isinstance(titles, list) or len(titles) == 0 or not all(isinstance(title, str) for title in titles):
+        return RouteResponse.failed("Missing movie title or titles")
+
+    if len(titles) > MAX_SEARCH_BATCH:
+        return RouteResponse.failed(f"Cannot search more than {MAX_SEARCH_BATCH} titles at once")
+
+    try:
+        k = int(data.get('k', 10))
+        offset = int(data.get('offset', 0))
+    except (TypeError, ValueError):
+        return RouteResponse.failed("k and offset must be numbers")
+
+    if k < 1 or k > MAX_SEARCH_RESULTS or offset < 0:
+        return RouteResponse.failed(f"k must be between 1 and {MAX_SEARCH_RESULTS} and offset cannot be negative")
+
+    batch_results = AI.search_batch(titles, k, offset)
+
+    return RouteResponse.success(data=[
+        {
+            "query": title,
+            "results": results[["movie_id", "title", "score"]].to_dict(orient='records')
+        }
+        for title, results in zip(titles, batch_results)
+    ])
+
 @recommender.post('/rate/<movie_title>')
 def rate_movie(movie_title) -> RouteResponseType:
     """
@@ -51,19 +171,11 @@ def rate_movie(movie_title) -> RouteResponseType:
     if rating is None:
         return jsonify(RouteResponse.failed("Missing rating data"))
 
-    retrieve_movie = None
+    movie_id = find_movie_id(movie_title)
 
-    try:
-        retrieve_movie = movies.clean_retrieve({
-            "column_name": "title",
-            "column_data": movie_title
-        })
-    except Exception as error:
-        print(str(error))
+    if movie_id is None:
         return jsonify(RouteResponse.failed("Movie not found"))
 
-    movie_id = retrieve_movie["movie_id"]
-
     try:
 
         rating_result = ratings.insert_row({
@@ -231,7 +343,7 @@ def remove_comment(comment_id) -> RouteResponseType:
 
 def find_movie_id(movie_title) -> Union[int, None]:
     """
-    Searches for the movie ID based on its title in a CSV file.
+    Searches for the movie ID based on its title in the exact title index.
 
     Args:
     - movie_title (str): The title of the movie to search for.
@@ -239,16 +351,10 @@ def find_movie_id(movie_title) -> Union[int, None]:
     Returns:
     - int or None: The movie ID if found, or None if not found.
     """
-    try:
+    movie_ids = AI.find_exact_movie_ids(movie_title)
 
-        retrieve_movie = movies.clean_retrieve({
-            "column_name": "title",
-            "column_data": movie_title
-        })
-
-        return retrieve_movie["movie_id"]
-
-    except CsvAlchemy.RowNotFoundException as error:
-
-        print(str(error))
+    if len(movie_ids) == 0:
+        print(f"Movie {movie_title} not found")
         return None
+
+    return movie_ids[0]
@@ -0,0 +1,54 @@
+from Engine.recommender.cache import RefreshingCache, MISSING
+from threading import Event, active_count
+from time import sleep
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    for _ in range(int(timeout / .01)):
+        if condition():
+            return True
+        sleep(.01)
+    return condition()
+
+
+def test_stale_keys_are_refreshed_by_one_bounded_worker():
+    release = Event()
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        if len(calls) > 20:
+            release.wait(5)
+        return (key, len(calls))
+
+    cache = RefreshingCache(compute, max_pending=4)
+
+    for key in range(20):
+        cache.get(key)
+
+    cache.invalidate()
+    threads: int = active_count()
+
+    for _ in range(3):
+        for key in range(20):
+            assert cache.get(key)[0] == key
+
+    assert active_count() <= threads + 1
+    assert cache.stats()["refreshing"] == 4
+    assert cache.stats()["dropped_refreshes"] == 3 * 16
+
+    release.set()
+    assert wait_for(lambda: cache.stats()["refreshing"] == 0)
+    assert sorted(calls[20:]) == [0, 1, 2, 3]
+    assert cache.stats()["refreshes"] == 4
+
+
+def test_lookup_does_not_compute_a_miss():
+    cache = RefreshingCache(lambda key: key * 2)
+
+    assert cache.lookup(3) is MISSING
+    assert cache.get(3) == 6
+    assert cache.lookup(3) == 6
+
+    cache.set(4, 10)
+    assert cache.lookup(4) == 10
@@ -0,0 +1,154 @@
+from Engine.recommender.collaborative import CollaborativeEngine
+from warnings import catch_warnings, simplefilter
+from numpy import arange, concatenate, repeat
+from numpy.random import default_rng
+from numpy.testing import assert_allclose, assert_array_equal
+from pandas import DataFrame, Series, concat
+
+rating_boundery = 4
+sentiment_boundery = .5
+
+
+def random_ratings(rng, users: int = 60, movies: int = 40, rows: int = 900) -> DataFrame:
+    return DataFrame({
+        "user_id": rng.integers(1, users + 1, rows),
+        "movie_id": rng.integers(1, movies + 1, rows),
+        "content": rng.integers(0, 6, rows).astype(float)
+    })
+
+
+def average_sentiment(comments: DataFrame) -> Series:
+    return comments.groupby("user_id")["sentiment_score"].mean()
+
+
+def test_incremental_writes_match_a_rebuild():
+    rng = default_rng(7)
+    ratings: DataFrame = random_ratings(rng)
+    comments: DataFrame = DataFrame({"user_id": rng.integers(1, 61, 40), "sentiment_score": rng.uniform(-1, 1, 40)})
+
+    engine = CollaborativeEngine(ratings, average_sentiment(comments), rating_boundery, sentiment_boundery)
+    user_ids, movie_ids = engine.user_ids, engine.movie_ids
+    first_engine, first_results = engine, [engine.similar_movies(movie_id) for movie_id in movie_ids]
+
+    for _ in range(400):
+        user_id: int = int(rng.choice(user_ids))
+        kind: int = int(rng.integers(4))
+
+        if kind < 2:
+            movie_id: int = int(rng.choice(movie_ids))
+            rating: float = float(rng.integers(0, 6))
+            ratings = concat([ratings, DataFrame([{"user_id": user_id, "movie_id": movie_id, "content": rating}])], ignore_index=True)
+            engine = engine.add_rating(user_id, movie_id, rating, rating_boundery)
+
+        elif kind == 2:
+            rows: DataFrame = ratings[ratings["user_id"] == user_id]
+
+            if len(rows) == 0:
+                continue
+
+            row = rows.iloc[int(rng.integers(len(rows)))]
+            ratings = ratings.drop(row.name)
+            engine = engine.remove_rating(user_id, int(row["movie_id"]), float(row["content"]), rating_boundery)
+
+        else:
+            if rng.random() < .7:
+                comments = concat([comments, DataFrame([{"user_id": user_id, "sentiment_score": rng.uniform(-1, 1)}])], ignore_index=True)
+            else:
+                comments = comments[comments["user_id"] != user_id]
+
+            engine = engine.update_sentiment(user_id, comments.loc[comments["user_id"] == user_id, "sentiment_score"].mean(), sentiment_boundery)
+
+    rebuilt = CollaborativeEngine(ratings, average_sentiment(comments), rating_boundery, sentiment_boundery)
+
+    assert engine.total_likers == rebuilt.total_likers
+
+    for movie_id in rebuilt.movie_ids:
+        assert_array_equal(
+            engine.user_ids[engine.seed_users(engine.movie_position(movie_id))],
+            rebuilt.user_ids[rebuilt.seed_users(rebuilt.movie_position(movie_id))]
+        )
+
+        movies, scores = engine.similar_movies(movie_id, k=10)
+        rebuilt_movies, rebuilt_scores = rebuilt.similar_movies(movie_id, k=10)
+
+        assert_array_equal(movies, rebuilt_movies)
+        assert_allclose(scores, rebuilt_scores)
+
+    for (movies, scores), movie_id in zip(engine.similar_movies_batch(list(rebuilt.movie_ids)), rebuilt.movie_ids):
+        rebuilt_movies, rebuilt_scores = rebuilt.similar_movies(movie_id)
+
+        assert_array_equal(movies, rebuilt_movies)
+        assert_allclose(scores, rebuilt_scores)
+
+    for user_id in rebuilt.user_ids:
+        assert_array_equal(engine.liked_movies(user_id), rebuilt.liked_movies(user_id))
+        assert_array_equal(engine.rated_movies(user_id), rebuilt.rated_movies(user_id))
+
+    for movie_id, (movies, scores) in zip(movie_ids, first_results):
+        first_movies, first_scores = first_engine.similar_movies(movie_id)
+
+        assert_array_equal(first_movies, movies)
+        assert_allclose(first_scores, scores)
+
+
+def test_sampled_similar_movies_bounds_stay_between_0_and_1():
+    rng = default_rng(11)
+    ratings: DataFrame = DataFrame({
+        "user_id": rng.integers(1, 3001, 60000),
+        "movie_id": rng.integers(1, 31, 60000),
+        "content": rng.choice([3.0, 4.5, 5.0], 60000)
+    })
+    """
+        about 20 ratings per user over 30 movies, so many users liked a movie twice and measured shares go above 1
+    """
+    engine = CollaborativeEngine(ratings, Series(dtype=float), rating_boundery, sentiment_boundery)
+
+    with catch_warnings():
+        simplefilter("error", RuntimeWarning)
+
+        for movie_id in engine.movie_ids:
+            sampled = engine.sampled_similar_movies(movie_id, k=10, sample_size=50)
+
+            assert sampled.sampled
+            assert ((0 <= sampled.similar_lower) & (sampled.similar_lower <= sampled.similar_upper) & (sampled.similar_upper <= 1)).all()
+
+
+def test_sampled_similar_movies_bounds_hold_the_exact_shares():
+    rng = default_rng(5)
+    users: int = 3000
+    ratings: DataFrame = DataFrame({
+        "user_id": repeat(arange(1, users + 1), 4),
+        "movie_id": concatenate([rng.choice(8, 4, replace=False) + 1 for _ in range(users)]),
+        "content": rng.choice([3.0, 4.5, 5.0], 4 * users)
+    })
+    """
+        every user rates 4 of 8 movies once, so every candidate is returned and its share is measured without selection
+    """
+    engine = CollaborativeEngine(ratings, Series(dtype=float), rating_boundery, sentiment_boundery)
+
+    misses: int = 0
+    bounded: int = 0
+
+    for movie_id in engine.movie_ids:
+        for seed in range(20):
+            sampled = engine.sampled_similar_movies(movie_id, k=10, sample_size=50, seed=seed)
+            exact, _ = engine._similar_shares(sampled.movie_ids, engine.seed_users(engine.movie_position(movie_id)))
+
+            misses += int(((exact < sampled.similar_lower - 1e-9) | (exact > sampled.similar_upper + 1e-9)).sum())
+            bounded += len(exact)
+
+    assert misses <= .1 * bounded
+
+
+def test_sampled_similar_movies_is_exact_below_the_sample_size():
+    rng = default_rng(3)
+    engine = CollaborativeEngine(random_ratings(rng), Series(dtype=float), rating_boundery, sentiment_boundery)
+
+    for movie_id in engine.movie_ids:
+        sampled = engine.sampled_similar_movies(movie_id, k=10, sample_size=2000)
+        movies, scores = engine.similar_movies(movie_id, k=10)
+
+        assert not sampled.sampled
+        assert_array_equal(sampled.movie_ids, movies)
+        assert_allclose(sampled.scores, scores)
+        assert_allclose(sampled.similar_lower, sampled.similar_upper)
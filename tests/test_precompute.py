@@ -0,0 +1,46 @@
+from Engine.recommender.collaborative import CollaborativeEngine
+from Engine.recommender.precompute import build_recommendation_table
+from numpy.random import default_rng
+from numpy.testing import assert_allclose, assert_array_equal
+from pandas import DataFrame, Series
+import pickle
+
+
+def random_engine() -> CollaborativeEngine:
+    rng = default_rng(9)
+    ratings: DataFrame = DataFrame({
+        "user_id": rng.integers(1, 81, 1200),
+        "movie_id": rng.integers(1, 51, 1200),
+        "content": rng.integers(0, 6, 1200).astype(float)
+    })
+    comments: Series = Series(rng.uniform(-1, 1, 20), index=rng.choice(range(1, 81), 20, replace=False))
+
+    return CollaborativeEngine(ratings, comments, 4, .5).add_rating(3, 7, 5.0, 4).update_sentiment(5, .9, .5)
+
+
+def test_engine_survives_pickling():
+    engine: CollaborativeEngine = random_engine()
+    copy: CollaborativeEngine = pickle.loads(pickle.dumps(engine))
+
+    for movie_id in engine.movie_ids:
+        movies, scores = engine.similar_movies(movie_id)
+        copied_movies, copied_scores = copy.similar_movies(movie_id)
+
+        assert_array_equal(copied_movies, movies)
+        assert_allclose(copied_scores, scores)
+
+
+def test_recommendation_table_matches_similar_movies():
+    engine: CollaborativeEngine = random_engine()
+
+    for workers in (0, 2):
+        table = build_recommendation_table(engine, workers=workers, chunk_size=16)
+
+        assert len(table) == len(engine.movie_ids)
+
+        for movie_id in engine.movie_ids:
+            movies, scores = engine.similar_movies(movie_id)
+            table_movies, table_scores = table.lookup(movie_id)
+
+            assert_array_equal(table_movies, movies)
+            assert_allclose(table_scores, scores, rtol=1e-6)
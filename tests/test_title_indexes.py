@@ -0,0 +1,160 @@
+from Engine.recommender.trigram_index import TrigramTitleIndex, edit_distance, trigrams
+from Engine.recommender.prefix_index import TitlePrefixIndex
+from Engine.recommender.incremental_index import IncrementalTitleIndex
+from Engine.recommender.lsh_index import RandomProjectionIndex
+from Engine.recommender.title_search import TitleSearchEngine, compact_title_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from numpy import array, sqrt, float32, int32
+from numpy.random import default_rng
+from numpy.testing import assert_array_equal, assert_allclose
+from time import perf_counter
+
+WORDS = ["toy", "story", "the", "godfather", "jumanji", "heat", "tom", "titanic", "star", "wars", "return"]
+
+
+def random_titles(rng, count: int):
+    return [" ".join(rng.choice(WORDS, int(rng.integers(1, 4)))) + f" {int(rng.integers(1950, 2020))}" for _ in range(count)]
+
+
+def test_appended_trigram_index_matches_a_rebuild():
+    rng = default_rng(1)
+    titles = random_titles(rng, 300)
+    new_titles = random_titles(rng, 20)
+
+    first = TrigramTitleIndex(titles)
+    appended = first.appended(new_titles)
+    rebuilt = TrigramTitleIndex(titles + new_titles)
+
+    assert appended.titles == rebuilt.titles
+    assert_array_equal(appended.lengths, rebuilt.lengths)
+    assert appended.postings.keys() == rebuilt.postings.keys()
+
+    for gram, rows in rebuilt.postings.items():
+        assert_array_equal(appended.postings[gram], rows)
+
+    for query in ["toy stroy", "godfater", "titanc 1997", "star"]:
+        rows, scores = appended.search(query)
+        rebuilt_rows, rebuilt_scores = rebuilt.search(query)
+
+        assert_array_equal(rows, rebuilt_rows)
+        assert_array_equal(scores, rebuilt_scores)
+
+    assert len(first.titles) == 300
+    assert all(row < 300 for rows in first.postings.values() for row in rows)
+
+
+def test_appended_prefix_index_matches_a_rebuild():
+    rng = default_rng(2)
+    titles = random_titles(rng, 600)
+    new_titles = random_titles(rng, 30) + titles[:5]
+    popularity = rng.permutation(600).astype(float)
+    new_popularity = 600 + rng.permutation(35).astype(float)
+
+    first = TitlePrefixIndex(titles, popularity, threshold=32)
+    appended = first.appended(new_titles, new_popularity)
+    rebuilt = TitlePrefixIndex(titles + new_titles, list(popularity) + list(new_popularity), threshold=32)
+
+    assert appended.keys == rebuilt.keys
+    assert_array_equal(appended.rows, rebuilt.rows)
+    assert appended.ranked_prefixes.keys() == rebuilt.ranked_prefixes.keys()
+
+    for prefix in ["t", "to", "toy", "s", "star w", "the godfather", "heat 19", "x"]:
+        assert_array_equal(appended.suggest(prefix), rebuilt.suggest(prefix))
+
+    assert len(first.keys) == 600
+
+
+def test_compact_title_matrix_drops_single_title_bigrams():
+    rng = default_rng(2)
+    titles = random_titles(rng, 300)
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    matrix, vocabulary, columns = compact_title_matrix(vectorizer.fit_transform(titles), vectorizer.vocabulary_)
+
+    titles_per_term = {term: sum(f" {term} " in f" {title} " for title in titles) for term in vectorizer.vocabulary_}
+    kept = {term for term, count in titles_per_term.items() if " " not in term or count > 1}
+
+    assert set(vocabulary) == kept
+    assert all(vectorizer.vocabulary_[term] == columns[column] for term, column in vocabulary.items())
+    assert matrix.dtype == float32 and matrix.indices.dtype == int32
+    assert_allclose(sqrt(matrix.multiply(matrix).sum(axis=1)).ravel(), 1, rtol=1e-6)
+
+
+def test_appended_incremental_index_leaves_the_previous_one_unchanged():
+    rng = default_rng(3)
+    titles = random_titles(rng, 300)
+    new_titles = random_titles(rng, 20)
+
+    first = IncrementalTitleIndex(titles)
+    before = [first.search(query) for query in ["toy story", "heat 1995"]]
+    appended = first.appended(new_titles)
+    added = IncrementalTitleIndex(titles)
+    added.add(new_titles)
+
+    assert first.size == 300 and appended.size == 320
+
+    for query, (rows, scores) in zip(["toy story", "heat 1995"], before):
+        first_rows, first_scores = first.search(query)
+        assert_array_equal(first_rows, rows)
+        assert_array_equal(first_scores, scores)
+
+        appended_rows, appended_scores = appended.search(query, k=50)
+        added_rows, added_scores = added.search(query, k=50)
+        assert_array_equal(appended_rows, added_rows)
+        assert_allclose(appended_scores, added_scores)
+
+
+def test_appended_random_projection_index_matches_a_rebuild():
+    rng = default_rng(4)
+    titles = random_titles(rng, 300)
+    new_titles = random_titles(rng, 20)
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2)).fit(titles)
+
+    first = RandomProjectionIndex(TitleSearchEngine(vectorizer.transform(titles), vectorizer.vocabulary_))
+    engine = TitleSearchEngine(vectorizer.transform(titles + new_titles), vectorizer.vocabulary_)
+    appended = first.appended(engine)
+    rebuilt = RandomProjectionIndex(engine)
+
+    for table in range(rebuilt.n_tables):
+        assert_array_equal(appended.codes[table], rebuilt.codes[table])
+        assert_array_equal(appended.orders[table], rebuilt.orders[table])
+
+    assert all(len(order) == 300 for order in first.orders)
+
+
+def test_edit_distance_matches_the_dynamic_programming_table():
+    rng = default_rng(5)
+
+    def table_distance(first: str, second: str) -> int:
+        previous = list(range(len(second) + 1))
+        for row, first_character in enumerate(first, start=1):
+            current = [row]
+            for column, second_character in enumerate(second, start=1):
+                current.append(min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (first_character != second_character)))
+            previous = current
+        return previous[-1]
+
+    for _ in range(2000):
+        first, second = ("".join(rng.choice(list("ab c"), int(rng.integers(0, 70)))) for _ in range(2))
+        assert edit_distance(first, second) == table_distance(first, second)
+
+
+def test_fuzzy_search_skips_year_trigrams_and_stays_fast():
+    rng = default_rng(6)
+    letters = array(list("abcdefghijklmnopqrstuvwxyz"))
+    words = array(["".join(rng.choice(letters, int(rng.integers(3, 9)))) for _ in range(5000)])
+    titles = [" ".join(rng.choice(words, int(rng.integers(1, 5)))) + f" {int(rng.integers(1950, 2020))}" for _ in range(20000)]
+    index = TrigramTitleIndex(titles)
+
+    retrieved, common = index._posting_lists(trigrams("jumanij 1995"))
+    assert all(len(rows) <= 0.05 * len(titles) for rows in retrieved)
+    assert any(len(rows) > 0.05 * len(titles) for rows in common)
+
+    picked = rng.integers(0, len(titles), 200)
+    queries = [titles[row][:2] + titles[row][3] + titles[row][2] + titles[row][4:] for row in picked]
+
+    started = perf_counter()
+    results = [index.search(query) for query in queries]
+    average_ms = 1000 * (perf_counter() - started) / len(queries)
+
+    assert average_ms < 20
+    assert sum(titles[rows[0]] == titles[row] for row, (rows, _) in zip(picked, results)) >= 0.8 * len(queries)